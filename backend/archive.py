@@ -0,0 +1,330 @@
+"""Packed archive of conversations nobody has touched in a while.
+
+Conversations untouched for ARCHIVE_AFTER_DAYS are moved out of DATA_DIR by
+storage.compact_conversations() (run in the background by
+run_compaction_loop(), or with `python -m backend.archive compact`). Each is
+appended, serialized exactly like its conversation file, to the current
+pack file in ARCHIVE_DIR (pack-000000.pack, pack-000001.pack...; a new one
+is started once a pack reaches ARCHIVE_PACK_MAX_MB). Packs are only ever
+appended to, so backups copy a few large files instead of many small ones.
+
+An SQLite index (index.db, next to the packs) maps each archived
+conversation to its pack, byte offset and length, the length of its fields
+before "messages", and the byte offsets of each message, so a conversation,
+its metadata or a page of its messages is read with a seek. The list
+metadata (title, created_at...) is kept in the index too.
+
+A conversation file in DATA_DIR always takes precedence over the archive:
+saving an archived conversation writes it back to DATA_DIR and drops it
+from the index, leaving its old record in the pack as dead bytes.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+
+from .config import ARCHIVE_DIR, ARCHIVE_AFTER_DAYS, ARCHIVE_COMPACT_INTERVAL, ARCHIVE_PACK_MAX_BYTES
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, single worker only
+    fcntl = None
+
+ARCHIVE_INDEX_PATH = os.path.join(ARCHIVE_DIR, "index.db")
+
+_local = threading.local()
+
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+    """Where an archived conversation is stored."""
+    id: str
+    pack: int
+    offset: int
+    length: int
+    # Length of the fields before "messages" (see storage._serialize_conversation())
+    head_len: int
+    count: int
+    version: int
+    mtime_ns: int
+    # Packed (start, end) offsets of each message within the record
+    offsets: bytes
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        conn = sqlite3.connect(ARCHIVE_INDEX_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, pack INTEGER NOT NULL, offset INTEGER NOT NULL, "
+            "length INTEGER NOT NULL, head_len INTEGER NOT NULL, count INTEGER NOT NULL, "
+            "version INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "created_at TEXT, title TEXT, council_type TEXT, offsets BLOB NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        _local.conn = conn
+    return conn
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> int:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def _bump_generation(conn: sqlite3.Connection):
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
+
+
+def pack_path(pack: int) -> str:
+    """Get the path of a pack file."""
+    return os.path.join(ARCHIVE_DIR, f"pack-{pack:06d}.pack")
+
+
+def lookup(conversation_id: str) -> Optional[ArchiveEntry]:
+    """Get an archived conversation's entry, or None if it isn't archived."""
+    if not os.path.exists(ARCHIVE_INDEX_PATH):
+        return None
+    row = _conn().execute(
+        "SELECT id, pack, offset, length, head_len, count, version, mtime_ns, offsets "
+        "FROM conversations WHERE id = ?",
+        (conversation_id,)
+    ).fetchone()
+    return ArchiveEntry(*row) if row else None
+
+
+def read_ranges(entry: ArchiveEntry, ranges: List[Tuple[int, int]]) -> List[bytes]:
+    """
+    Read byte ranges of an archived conversation.
+
+    Args:
+        entry: The conversation's entry
+        ranges: (start, end) offsets within the conversation's record
+
+    Returns:
+        The bytes of each range
+    """
+    with open(pack_path(entry.pack), 'rb') as f:
+        chunks = []
+        for start, end in ranges:
+            f.seek(entry.offset + start)
+            chunks.append(f.read(end - start))
+    return chunks
+
+
+@contextmanager
+def compaction_lock():
+    """
+    Try to take the cross-process lock that guards appends to the packs.
+
+    Yields:
+        True if taken, False if another process holds it
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(ARCHIVE_DIR, ".compact.lock"), 'a') as lock_file:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def append(
+    head: Dict[str, Any],
+    data: bytes,
+    head_len: int,
+    offsets: bytes,
+    count: int,
+    mtime_ns: int
+) -> ArchiveEntry:
+    """
+    Append a serialized conversation to the current pack and index it.
+
+    The record is fsynced before it is indexed, so an indexed conversation
+    is always readable. Must be called under compaction_lock().
+
+    Args:
+        head: The conversation's fields other than messages
+        data: The serialized conversation
+        head_len: Length of the fields before "messages" in data
+        offsets: Packed (start, end) offsets of each message in data
+        count: Number of messages
+        mtime_ns: Modification time of the conversation file
+
+    Returns:
+        The new entry
+    """
+    conn = _conn()
+    pack = _get_meta(conn, "pack")
+    try:
+        size = os.path.getsize(pack_path(pack))
+    except FileNotFoundError:
+        size = 0
+    if size and size + len(data) > ARCHIVE_PACK_MAX_BYTES:
+        pack += 1
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('pack', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (pack,)
+        )
+
+    with open(pack_path(pack), 'ab') as f:
+        offset = f.tell()
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    entry = ArchiveEntry(
+        head["id"], pack, offset, len(data), head_len, count, head.get("version", 0), mtime_ns, offsets
+    )
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO conversations "
+            "(id, pack, offset, length, head_len, count, version, mtime_ns, "
+            "created_at, title, council_type, offsets) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.id, entry.pack, entry.offset, entry.length, entry.head_len, entry.count,
+                entry.version, entry.mtime_ns, head.get("created_at"), head.get("title"),
+                head.get("council_type"), entry.offsets
+            )
+        )
+        _bump_generation(conn)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return entry
+
+
+def remove(conversation_id: str) -> bool:
+    """
+    Drop a conversation from the index (its record stays in the pack).
+
+    Returns:
+        True if it was archived
+    """
+    if lookup(conversation_id) is None:
+        return False
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        removed = conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,)).rowcount
+        if removed:
+            _bump_generation(conn)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return bool(removed)
+
+
+def list_archived() -> List[Dict[str, Any]]:
+    """
+    List the archived conversations' metadata, without reading the packs.
+
+    Returns:
+        List of dicts with id, created_at, title, message_count and council_type
+    """
+    if not os.path.exists(ARCHIVE_INDEX_PATH):
+        return []
+    rows = _conn().execute("SELECT id, created_at, title, count, council_type FROM conversations")
+    return [
+        {
+            "id": conversation_id,
+            "created_at": created_at,
+            "title": title or "New Conversation",
+            "message_count": count,
+            "council_type": council_type or "premium",
+        }
+        for conversation_id, created_at, title, count, council_type in rows
+    ]
+
+
+def get_generation() -> int:
+    """Counter bumped whenever a conversation is archived or leaves the archive."""
+    if not os.path.exists(ARCHIVE_INDEX_PATH):
+        return 0
+    return _get_meta(_conn(), "generation")
+
+
+def get_archive_stats() -> Dict[str, Any]:
+    """
+    Size of the archive.
+
+    Returns:
+        Dict with conversations, packs, pack_bytes and live_bytes (bytes of
+        records still indexed; the rest were superseded or deleted)
+    """
+    conversations, live_bytes = 0, 0
+    if os.path.exists(ARCHIVE_INDEX_PATH):
+        conversations, live_bytes = _conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM conversations"
+        ).fetchone()
+    packs, pack_bytes = 0, 0
+    if os.path.isdir(ARCHIVE_DIR):
+        with os.scandir(ARCHIVE_DIR) as scan:
+            for entry in scan:
+                if entry.name.startswith("pack-") and entry.name.endswith(".pack"):
+                    packs += 1
+                    pack_bytes += entry.stat().st_size
+    return {
+        "conversations": conversations,
+        "packs": packs,
+        "pack_bytes": pack_bytes,
+        "live_bytes": live_bytes,
+    }
+
+
+async def run_compaction_loop():
+    """Background task: periodically archive conversations untouched for ARCHIVE_AFTER_DAYS."""
+    from . import storage
+
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return
+    while True:
+        try:
+            archived = await asyncio.to_thread(storage.compact_conversations)
+            if archived:
+                print(f"Archived {archived} conversations untouched for {ARCHIVE_AFTER_DAYS:g} days")
+        except Exception as e:
+            print(f"Error compacting conversations: {e}")
+        await asyncio.sleep(ARCHIVE_COMPACT_INTERVAL)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from . import storage
+
+    parser = argparse.ArgumentParser(description="Manage the conversation archive")
+    parser.add_argument("command", choices=["compact", "migrate", "stats"],
+                        help="compact: archive old conversations; migrate: move flat conversation "
+                             "files into shard directories; stats: show the archive's size")
+    parser.add_argument("--days", type=float, default=None,
+                        help="Archive conversations untouched for this many days (default: ARCHIVE_AFTER_DAYS)")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Archived {storage.compact_conversations(args.days)} conversations into {ARCHIVE_DIR}")
+    elif args.command == "migrate":
+        print(f"Moved {storage.migrate_flat_layout()} conversations into shard directories")
+    print(json.dumps(get_archive_stats(), indent=2))
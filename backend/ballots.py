@@ -0,0 +1,358 @@
+"""Stage 2 ballots: JSON/structured prompts, strict parsing and targeted re-asks.
+
+A ballot is a judge's ranking of the anonymized Stage 1 responses. It is
+only counted if every label appears exactly once and no other label
+does; a ballot that fails this gets one cheap follow-up asking the judge
+for just the ranking (its own evaluation is sent back, not the
+responses). Ballots that still fail are stored with a `parse_error` and
+left out of the aggregate rankings.
+
+Labels run A..Z, then AA, AB, ... so councils of any size can be judged.
+With sharding, each judge ranks only a subset of the responses (see
+shard_design()) and its ballot is validated against that subset.
+"""
+
+import json
+import random
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+from .openrouter import query_model
+from . import metrics
+
+# One ranking line: "1. Response A", "2) **Response B**"
+_RANKING_LINE = re.compile(r'\s*\d+\s*[.)]\s*\**\s*(Response [A-Z]+)\s*\**\s*$')
+_JSON_RANKING = re.compile(r'"final_ranking"\s*:\s*\[([^\]]*)\]')
+_LABEL = re.compile(r'Response [A-Z]+')
+
+# Outcomes counted per judge model in the stage2_ballots counter
+BALLOT_OUTCOMES = ("ok", "reasked", "invalid")
+
+
+def response_label(index: int) -> str:
+    """Anonymous label for the index-th response: A..Z, AA..AZ, BA, ..."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def effective_shard_size(num_responses: int, num_judges: int, shard_size: int) -> int:
+    """
+    Responses per judge actually used by shard_design().
+
+    Returns num_responses when sharding is off (shard_size 0) or wouldn't
+    save anything; otherwise shard_size, raised if needed so that
+    neighbouring shards overlap.
+    """
+    if num_judges <= 0 or shard_size <= 0 or shard_size >= num_responses:
+        return num_responses
+    stride = -(-num_responses // num_judges)
+    return min(num_responses, max(shard_size, stride + 1))
+
+
+def shard_design(
+    num_responses: int,
+    num_judges: int,
+    shard_size: int,
+    rng: Optional[random.Random] = None
+) -> List[List[int]]:
+    """
+    Assign each judge a subset of the responses in a balanced incomplete design.
+
+    The responses are placed on a ring in random order and judge j gets the
+    consecutive responses starting at offset j * N / J. Every response is
+    then ranked by floor or ceil of J * shard_size / N judges, and
+    neighbouring shards overlap, so the pairwise comparisons form one
+    connected graph that can be merged into a global ranking.
+
+    Args:
+        num_responses: Number of Stage 1 responses (N)
+        num_judges: Number of judges (J)
+        shard_size: Responses per judge (see effective_shard_size())
+        rng: Random source (default: a fresh random.Random())
+
+    Returns:
+        One sorted list of response indices per judge
+    """
+    size = effective_shard_size(num_responses, num_judges, shard_size)
+    if size >= num_responses:
+        return [list(range(num_responses)) for _ in range(num_judges)]
+    if size != shard_size:
+        print(f"DEBUG: Raised Stage 2 shard size from {shard_size} to {size} for {num_judges} judges")
+
+    ring = list(range(num_responses))
+    (rng or random.Random()).shuffle(ring)
+    shards = []
+    for judge in range(num_judges):
+        offset = judge * num_responses // num_judges
+        shards.append(sorted(ring[(offset + i) % num_responses] for i in range(size)))
+    return shards
+
+
+def ballot_schema(names: List[str], compact: bool = False, ranking_only: bool = False) -> Dict[str, Any]:
+    """
+    JSON schema for a structured-output ballot, as an OpenRouter response_format.
+
+    Only keywords accepted by strict structured output are used; the
+    "each label exactly once" rule is checked by validate_ballot().
+
+    Args:
+        names: Response labels ("Response A", ...)
+        compact: One-sentence critiques per label instead of a free-form evaluation
+        ranking_only: Just the ranking (for re-asks)
+
+    Returns:
+        Dict to send as `response_format`
+    """
+    properties: Dict[str, Any] = {}
+    if not ranking_only and not compact:
+        properties["evaluation"] = {"type": "string"}
+    properties["final_ranking"] = {"type": "array", "items": {"type": "string", "enum": names}}
+    if not ranking_only and compact:
+        properties["critiques"] = {
+            "type": "object",
+            "properties": {name: {"type": "string"} for name in names},
+            "required": names,
+            "additionalProperties": False,
+        }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "ballot",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def build_json_ranking_prompt(user_query: str, responses_text: str, names: List[str], compact: bool = False) -> str:
+    """
+    Build the Stage 2 prompt asking for a JSON ballot.
+
+    In compact mode the ranking comes first, so it survives even if the
+    reply is cut off at max_tokens; otherwise the judge evaluates first.
+
+    Args:
+        user_query: The original user query
+        responses_text: The anonymized responses
+        names: Response labels in order ("Response A", ...)
+        compact: Ask for one-sentence critiques instead of a full evaluation
+
+    Returns:
+        Prompt text
+    """
+    if compact:
+        example = {
+            "final_ranking": list(reversed(names)),
+            "critiques": {name: "<one sentence>" for name in names},
+        }
+        task = "Rank the responses from best to worst and give each one a one-sentence critique."
+        limits = "keep each critique under 30 words"
+    else:
+        example = {
+            "evaluation": "<for each response, what it does well and what it does poorly>",
+            "final_ranking": list(reversed(names)),
+        }
+        task = "First evaluate each response individually, then rank them from best to worst."
+        limits = "put only labels in the ranking"
+
+    return f"""You are evaluating different responses to the following question:
+
+Question: {user_query}
+
+Here are the responses from different models (anonymized):
+
+{responses_text}
+
+{task}
+Reply with ONLY a JSON object of exactly this shape, and no other text:
+
+{json.dumps(example)}
+
+The order shown is only an example. Include every response exactly once in "final_ranking", and {limits}."""
+
+
+def validate_ballot(ranking: List[str], names: List[str]) -> Optional[str]:
+    """
+    Check that a ranking lists every label exactly once and nothing else.
+
+    Returns:
+        None if valid, else a short description of the first problem
+    """
+    valid = set(names)
+    seen = set()
+    for label in ranking:
+        if label not in valid:
+            return f"unknown label '{label}'"
+        if label in seen:
+            return f"{label} is listed twice"
+        seen.add(label)
+    missing = [name for name in names if name not in seen]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    return None
+
+
+def parse_ballot(text: str, names: List[str]) -> Dict[str, Any]:
+    """
+    Strictly parse a judge's reply (JSON object or FINAL RANKING block).
+
+    JSON replies may be wrapped in a code fence; if the object is cut off
+    after a complete "final_ranking" array, that array is still used. Text
+    replies use the last FINAL RANKING block, read line by line until the
+    first line that isn't a ranking entry.
+
+    Args:
+        text: The judge's reply
+        names: Valid labels ("Response A", ...)
+
+    Returns:
+        Dict with 'format' ("json", "text" or None), 'ranking' (validated
+        labels, or None), 'error' (None if valid), 'evaluation' and
+        'critiques' (from JSON replies)
+    """
+    ballot: Dict[str, Any] = {"format": None, "ranking": None, "error": None, "evaluation": None, "critiques": {}}
+    ranking: Optional[List[str]] = None
+    start = text.find('{')
+    marker = text.rfind("FINAL RANKING:")
+
+    if start != -1 and (marker == -1 or start < marker) and '"final_ranking"' in text:
+        ballot["format"] = "json"
+        try:
+            data = json.loads(text[start:text.rfind('}') + 1])
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            if isinstance(data.get("final_ranking"), list):
+                ranking = [str(label) for label in data["final_ranking"]]
+            if isinstance(data.get("evaluation"), str):
+                ballot["evaluation"] = data["evaluation"]
+            if isinstance(data.get("critiques"), dict):
+                ballot["critiques"] = {str(k): str(v) for k, v in data["critiques"].items()}
+        else:
+            match = _JSON_RANKING.search(text)
+            if match:
+                ranking = _LABEL.findall(match.group(1))
+        if ranking is None:
+            ballot["error"] = "no complete \"final_ranking\" array"
+            return ballot
+    elif marker != -1:
+        ballot["format"] = "text"
+        ranking = []
+        for line in text[marker + len("FINAL RANKING:"):].splitlines():
+            if not line.strip():
+                continue
+            match = _RANKING_LINE.match(line)
+            if match is None:
+                break
+            ranking.append(match.group(1))
+        ballot["evaluation"] = text[:marker].strip()
+    else:
+        ballot["error"] = "no FINAL RANKING: block"
+        return ballot
+
+    ballot["error"] = validate_ballot(ranking, names)
+    if ballot["error"] is None:
+        ballot["ranking"] = ranking
+    return ballot
+
+
+def render_ballot(ballot: Dict[str, Any], ranking: List[str]) -> str:
+    """Render a JSON ballot as evaluation (or critique lines) plus a FINAL RANKING block."""
+    evaluation = ballot.get("evaluation") or "\n".join(
+        f"{label}: {critique}" for label, critique in sorted(ballot["critiques"].items())
+    )
+    lines = "\n".join(f"{position}. {label}" for position, label in enumerate(ranking, start=1))
+    return f"{evaluation}\n\nFINAL RANKING:\n{lines}".lstrip()
+
+
+async def reask_ranking(
+    model: str,
+    evaluation: str,
+    names: List[str],
+    error: str,
+    structured: bool = False,
+    deadline: Optional[float] = None
+) -> Tuple[Optional[List[str]], Optional[Dict[str, Any]]]:
+    """
+    Ask a judge again for just its ranking.
+
+    The prompt carries the judge's own evaluation (the tail of it, if long)
+    and the valid labels, not the Stage 1 responses, so the call is short.
+
+    Args:
+        model: Judge model
+        evaluation: The judge's evaluation text from its first reply
+        names: Valid labels
+        error: What was wrong with the first ballot
+        structured: Request the ranking as structured output
+        deadline: time.monotonic() by which the call must finish
+
+    Returns:
+        Tuple of (validated ranking or None, usage of the call or None)
+    """
+    example = "\n".join(f"{position}. {name}" for position, name in enumerate(names, start=1))
+    format_text = (
+        'Reply with ONLY a JSON object {"final_ranking": [...]} listing the labels best first.'
+        if structured else
+        f"Reply with ONLY the ranking, best first, formatted EXACTLY like this (order is only an example):\n\nFINAL RANKING:\n{example}"
+    )
+    prompt = f"""You evaluated {len(names)} anonymized responses ({', '.join(names)}), but the final ranking in your reply could not be read: {error}.
+
+Your evaluation:
+{evaluation[-6000:]}
+
+{format_text}
+Every label must appear exactly once."""
+
+    params = {"response_format": ballot_schema(names, ranking_only=True)} if structured else None
+    response = await query_model(
+        model,
+        [{"role": "user", "content": prompt}],
+        extract_final_content_flag=True,
+        stage="stage2_retry",
+        params=params,
+        deadline=deadline
+    )
+    if response is None:
+        return None, None
+    return parse_ballot(response.get('content', ''), names)["ranking"], response.get('usage')
+
+
+def get_ballot_stats() -> List[Dict[str, Any]]:
+    """
+    Stage 2 ballot parse outcomes per judge model.
+
+    Returns:
+        List of dicts with model, ballots, reasked, invalid, parse_failure_rate
+        (first reply unreadable) and invalid_rate (still unreadable after the
+        re-ask), sorted by parse_failure_rate
+    """
+    counts: Dict[str, Dict[str, float]] = {}
+    for labels, value in metrics.get_counters("stage2_ballots"):
+        counts.setdefault(labels.get("model", "unknown"), {})[labels.get("outcome")] = value
+
+    stats = []
+    for model, outcomes in counts.items():
+        total = sum(outcomes.get(outcome, 0) for outcome in BALLOT_OUTCOMES)
+        if not total:
+            continue
+        failed = outcomes.get("reasked", 0) + outcomes.get("invalid", 0)
+        stats.append({
+            "model": model,
+            "ballots": int(total),
+            "reasked": int(outcomes.get("reasked", 0)),
+            "invalid": int(outcomes.get("invalid", 0)),
+            "parse_failure_rate": round(failed / total, 4),
+            "invalid_rate": round(outcomes.get("invalid", 0) / total, 4),
+        })
+    stats.sort(key=lambda s: -s["parse_failure_rate"])
+    return stats
@@ -0,0 +1,153 @@
+"""Cascade councils: answer with a cheap council, escalate only when needed.
+
+A cascade council (council type "cascade" by default, or any registry
+council with a `cascade: [first tier, escalation tier]` entry) runs the
+first tier's Stage 1 and Stage 2. Its confidence is how much the first
+tier's judges agree on the ranking of the answers (Kendall's W, see
+ranking.concordance()):
+
+- at or above the threshold, the first tier's chairman answers
+- below it, the escalation tier's members answer too, its judges rank all
+  the answers (the first tier's are kept as extra candidates) and its
+  chairman writes the final answer
+
+Escalation is skipped when the run's deadline or budget leaves no room
+for it. The decision is stored in the message under 'cascade'; the
+escalation rate and the latency and cost of each path are reported by
+get_cascade_stats().
+"""
+
+from typing import List, Dict, Any, Optional
+
+from .config import BUDGET_MAX_RUN_COST, BUDGET_MAX_CONVERSATION_COST, CASCADE_CONFIDENCE_THRESHOLD
+from .registry import CouncilSpec, get_registry
+from .ranking import ballots_from_run, concordance
+from . import costs
+from . import metrics
+from . import storage
+
+PATH_FIRST_TIER = "first_tier"
+PATH_ESCALATED = "escalated"
+PATHS = (PATH_FIRST_TIER, PATH_ESCALATED)
+
+
+def cascade_spec(council_type: str) -> Optional[CouncilSpec]:
+    """The council's spec if it is a cascade, else None."""
+    spec = get_registry().councils.get(council_type)
+    return spec if spec is not None and spec.cascade else None
+
+
+def decide(
+    stage2_results: List[Dict[str, Any]],
+    label_to_model: Dict[str, str],
+    spec: CouncilSpec
+) -> Dict[str, Any]:
+    """
+    Decide whether a cascade run escalates, from the first tier's Stage 2.
+
+    Args:
+        stage2_results: The first tier's rankings
+        label_to_model: Mapping from anonymous labels to model names
+        spec: The cascade council
+
+    Returns:
+        Dict with tiers, confidence, threshold, ballots, escalated and reason
+        ("confident", "low_agreement" or "too_few_ballots"; the runner
+        uses "no_time" or "over_budget" when it can't escalate after all)
+    """
+    threshold = spec.threshold if spec.threshold is not None else CASCADE_CONFIDENCE_THRESHOLD
+    ballots = ballots_from_run(stage2_results, label_to_model)
+    if len(ballots.judges) < 2 or len(ballots.candidates) < 2:
+        # Agreement can't be measured: don't trust the first tier
+        confidence, reason = 0.0, "too_few_ballots"
+    else:
+        confidence = concordance(ballots)
+        reason = "confident" if confidence >= threshold else "low_agreement"
+    return {
+        "tiers": list(spec.cascade),
+        "confidence": round(confidence, 4),
+        "threshold": threshold,
+        "ballots": len(ballots.judges),
+        "escalated": reason != "confident",
+        "reason": reason,
+    }
+
+
+def escalation_fits_budget(
+    conversation_id: str,
+    user_query: str,
+    members: List[str],
+    chairman: str,
+    run_cost: float
+) -> bool:
+    """
+    Whether escalating (the new members' answers, a second Stage 2 and the
+    escalation chairman) is estimated to fit the budget caps.
+
+    Args:
+        conversation_id: Conversation of the run (its spending counts against
+            BUDGET_MAX_CONVERSATION_COST)
+        user_query: The user's question
+        members: Escalation tier members that haven't answered yet
+        chairman: Escalation tier chairman
+        run_cost: What the run has cost so far
+    """
+    limits = []
+    if BUDGET_MAX_RUN_COST > 0:
+        limits.append(BUDGET_MAX_RUN_COST - run_cost)
+    if BUDGET_MAX_CONVERSATION_COST > 0:
+        conversation = storage.get_conversation(conversation_id)
+        spent = costs.conversation_usage(conversation)["total"]["cost"] if conversation else 0.0
+        limits.append(BUDGET_MAX_CONVERSATION_COST - spent)
+    if not limits:
+        return True
+    return costs.estimate_run(user_query, members, chairman)["total"]["cost"] <= min(limits)
+
+
+def record_run(decision: Dict[str, Any], seconds: float, cost: float):
+    """Count a completed cascade run under its path, with its latency and cost."""
+    path = PATH_ESCALATED if decision.get("escalated") else PATH_FIRST_TIER
+    metrics.incr("cascade_runs", path=path, reason=decision.get("reason", "unknown"))
+    metrics.incr("cascade_seconds", seconds, path=path)
+    metrics.incr("cascade_cost", cost, path=path)
+    metrics.observe("cascade_run_seconds", seconds, path=path)
+
+
+def get_cascade_stats() -> Dict[str, Any]:
+    """
+    Escalation rate and per-path latency and cost of cascade runs.
+
+    Returns:
+        Dict with runs, escalation_rate, reasons (runs per decision reason)
+        and paths (runs, mean_seconds, mean_cost and total_cost per path)
+    """
+    runs = {path: 0.0 for path in PATHS}
+    reasons: Dict[str, int] = {}
+    for labels, value in metrics.get_counters("cascade_runs"):
+        path = labels.get("path")
+        if path in runs:
+            runs[path] += value
+        reason = labels.get("reason", "unknown")
+        reasons[reason] = reasons.get(reason, 0) + int(value)
+    totals = {
+        name: {labels.get("path"): value for labels, value in metrics.get_counters(name)}
+        for name in ("cascade_seconds", "cascade_cost")
+    }
+
+    total_runs = sum(runs.values())
+    paths = {}
+    for path, count in runs.items():
+        seconds = totals["cascade_seconds"].get(path, 0.0)
+        cost = totals["cascade_cost"].get(path, 0.0)
+        paths[path] = {
+            "runs": int(count),
+            "mean_seconds": round(seconds / count, 3) if count else None,
+            "mean_cost": round(cost / count, 6) if count else None,
+            "total_cost": round(cost, 6),
+        }
+    return {
+        "runs": int(total_runs),
+        "escalation_rate": round(runs[PATH_ESCALATED] / total_runs, 4) if total_runs else None,
+        "reasons": reasons,
+        "paths": paths,
+    }
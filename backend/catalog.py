@@ -0,0 +1,199 @@
+"""Index of the conversation list metadata for conversations in DATA_DIR.
+
+Listing conversations used to open every conversation file to read its
+title and message count, which gets slow with hundreds of thousands of
+files. storage.save_conversation() and storage.delete_conversation() keep
+the list metadata (title, created_at, message count, council type) of
+every conversation in DATA_DIR in an SQLite index (catalog.db, next to the
+shard directories) instead, so the list is one query. Archived
+conversations are listed from the archive index (see archive.py).
+
+Every change bumps a generation counter, which versions the list across
+worker processes (see storage.get_list_version()).
+
+The index is built from the conversation files the first time it is
+needed; to rebuild it by hand:
+
+    uv run python -m backend.catalog --rebuild
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Iterable, Tuple
+
+from .config import DATA_DIR
+
+CATALOG_PATH = os.path.join(DATA_DIR, "catalog.db")
+
+_local = threading.local()
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        conn = sqlite3.connect(CATALOG_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, created_at TEXT, title TEXT, "
+            "message_count INTEGER NOT NULL, council_type TEXT)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        _local.conn = conn
+    return conn
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> int:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: int):
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, value)
+    )
+
+
+def _bump_generation(conn: sqlite3.Connection):
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
+    _set_meta(conn, "modified_ns", time.time_ns())
+
+
+def _row(conversation_id: str, head: Dict[str, Any], message_count: int) -> Tuple[Any, ...]:
+    return (conversation_id, head.get("created_at"), head.get("title"), message_count, head.get("council_type"))
+
+
+def upsert(conversation_id: str, head: Dict[str, Any], message_count: int):
+    """
+    Record a conversation's list metadata after it was saved.
+
+    Args:
+        conversation_id: Conversation identifier
+        head: The conversation's fields other than messages
+        message_count: Number of messages
+    """
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO conversations (id, created_at, title, message_count, council_type) "
+            "VALUES (?, ?, ?, ?, ?)",
+            _row(conversation_id, head, message_count)
+        )
+        _bump_generation(conn)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def remove(conversation_id: str):
+    """Drop a conversation that was deleted or moved to the archive."""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,)).rowcount:
+            _bump_generation(conn)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def is_built() -> bool:
+    """Whether the index was built from the conversation files (see fill())."""
+    return bool(_get_meta(_conn(), "built"))
+
+
+def fill(entries: Iterable[Tuple[str, Dict[str, Any], int]]):
+    """
+    Add conversations missing from the index and mark it built.
+
+    Rows written by saves in the meantime are kept, since they are newer
+    than what a scan read.
+
+    Args:
+        entries: (conversation_id, head, message_count) for each conversation
+    """
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT OR IGNORE INTO conversations (id, created_at, title, message_count, council_type) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (_row(conversation_id, head, count) for conversation_id, head, count in entries)
+        )
+        _set_meta(conn, "built", 1)
+        _bump_generation(conn)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def clear():
+    """Empty the index, so the next fill() rebuilds it."""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM conversations")
+        _set_meta(conn, "built", 0)
+        _bump_generation(conn)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def list_live() -> List[Dict[str, Any]]:
+    """
+    List the metadata of the conversations in DATA_DIR.
+
+    Returns:
+        List of dicts with id, created_at, title, message_count and council_type
+    """
+    rows = _conn().execute("SELECT id, created_at, title, message_count, council_type FROM conversations")
+    return [
+        {
+            "id": conversation_id,
+            "created_at": created_at,
+            "title": title or "New Conversation",
+            "message_count": message_count,
+            "council_type": council_type or "premium",
+        }
+        for conversation_id, created_at, title, message_count, council_type in rows
+    ]
+
+
+def get_generation() -> Tuple[int, int]:
+    """
+    Counter bumped by every change to the index, and the time of the last one.
+
+    Returns:
+        Tuple of (generation, time of the last change in nanoseconds, 0 if none)
+    """
+    conn = _conn()
+    return _get_meta(conn, "generation"), _get_meta(conn, "modified_ns")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from . import storage
+
+    parser = argparse.ArgumentParser(description="Manage the conversation list index")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index from the conversation files")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"Indexed {storage.rebuild_catalog()} conversations into {CATALOG_PATH}")
+    else:
+        parser.print_help()
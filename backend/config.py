@@ -12,6 +12,7 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 COUNCIL_TYPE_PREMIUM = "premium"
 COUNCIL_TYPE_ECONOMIC = "economic"
 COUNCIL_TYPE_FREE = "free"
+COUNCIL_TYPE_CASCADE = "cascade"
 
 # Premium Council members - list of OpenRouter model identifiers
 COUNCIL_MODELS_PREMIUM = [
@@ -47,6 +48,14 @@ COUNCIL_MODELS_FREE = [
 # Free Chairman model - synthesizes final response
 CHAIRMAN_MODEL_FREE = "deepseek/deepseek-r1-distill-llama-70b:free"  # Falls back to paid version if unavailable
 
+# Cascade council: runs the first tier, and escalates to the second only when
+# the first tier's Stage 2 rankings agree less than the threshold (Kendall's W,
+# 0 = no agreement, 1 = identical rankings). The first tier's Stage 1 answers
+# are kept as extra candidates for the escalated run.
+CASCADE_FIRST_TIER = os.getenv("CASCADE_FIRST_TIER", COUNCIL_TYPE_ECONOMIC)
+CASCADE_ESCALATION_TIER = os.getenv("CASCADE_ESCALATION_TIER", COUNCIL_TYPE_PREMIUM)
+CASCADE_CONFIDENCE_THRESHOLD = float(os.getenv("CASCADE_CONFIDENCE_THRESHOLD", "0.6"))
+
 # Fallback mapping: free models -> paid versions for automatic fallback
 MODEL_FALLBACK_MAP = {
     "mistralai/mistral-small-24b-instruct-2501:free": "mistralai/mistral-small-24b-instruct-2501",
@@ -56,12 +65,205 @@ MODEL_FALLBACK_MAP = {
     # Note: xai/grok-4-fast:free and xai/grok-4-fast are not available, removed from config
 }
 
+# Council registry file (JSON, or YAML if PyYAML is installed).
+# When present it overrides the built-in councils above and is hot-reloaded
+# on change; see council.example.json for the format.
+COUNCIL_CONFIG_FILE = os.getenv("COUNCIL_CONFIG_FILE", "data/council.json")
+
+# How often (seconds) to check the registry file for changes
+COUNCIL_CONFIG_RELOAD_INTERVAL = float(os.getenv("COUNCIL_CONFIG_RELOAD_INTERVAL", "5"))
+
+# Per-model defaults for models without explicit registry attributes
+DEFAULT_MODEL_TIMEOUT = 120.0
+DEFAULT_CONTEXT_WINDOW = 128000
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Circuit breaker settings (per upstream model)
+# A breaker opens when the error rate over the rolling window reaches the
+# threshold (with at least BREAKER_MIN_REQUESTS samples), or after
+# BREAKER_TIMEOUT_THRESHOLD consecutive timeouts.
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "300"))
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "3"))
+BREAKER_ERROR_THRESHOLD = float(os.getenv("BREAKER_ERROR_THRESHOLD", "0.5"))
+BREAKER_TIMEOUT_THRESHOLD = int(os.getenv("BREAKER_TIMEOUT_THRESHOLD", "2"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+BREAKER_MAX_COOLDOWN_SECONDS = float(os.getenv("BREAKER_MAX_COOLDOWN_SECONDS", "600"))
+
+# Background probe of open breakers
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "20"))
+
+# Startup warm-up: connect to every provider and list its models before
+# reporting ready (GET /api/ready). Readiness is reported after
+# WARMUP_TIMEOUT_SECONDS even if some requests are still pending.
+# WARMUP_PROBE_MODELS also sends a one-word completion to every council
+# member and chairman on each worker start; off by default since those
+# calls are billed.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+WARMUP_PROBE_TIMEOUT = float(os.getenv("WARMUP_PROBE_TIMEOUT", "15"))
+WARMUP_PROBE_MODELS = os.getenv("WARMUP_PROBE_MODELS", "false").lower() == "true"
+
 # Legacy aliases for backward compatibility
 COUNCIL_MODELS = COUNCIL_MODELS_PREMIUM
 CHAIRMAN_MODEL = CHAIRMAN_MODEL_PREMIUM
 
-# OpenRouter API endpoint
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+# OpenRouter API endpoint (override to point at the offline mock server)
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# Model providers. The "openrouter" provider (OPENROUTER_API_URL with
+# OPENROUTER_API_KEY) is always defined and used by default; other
+# OpenAI-compatible servers (vLLM, llama.cpp...) are declared under
+# "providers" in the council config, each with its own connection pool.
+DEFAULT_PROVIDER = "openrouter"
+DEFAULT_PROVIDER_MAX_CONCURRENCY = 32
+DEFAULT_PROVIDER_MAX_CONNECTIONS = 64
+
+# Speculative chairman: start Stage 3 on the Stage 1 answers in parallel
+# with Stage 2, then accept or briefly refine the draft. Can also be set
+# per request with the "speculative" field.
+SPECULATIVE_CHAIRMAN = os.getenv("SPECULATIVE_CHAIRMAN", "false").lower() == "true"
+
+# Generation parameters sent with each call, per stage. Per-model
+# "generation" settings in the council registry take precedence; None
+# leaves a parameter to the provider's default. Stage 2 only needs a short
+# critique and the ranking, so it is capped and asks for little reasoning.
+STAGE2_REASONING_EFFORT = os.getenv("STAGE2_REASONING_EFFORT", "low")
+STAGE_GENERATION_PARAMS = {
+    "stage1": {
+        "max_tokens": int(os.getenv("STAGE1_MAX_TOKENS", "0")) or None,
+    },
+    "stage2": {
+        "max_tokens": int(os.getenv("STAGE2_MAX_TOKENS", "2000")) or None,
+        "temperature": float(os.getenv("STAGE2_TEMPERATURE", "0.2")),
+        "reasoning": {"effort": STAGE2_REASONING_EFFORT} if STAGE2_REASONING_EFFORT else None,
+    },
+    "stage3": {
+        "max_tokens": int(os.getenv("STAGE3_MAX_TOKENS", "0")) or None,
+    },
+    "stage2_retry": {"max_tokens": 1000, "temperature": 0, "reasoning": {"effort": "low"}},
+    "summary": {"max_tokens": 1000, "temperature": 0.2},
+    "title": {"max_tokens": 512, "temperature": 0.2, "reasoning": {"effort": "low"}},
+}
+
+# Compact Stage 2: judges reply with a JSON ranking and one-line critiques
+# instead of a full evaluation of every response. Reasoning may use at most
+# half of STAGE2_COMPACT_MAX_TOKENS, so the ranking always fits.
+STAGE2_COMPACT = os.getenv("STAGE2_COMPACT", "false").lower() == "true"
+STAGE2_COMPACT_MAX_TOKENS = int(os.getenv("STAGE2_COMPACT_MAX_TOKENS", "1000"))
+
+# Request Stage 2 ballots as JSON-schema structured output from models whose
+# registry entry sets "structured_output", and re-ask a judge for just its
+# ranking when its ballot can't be read
+STAGE2_STRUCTURED = os.getenv("STAGE2_STRUCTURED", "true").lower() == "true"
+STAGE2_REASK = os.getenv("STAGE2_REASK", "true").lower() == "true"
+
+# Sharded Stage 2: each judge ranks only this many of the responses (0 = all
+# of them), so prompt size per judge stays fixed as the council grows. Shards
+# follow a balanced incomplete design and are merged with Bradley-Terry.
+STAGE2_SHARD_SIZE = int(os.getenv("STAGE2_SHARD_SIZE", "0"))
 
 # Data directory for conversation storage
 DATA_DIR = "data/conversations"
+
+# Conversation archive: a background job moves conversations untouched for
+# ARCHIVE_AFTER_DAYS (0 = never) out of DATA_DIR into append-only pack files
+# in ARCHIVE_DIR, indexed by byte offset. It runs every
+# ARCHIVE_COMPACT_INTERVAL seconds; a pack is closed once it reaches
+# ARCHIVE_PACK_MAX_MB.
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "data/archive")
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_COMPACT_INTERVAL = float(os.getenv("ARCHIVE_COMPACT_INTERVAL", "3600"))
+ARCHIVE_PACK_MAX_BYTES = int(float(os.getenv("ARCHIVE_PACK_MAX_MB", "512")) * 1024 * 1024)
+
+# Directory for shared state (SQLite databases, caches)
+STATE_DIR = os.getenv("STATE_DIR", "data")
+
+# Number of worker processes (standard uvicorn/gunicorn env var)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Shared state backend for metrics, rate limits and caches:
+# "local" (in-process, single worker) or "sqlite" (safe across workers).
+# Defaults to "sqlite" when running more than one worker.
+SHARED_STATE_BACKEND = os.getenv(
+    "SHARED_STATE_BACKEND",
+    "sqlite" if WEB_CONCURRENCY > 1 else "local"
+)
+SHARED_STATE_PATH = os.path.join(STATE_DIR, "shared.db")
+
+# Metrics are buffered in each process and written to the shared state
+# backend in one batch every this many seconds, off the event loop
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+# Full-text search index over conversation history
+SEARCH_INDEX_PATH = os.path.join(STATE_DIR, "search.db")
+# Also index every Stage 1 answer (larger index), not just questions and Stage 3
+SEARCH_INDEX_STAGE1 = os.getenv("SEARCH_INDEX_STAGE1", "false").lower() == "true"
+
+# Model leaderboard statistics, updated as council runs complete
+LEADERBOARD_PATH = os.path.join(STATE_DIR, "leaderboard.db")
+# Ignore judges' votes on their own Stage 1 answer (re-run the backfill after changing)
+LEADERBOARD_EXCLUDE_SELF = os.getenv("LEADERBOARD_EXCLUDE_SELF", "true").lower() == "true"
+
+# Token and cost history per model and stage (used for pre-flight estimates)
+USAGE_PATH = os.path.join(STATE_DIR, "usage.db")
+
+# Budget caps in USD (0 = no cap). A run estimated to exceed the cap is
+# trimmed (most expensive members dropped, down to BUDGET_MIN_MEMBERS),
+# then moved to BUDGET_FALLBACK_COUNCIL, and refused if it still doesn't fit.
+BUDGET_MAX_RUN_COST = float(os.getenv("BUDGET_MAX_RUN_COST", "0"))
+BUDGET_MAX_CONVERSATION_COST = float(os.getenv("BUDGET_MAX_CONVERSATION_COST", "0"))
+BUDGET_MIN_MEMBERS = int(os.getenv("BUDGET_MIN_MEMBERS", "2"))
+BUDGET_FALLBACK_COUNCIL = os.getenv("BUDGET_FALLBACK_COUNCIL", COUNCIL_TYPE_ECONOMIC)
+
+# Max council runs per client per minute (0 disables rate limiting)
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "0"))
+
+# Server-Sent Events transport: a keep-alive comment is sent after this many
+# idle seconds (so proxies don't drop the connection during slow stages),
+# streams are gzip-compressed for clients that accept it, and at most
+# SSE_QUEUE_SIZE events are buffered for a slow client before the run waits.
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_COMPRESSION = os.getenv("SSE_COMPRESSION", "true").lower() == "true"
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "16"))
+
+# WebSocket transport (/api/ws): many concurrent runs share one connection, at
+# most WS_MAX_RUNS at a time, and at most WS_QUEUE_SIZE events of all of them
+# are buffered for a slow client before the runs wait.
+WS_MAX_RUNS = int(os.getenv("WS_MAX_RUNS", "8"))
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "32"))
+
+# Single-flight coalescing (per worker process): identical concurrent council
+# runs (same question, council and options) share one run, each conversation
+# still getting its own stored message; identical concurrent model calls
+# share one request
+COALESCE_RUNS = os.getenv("COALESCE_RUNS", "true").lower() == "true"
+COALESCE_MODEL_CALLS = os.getenv("COALESCE_MODEL_CALLS", "true").lower() == "true"
+
+# Near-duplicate question cache: answer a question from an earlier run of
+# the same council whose question is at least NEARDUP_THRESHOLD similar
+# (MinHash estimate of shingle Jaccard similarity). "instant" serves the
+# stored answer; "refresh" serves it and re-runs the council in the
+# background to replace it; "off" disables the cache and its index.
+NEARDUP_CACHE = os.getenv("NEARDUP_CACHE", "off")
+NEARDUP_THRESHOLD = float(os.getenv("NEARDUP_THRESHOLD", "0.8"))
+NEARDUP_MAX_AGE_DAYS = float(os.getenv("NEARDUP_MAX_AGE_DAYS", "30"))
+NEARDUP_INDEX_PATH = os.path.join(STATE_DIR, "neardup.db")
+
+# Deadlines: a run's total time budget (seconds; 0 = none, requests can
+# set their own) is split into Stage 1/2/3 shares. Stage 2 is skipped, and
+# Stage 3 replaced by the best Stage 1 answer, when less than
+# DEADLINE_MIN_STAGE_SECONDS are left for them.
+DEADLINE_DEFAULT_SECONDS = float(os.getenv("DEADLINE_DEFAULT_SECONDS", "0"))
+DEADLINE_STAGE_SHARES = [
+    float(share) for share in os.getenv("DEADLINE_STAGE_SHARES", "0.5,0.25,0.25").split(",") if share.strip()
+]
+DEADLINE_MIN_STAGE_SECONDS = float(os.getenv("DEADLINE_MIN_STAGE_SECONDS", "3"))
+
+# On-demand run profiling: requests carrying this token (X-Profile-Run
+# header or ?profile=) run under a sampling profiler, and the profiles
+# endpoints require it. Empty disables profiling.
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILES_DIR = os.path.join(STATE_DIR, "profiles")
+PROFILES_MAX_KEEP = int(os.getenv("PROFILES_MAX_KEEP", "50"))
@@ -0,0 +1,433 @@
+"""Token and cost accounting, pre-flight estimates and budget caps.
+
+Every model call returns a compact usage record (model, prompt and
+completion tokens, USD cost). Records are rolled up per stage into the
+assistant message (`usage`), per conversation on read, and per council
+tier and model/stage into SQLite statistics (data/usage.db). The
+per-model completion lengths recorded there drive the pre-flight
+estimate of a run's cost, which budget caps are checked against.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from .config import (
+    USAGE_PATH,
+    BUDGET_MAX_RUN_COST,
+    BUDGET_MAX_CONVERSATION_COST,
+    BUDGET_MIN_MEMBERS,
+    BUDGET_FALLBACK_COUNCIL,
+    STAGE2_SHARD_SIZE,
+)
+from .registry import get_registry, get_model_spec
+
+STAGES = ("stage1", "stage2", "stage3")
+
+# Completion length assumed for a model/stage without history
+DEFAULT_COMPLETION_TOKENS = {"stage1": 1000, "stage2": 800, "stage3": 1200}
+# Approximate size of the fixed Stage 2 / Stage 3 prompt templates
+PROMPT_OVERHEAD_TOKENS = {"stage1": 0, "stage2": 350, "stage3": 200}
+
+
+class BudgetExceededError(Exception):
+    """A run can't be made to fit the configured budget."""
+
+
+_local = threading.local()
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(USAGE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(USAGE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS call_stats ("
+            "day TEXT NOT NULL, model TEXT NOT NULL, stage TEXT NOT NULL, "
+            "calls INTEGER NOT NULL, prompt_tokens INTEGER NOT NULL, "
+            "completion_tokens INTEGER NOT NULL, cost REAL NOT NULL, "
+            "PRIMARY KEY (day, model, stage))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS run_stats ("
+            "day TEXT NOT NULL, council_type TEXT NOT NULL, "
+            "runs INTEGER NOT NULL, prompt_tokens INTEGER NOT NULL, "
+            "completion_tokens INTEGER NOT NULL, cost REAL NOT NULL, "
+            "PRIMARY KEY (day, council_type))"
+        )
+        # Runs already counted, so a run re-saved as complete isn't counted twice
+        conn.execute("CREATE TABLE IF NOT EXISTS recorded_runs (run_key TEXT PRIMARY KEY)")
+        _local.conn = conn
+    return conn
+
+
+def _today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (1 token ≈ 4 characters), as used for context limits."""
+    return len(text or "") // 4
+
+
+def call_usage(model: str, usage: Optional[Dict[str, Any]], prompt_text: str = "", completion_text: str = "") -> Dict[str, Any]:
+    """
+    Build the usage record of one model call.
+
+    Args:
+        model: Model that answered
+        usage: The `usage` block of the API response (may be missing)
+        prompt_text: Prompt, to estimate tokens if the API didn't report them
+        completion_text: Completion, likewise
+
+    Returns:
+        Dict with model, prompt_tokens, completion_tokens and cost (USD,
+        as reported by OpenRouter or computed from the registry prices)
+    """
+    usage = usage or {}
+    prompt_tokens = int(usage.get("prompt_tokens") or estimate_tokens(prompt_text))
+    completion_tokens = int(usage.get("completion_tokens") or estimate_tokens(completion_text))
+    cost = usage.get("cost")
+    if cost is None:
+        cost = get_model_spec(model).estimate_cost(prompt_tokens, completion_tokens)
+    return {
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost": round(float(cost), 6),
+    }
+
+
+def add_usage(usages: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Sum usage records (call records or earlier sums).
+
+    Returns:
+        Dict with prompt_tokens, completion_tokens, cost and calls
+    """
+    total = {"prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0, "calls": 0}
+    for usage in usages:
+        if not usage:
+            continue
+        total["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        total["completion_tokens"] += usage.get("completion_tokens", 0)
+        total["cost"] += usage.get("cost", 0.0)
+        total["calls"] += usage.get("calls", 1)
+    total["cost"] = round(total["cost"], 6)
+    return total
+
+
+def message_usage(message: Dict[str, Any], stage: str, stage_result: Any) -> Dict[str, Any]:
+    """
+    Return the message's `usage` rollup with one stage's usage filled in.
+
+    Args:
+        message: Assistant message (its current `usage` is kept for other stages)
+        stage: "stage1", "stage2" or "stage3"
+        stage_result: The stage's results (list of dicts, or a dict for Stage 3)
+    """
+    results = stage_result if isinstance(stage_result, list) else [stage_result]
+    rollup = dict(message.get("usage") or {})
+    rollup[stage] = add_usage(result.get("usage") for result in results if result)
+    rollup["total"] = add_usage(rollup.get(s) for s in STAGES)
+    return rollup
+
+
+def conversation_usage(conversation: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Per-message and total usage of a conversation.
+
+    Returns:
+        Dict with 'total' and 'messages' (index, council_type and usage of each run)
+    """
+    messages = [
+        {"index": index, "council_type": message.get("council_type"), "usage": message["usage"]}
+        for index, message in enumerate(conversation["messages"])
+        if message.get("role") == "assistant" and message.get("usage")
+    ]
+    return {
+        "conversation_id": conversation["id"],
+        "total": add_usage(m["usage"].get("total") for m in messages),
+        "messages": messages,
+    }
+
+
+def record_call(stage: str, usage: Dict[str, Any]):
+    """Add a call's usage to the per-model, per-stage statistics."""
+    _conn().execute(
+        "INSERT INTO call_stats (day, model, stage, calls, prompt_tokens, completion_tokens, cost) "
+        "VALUES (?, ?, ?, 1, ?, ?, ?) "
+        "ON CONFLICT(day, model, stage) DO UPDATE SET calls = calls + 1, "
+        "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+        "completion_tokens = completion_tokens + excluded.completion_tokens, "
+        "cost = cost + excluded.cost",
+        (_today(), usage["model"], stage, usage["prompt_tokens"], usage["completion_tokens"], usage["cost"])
+    )
+
+
+def record_run(conversation_id: str, message_index: int, council_type: str, message: Dict[str, Any]) -> bool:
+    """
+    Add a completed run's total usage to the per-tier statistics.
+
+    Args:
+        conversation_id: Conversation identifier
+        message_index: Position of the assistant message in the conversation
+        council_type: Council type of the run
+        message: Assistant message with its usage
+
+    Returns:
+        True if the run was added, False if it had no usage or was already recorded
+    """
+    total = (message.get("usage") or {}).get("total")
+    if not total:
+        return False
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        added = conn.execute(
+            "INSERT OR IGNORE INTO recorded_runs (run_key) VALUES (?)",
+            (message.get("run_id") or f"{conversation_id}:{message_index}",)
+        ).rowcount
+        if added:
+            conn.execute(
+                "INSERT INTO run_stats (day, council_type, runs, prompt_tokens, completion_tokens, cost) "
+                "VALUES (?, ?, 1, ?, ?, ?) "
+                "ON CONFLICT(day, council_type) DO UPDATE SET runs = runs + 1, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "cost = cost + excluded.cost",
+                (_today(), council_type, total["prompt_tokens"], total["completion_tokens"], total["cost"])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return bool(added)
+
+
+def get_usage_stats(days: Optional[int] = None, council_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Usage statistics per council tier and per model/stage.
+
+    Args:
+        days: Only count the last N days (default: all time)
+        council_type: Restrict the tier rollup to one council type
+
+    Returns:
+        Dict with 'tiers' and 'models' lists
+    """
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat() if days else ""
+    conn = _conn()
+
+    tier_sql = (
+        "SELECT council_type, SUM(runs), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost) "
+        "FROM run_stats WHERE day >= ?"
+    )
+    params: List[Any] = [since]
+    if council_type:
+        tier_sql += " AND council_type = ?"
+        params.append(council_type)
+    tiers = [
+        {
+            "council_type": tier,
+            "runs": runs,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "cost": round(cost, 4),
+            "average_run_cost": round(cost / runs, 6),
+        }
+        for tier, runs, prompt, completion, cost in conn.execute(tier_sql + " GROUP BY council_type", params)
+    ]
+
+    models = [
+        {
+            "model": model,
+            "stage": stage,
+            "calls": calls,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "average_completion_tokens": round(completion / calls),
+            "cost": round(cost, 4),
+        }
+        for model, stage, calls, prompt, completion, cost in conn.execute(
+            "SELECT model, stage, SUM(calls), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost) "
+            "FROM call_stats WHERE day >= ? GROUP BY model, stage ORDER BY SUM(cost) DESC",
+            (since,)
+        )
+    ]
+    return {"since": since or None, "tiers": tiers, "models": models}
+
+
+def _history(models: Iterable[str]) -> Tuple[Dict[Tuple[str, str], float], Dict[str, float]]:
+    """
+    Recent (30 days) call history of the given models.
+
+    Returns:
+        Tuple of (average completion tokens per (model, stage), observed
+        USD per token per model)
+    """
+    models = list(set(models))
+    if not models:
+        return {}, {}
+    since = (datetime.utcnow().date() - timedelta(days=29)).isoformat()
+    rows = _conn().execute(
+        "SELECT model, stage, SUM(calls), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost) "
+        f"FROM call_stats WHERE day >= ? AND model IN ({','.join('?' * len(models))}) GROUP BY model, stage",
+        [since] + models
+    ).fetchall()
+    completions = {(model, stage): completion / calls for model, stage, calls, _, completion, _ in rows if calls}
+    tokens: Dict[str, int] = {}
+    spent: Dict[str, float] = {}
+    for model, _, _, prompt, completion, cost in rows:
+        tokens[model] = tokens.get(model, 0) + prompt + completion
+        spent[model] = spent.get(model, 0.0) + cost
+    rates = {model: spent[model] / tokens[model] for model in tokens if tokens[model]}
+    return completions, rates
+
+
+def estimate_run(user_query: str, members: List[str], chairman: str) -> Dict[str, Any]:
+    """
+    Pre-flight estimate of a council run's tokens and cost.
+
+    Prompt sizes follow the stage structure (Stage 2 prompts contain every
+    Stage 1 answer, or a shard of them with STAGE2_SHARD_SIZE, Stage 3
+    every answer and ranking); completion lengths
+    are each model's recent average for that stage, or a default. Models
+    without registry prices are priced at the cost per token observed in
+    their recent calls.
+
+    Args:
+        user_query: The user's question
+        members: Council members
+        chairman: Chairman model
+
+    Returns:
+        Dict with per-stage and total usage estimates and per-member cost
+    """
+    from .ballots import effective_shard_size
+
+    history, rates = _history(members + [chairman])
+
+    def completion(model: str, stage: str) -> int:
+        return int(history.get((model, stage), DEFAULT_COMPLETION_TOKENS[stage]))
+
+    def price(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        spec = get_model_spec(model)
+        if spec.price_prompt or spec.price_completion:
+            return spec.estimate_cost(prompt_tokens, completion_tokens)
+        return rates.get(model, 0.0) * (prompt_tokens + completion_tokens)
+
+    query_tokens = estimate_tokens(user_query)
+    stage1_completions = {m: completion(m, "stage1") for m in members}
+    stage2_completions = {m: completion(m, "stage2") for m in members}
+    shard = effective_shard_size(len(members), len(members), STAGE2_SHARD_SIZE)
+    stage2_prompt = (
+        PROMPT_OVERHEAD_TOKENS["stage2"] + query_tokens
+        + sum(stage1_completions.values()) * shard // max(len(members), 1)
+    )
+    stage3_prompt = (
+        PROMPT_OVERHEAD_TOKENS["stage3"] + query_tokens
+        + sum(stage1_completions.values()) + sum(stage2_completions.values())
+    )
+
+    def estimate(model: str, prompt_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost": round(price(model, prompt_tokens, completion_tokens), 6),
+        }
+
+    calls = {
+        "stage1": [estimate(m, query_tokens, stage1_completions[m]) for m in members],
+        "stage2": [estimate(m, stage2_prompt, stage2_completions[m]) for m in members],
+        "stage3": [estimate(chairman, stage3_prompt, completion(chairman, "stage3"))],
+    }
+    stages = {stage: add_usage(calls[stage]) for stage in STAGES}
+    per_member = {
+        m: round(calls["stage1"][i]["cost"] + calls["stage2"][i]["cost"], 6)
+        for i, m in enumerate(members)
+    }
+    return {
+        "members": members,
+        "chairman": chairman,
+        "stages": stages,
+        "total": add_usage(stages.values()),
+        "member_costs": per_member,
+    }
+
+
+def budget_limit(conversation_spent: float = 0.0) -> Optional[float]:
+    """
+    The most a new run may cost, given the caps and what the conversation already spent.
+
+    Returns:
+        Limit in USD, or None if no cap is configured
+    """
+    limits = []
+    if BUDGET_MAX_RUN_COST > 0:
+        limits.append(BUDGET_MAX_RUN_COST)
+    if BUDGET_MAX_CONVERSATION_COST > 0:
+        limits.append(max(0.0, BUDGET_MAX_CONVERSATION_COST - conversation_spent))
+    return min(limits) if limits else None
+
+
+def plan_run(user_query: str, council_type: str, conversation_spent: float = 0.0) -> Dict[str, Any]:
+    """
+    Choose the council for a run so its estimated cost fits the budget.
+
+    The requested council is used if it fits. Otherwise the most expensive
+    members are dropped (keeping at least BUDGET_MIN_MEMBERS), then the
+    run moves to BUDGET_FALLBACK_COUNCIL (trimmed the same way).
+
+    Args:
+        user_query: The user's question
+        council_type: Requested council type
+        conversation_spent: USD already spent in the conversation
+
+    Returns:
+        Dict with council_type, members, chairman, estimate, limit and
+        adjustments (human-readable list of changes, empty if none)
+
+    Raises:
+        BudgetExceededError: If even the cheapest option exceeds the budget
+    """
+    limit = budget_limit(conversation_spent)
+    registry = get_registry()
+    adjustments: List[str] = []
+
+    candidates = [council_type]
+    if BUDGET_FALLBACK_COUNCIL != council_type and BUDGET_FALLBACK_COUNCIL in registry.council_types():
+        candidates.append(BUDGET_FALLBACK_COUNCIL)
+
+    estimate = None
+    for index, candidate in enumerate(candidates):
+        council = registry.council(candidate)
+        members = list(council.members)
+        if index > 0:
+            adjustments.append(f"switched to the {candidate} council")
+        estimate = estimate_run(user_query, members, council.chairman)
+        while limit is not None and estimate["total"]["cost"] > limit and len(members) > BUDGET_MIN_MEMBERS:
+            costs = estimate["member_costs"]
+            dropped = max(members, key=lambda m: costs[m])
+            members.remove(dropped)
+            adjustments.append(f"dropped {dropped}")
+            estimate = estimate_run(user_query, members, council.chairman)
+        if limit is None or estimate["total"]["cost"] <= limit:
+            return {
+                "council_type": candidate,
+                "members": members,
+                "chairman": council.chairman,
+                "estimate": estimate,
+                "limit": limit,
+                "adjustments": adjustments,
+            }
+
+    raise BudgetExceededError(
+        f"Estimated cost ${estimate['total']['cost']:.4f} exceeds the remaining budget of ${limit:.4f}"
+    )
@@ -1,19 +1,30 @@
 """3-stage LLM Council orchestration."""
 
+import asyncio
+import re
 from typing import List, Dict, Any, Tuple, Optional
 from .openrouter import query_models_parallel, query_model
+from .ballots import (
+    ballot_schema,
+    build_json_ranking_prompt,
+    parse_ballot,
+    render_ballot,
+    reask_ranking,
+    response_label,
+    shard_design,
+)
+from .registry import get_registry, get_model_spec
+from .costs import add_usage
+from . import metrics
 from .config import (
-    COUNCIL_MODELS_PREMIUM,
-    CHAIRMAN_MODEL_PREMIUM,
-    COUNCIL_MODELS_ECONOMIC,
-    CHAIRMAN_MODEL_ECONOMIC,
-    COUNCIL_MODELS_FREE,
-    CHAIRMAN_MODEL_FREE,
     COUNCIL_TYPE_PREMIUM,
-    COUNCIL_TYPE_ECONOMIC,
-    COUNCIL_TYPE_FREE,
     COUNCIL_MODELS,
     CHAIRMAN_MODEL,
+    STAGE2_COMPACT,
+    STAGE2_COMPACT_MAX_TOKENS,
+    STAGE2_STRUCTURED,
+    STAGE2_REASK,
+    STAGE2_SHARD_SIZE,
 )
 
 
@@ -21,23 +32,24 @@ def get_council_config(council_type: str = COUNCIL_TYPE_PREMIUM) -> Tuple[List[s
     """
     Get council models and chairman model based on council type.
 
+    The council is resolved from the active registry snapshot, so changes to
+    the council config file apply to the next run without a restart.
+
     Args:
-        council_type: Type of council ("premium", "economic", or "free")
+        council_type: Type of council ("premium", "economic", "free", or
+            "cascade", which starts with its first tier's council)
 
     Returns:
         Tuple of (council_models list, chairman_model string)
     """
-    if council_type == COUNCIL_TYPE_ECONOMIC:
-        return COUNCIL_MODELS_ECONOMIC, CHAIRMAN_MODEL_ECONOMIC
-    elif council_type == COUNCIL_TYPE_FREE:
-        return COUNCIL_MODELS_FREE, CHAIRMAN_MODEL_FREE
-    else:
-        return COUNCIL_MODELS_PREMIUM, CHAIRMAN_MODEL_PREMIUM
+    council = get_registry().council(council_type)
+    return list(council.members), council.chairman
 
 
 async def stage1_collect_responses(
     user_query: str,
-    council_models: Optional[List[str]] = None
+    council_models: Optional[List[str]] = None,
+    deadline: Optional[float] = None
 ) -> List[Dict[str, Any]]:
     """
     Stage 1: Collect individual responses from all council models.
@@ -45,6 +57,8 @@ async def stage1_collect_responses(
     Args:
         user_query: The user's question
         council_models: List of model identifiers to use. If None, uses default.
+        deadline: time.monotonic() by which the responses are needed; models
+            that haven't answered by then are left out
 
     Returns:
         List of dicts with 'model', 'response' (final content), and 'original_response' (with reasoning) keys
@@ -59,7 +73,9 @@ async def stage1_collect_responses(
         council_models,
         messages,
         extract_final_content_flag=False,
-        use_fallback=True
+        use_fallback=True,
+        stage="stage1",
+        deadline=deadline
     )
 
     # Format results - keep original for user transparency, extract final for Stage 2
@@ -87,7 +103,8 @@ async def stage1_collect_responses(
         stage1_results.append({
             "model": model,
             "response": display_content,  # Content to display (final or original)
-            "original_response": original_display  # Original with reasoning tokens for transparency
+            "original_response": original_display,  # Original with reasoning tokens for transparency
+            "usage": response.get('usage')
         })
         print(f"DEBUG: Added {model} to stage1_results (response length: {len(display_content)})")
     
@@ -97,41 +114,83 @@ async def stage1_collect_responses(
     return stage1_results
 
 
+def build_label_to_model(stage1_results: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Build the anonymous label -> model mapping used in Stage 2.
+
+    Labels are assigned in Stage 1 result order, so the mapping can be
+    rebuilt from stored Stage 1 results.
+
+    Args:
+        stage1_results: Results from Stage 1
+
+    Returns:
+        Dict mapping "Response A", "Response B", ... to model identifiers
+    """
+    return {
+        f"Response {response_label(i)}": result['model']
+        for i, result in enumerate(stage1_results)
+    }
+
+
 async def stage2_collect_rankings(
     user_query: str,
     stage1_results: List[Dict[str, Any]],
-    council_models: Optional[List[str]] = None
+    council_models: Optional[List[str]] = None,
+    compact: Optional[bool] = None,
+    shard_size: Optional[int] = None,
+    deadline: Optional[float] = None
 ) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
     """
     Stage 2: Each model ranks the anonymized responses.
 
+    With sharding, each judge only sees and ranks shard_size of the
+    responses, assigned in a balanced incomplete design (see
+    ballots.shard_design()); its result lists them under 'shard'.
+
+    In compact mode the judges reply with a JSON ranking and one-line
+    critiques under a tighter max_tokens. Judges whose registry entry has
+    structured_output get a JSON schema as response_format. Ballots are
+    parsed strictly (see backend/ballots.py); an unreadable one gets a
+    short re-ask for just the ranking, and is otherwise stored with
+    'parse_error' and an empty 'parsed_ranking'.
+
     Args:
         user_query: The original user query
         stage1_results: Results from Stage 1
         council_models: List of model identifiers to use. If None, uses default.
+        compact: Use the compact JSON format. If None, uses STAGE2_COMPACT.
+        shard_size: Responses per judge (0 = all). If None, uses STAGE2_SHARD_SIZE.
+        deadline: time.monotonic() by which the ballots are needed; judges
+            that haven't answered by then are left out
 
     Returns:
         Tuple of (rankings list, label_to_model mapping)
     """
     if council_models is None:
         council_models = COUNCIL_MODELS
+    if compact is None:
+        compact = STAGE2_COMPACT
+    if shard_size is None:
+        shard_size = STAGE2_SHARD_SIZE
 
-    # Create anonymized labels for responses (Response A, Response B, etc.)
-    labels = [chr(65 + i) for i in range(len(stage1_results))]  # A, B, C, ...
+    # Create anonymized labels for responses (Response A, ..., Response Z, Response AA, ...)
+    labels = [response_label(i) for i in range(len(stage1_results))]
 
     # Create mapping from label to model name
-    label_to_model = {
-        f"Response {label}": result['model']
-        for label, result in zip(labels, stage1_results)
-    }
+    label_to_model = build_label_to_model(stage1_results)
 
-    # Build the ranking prompt
-    responses_text = "\n\n".join([
-        f"Response {label}:\n{result['response']}"
-        for label, result in zip(labels, stage1_results)
-    ])
+    # Each judge ranks a shard of the responses, or all of them
+    shards = shard_design(len(stage1_results), len(council_models), shard_size)
+    sharded = any(len(shard) < len(stage1_results) for shard in shards)
 
-    ranking_prompt = f"""You are evaluating different responses to the following question:
+    def build_prompts(indices: List[int]) -> Tuple[List[str], str, str]:
+        responses_text = "\n\n".join([
+            f"Response {labels[i]}:\n{stage1_results[i]['response']}"
+            for i in indices
+        ])
+
+        ranking_prompt = f"""You are evaluating different responses to the following question:
 
 Question: {user_query}
 
@@ -161,29 +220,74 @@ FINAL RANKING:
 3. Response B
 
 Now provide your evaluation and ranking:"""
-
-    messages = [{"role": "user", "content": ranking_prompt}]
+        names = [f"Response {labels[i]}" for i in indices]
+        return names, ranking_prompt, build_json_ranking_prompt(user_query, responses_text, names, compact)
+
+    prompts: Dict[Tuple[int, ...], Tuple[List[str], str, str]] = {}
+    for shard in shards:
+        if tuple(shard) not in prompts:
+            prompts[tuple(shard)] = build_prompts(shard)
+    mode = "compact" if compact else "full"
+
+    async def judge(model: str, shard: List[int]) -> Optional[Dict[str, Any]]:
+        names, ranking_prompt, json_prompt = prompts[tuple(shard)]
+        # JSON ballots for compact mode and for models with structured output
+        structured = STAGE2_STRUCTURED and get_model_spec(model).structured_output
+        params: Dict[str, Any] = {}
+        if compact:
+            params["max_tokens"] = STAGE2_COMPACT_MAX_TOKENS
+            params["reasoning"] = {"max_tokens": STAGE2_COMPACT_MAX_TOKENS // 2}
+        if structured:
+            params["response_format"] = ballot_schema(names, compact)
+        prompt = json_prompt if compact or structured else ranking_prompt
+
+        # Extract final content to save tokens (remove reasoning tokens for Stage 2)
+        response = await query_model(
+            model,
+            [{"role": "user", "content": prompt}],
+            extract_final_content_flag=True,
+            stage="stage2",
+            params=params or None,
+            deadline=deadline
+        )
+        if response is None:
+            return None
+
+        full_text = response.get('content', '')
+        usage = response.get('usage')
+        if usage:
+            metrics.observe("stage2_completion_tokens", usage['completion_tokens'], mode=mode)
+        ballot = parse_ballot(full_text, names)
+        ranking = ballot["ranking"]
+        outcome = "ok"
+        if ranking is None:
+            print(f"DEBUG: {model} ballot unreadable ({ballot['error']})")
+            if STAGE2_REASK:
+                ranking, retry_usage = await reask_ranking(
+                    model, ballot["evaluation"] or full_text, names, ballot["error"], structured, deadline
+                )
+                usage = add_usage([usage, retry_usage])
+            outcome = "reasked" if ranking is not None else "invalid"
+        metrics.incr("stage2_ballots", model=model, outcome=outcome)
+
+        result = {
+            "model": model,
+            # JSON ballots are stored as the usual evaluation + FINAL RANKING text
+            "ranking": render_ballot(ballot, ranking) if ballot["format"] == "json" and ranking else full_text,
+            "parsed_ranking": ranking or [],
+            "usage": usage
+        }
+        if sharded:
+            result["shard"] = names
+        if ranking is None:
+            result["parse_error"] = ballot["error"]
+        elif outcome == "reasked":
+            result["reasked"] = True
+        return result
 
     # Get rankings from all council models in parallel
-    # Extract final content to save tokens (remove reasoning tokens for Stage 2)
-    responses = await query_models_parallel(
-        council_models,
-        messages,
-        extract_final_content_flag=True,
-        use_fallback=True
-    )
-
-    # Format results
-    stage2_results = []
-    for model, response in responses.items():
-        if response is not None:
-            full_text = response.get('content', '')
-            parsed = parse_ranking_from_text(full_text)
-            stage2_results.append({
-                "model": model,
-                "ranking": full_text,
-                "parsed_ranking": parsed
-            })
+    results = await asyncio.gather(*[judge(model, shard) for model, shard in zip(council_models, shards)])
+    stage2_results = [result for result in results if result is not None]
 
     return stage2_results, label_to_model
 
@@ -193,7 +297,8 @@ async def stage3_synthesize_final(
     stage1_results: List[Dict[str, Any]],
     stage2_results: List[Dict[str, Any]],
     chairman_model: Optional[str] = None,
-    council_type: str = COUNCIL_TYPE_PREMIUM
+    council_type: str = COUNCIL_TYPE_PREMIUM,
+    deadline: Optional[float] = None
 ) -> Dict[str, Any]:
     """
     Stage 3: Chairman synthesizes final response.
@@ -203,10 +308,11 @@ async def stage3_synthesize_final(
         stage1_results: Individual model responses from Stage 1
         stage2_results: Rankings from Stage 2
         chairman_model: Model identifier for chairman. If None, uses default.
-        council_type: Type of council (for context limit detection)
+        council_type: Type of council used for this run
+        deadline: time.monotonic() by which the answer is needed
 
     Returns:
-        Dict with 'model' and 'response' keys
+        Dict with 'model', 'response' and 'usage' (chairman and summary calls) keys
     """
     if chairman_model is None:
         chairman_model = CHAIRMAN_MODEL
@@ -222,17 +328,15 @@ async def stage3_synthesize_final(
         for result in stage2_results
     ])
 
-    # Check context limits (free models typically have 32k limit)
-    max_tokens = 32000 if council_type == COUNCIL_TYPE_FREE else 128000
+    # Check context limits against the chairman's context window
+    max_tokens = get_model_spec(chairman_model).context_window
     use_summary = check_context_limits(stage1_text, stage2_text, max_tokens)
-    
+    summary_usage = None
+
     if use_summary:
         # Use summarized Stage 2 results to save tokens
-        label_to_model = {
-            f"Response {chr(65 + i)}": result['model']
-            for i, result in enumerate(stage1_results)
-        }
-        stage2_summary = await summarize_stage2_results(stage2_results, label_to_model)
+        label_to_model = build_label_to_model(stage1_results)
+        stage2_summary, summary_usage = await summarize_stage2_results(stage2_results, label_to_model, deadline)
         stage2_text = f"Summary of Peer Rankings:\n{stage2_summary}"
 
     chairman_prompt = f"""You are the Chairman of an LLM Council. Multiple AI models have provided responses to a user's question, and then ranked each other's responses.
@@ -255,18 +359,169 @@ Provide a clear, well-reasoned final answer that represents the council's collec
     messages = [{"role": "user", "content": chairman_prompt}]
 
     # Query the chairman model
-    response = await query_model(chairman_model, messages, extract_final_content_flag=True)
+    response = await query_model(
+        chairman_model, messages, extract_final_content_flag=True, stage="stage3", deadline=deadline
+    )
 
     if response is None:
         # Fallback if chairman fails
         return {
             "model": chairman_model,
-            "response": "Error: Unable to generate final synthesis."
+            "response": "Error: Unable to generate final synthesis.",
+            "usage": add_usage([summary_usage])
         }
 
     return {
         "model": chairman_model,
-        "response": response.get('content', '')
+        "response": response.get('content', ''),
+        "usage": add_usage([summary_usage, response.get('usage')])
+    }
+
+
+async def stage3_speculative_draft(
+    user_query: str,
+    stage1_results: List[Dict[str, Any]],
+    chairman_model: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Speculative Stage 3: chairman drafts the final answer from Stage 1 alone.
+
+    Runs in parallel with Stage 2. The chairman sees the same anonymized
+    labels as the Stage 2 judges and states which response it considers
+    best, so its preference can be checked against the peer rankings.
+
+    Args:
+        user_query: The original user query
+        stage1_results: Individual model responses from Stage 1
+        chairman_model: Model identifier for chairman. If None, uses default.
+        deadline: time.monotonic() by which the draft is needed
+
+    Returns:
+        Dict with 'model', 'response', 'preferred' (label or None) and 'usage',
+        or None if the chairman failed
+    """
+    if chairman_model is None:
+        chairman_model = CHAIRMAN_MODEL
+
+    label_to_model = build_label_to_model(stage1_results)
+    responses_text = "\n\n".join([
+        f"{label}:\n{result['response']}"
+        for label, result in zip(label_to_model.keys(), stage1_results)
+    ])
+
+    draft_prompt = f"""You are the Chairman of an LLM Council. Multiple AI models have provided responses to a user's question (anonymized below).
+
+Original Question: {user_query}
+
+Individual Responses:
+{responses_text}
+
+Your task as Chairman is to synthesize these responses into a single, comprehensive, accurate answer to the user's original question. Consider the insights of each response and any patterns of agreement or disagreement.
+
+Provide a clear, well-reasoned final answer that represents the council's collective wisdom.
+Then, on the very last line, state which individual response you found best, formatted EXACTLY as:
+PREFERRED RESPONSE: Response X"""
+
+    messages = [{"role": "user", "content": draft_prompt}]
+    response = await query_model(
+        chairman_model, messages, extract_final_content_flag=True, stage="stage3", deadline=deadline
+    )
+    if response is None:
+        return None
+
+    text = response.get('content', '')
+    preferred = None
+    match = re.search(r'PREFERRED RESPONSE:\s*(Response [A-Z]+)\s*$', text.strip())
+    if match:
+        preferred = match.group(1)
+        text = text.strip()[:match.start()].rstrip()
+
+    return {
+        "model": chairman_model,
+        "response": text,
+        "preferred": preferred,
+        "usage": response.get('usage')
+    }
+
+
+async def stage3_finalize_speculative(
+    user_query: str,
+    draft: Dict[str, Any],
+    aggregate_rankings: List[Dict[str, Any]],
+    label_to_model: Dict[str, str],
+    chairman_model: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Accept or refine a speculative chairman draft once Stage 2 is done.
+
+    If the model ranked best by the peers is the one the chairman preferred
+    (or there are no peer rankings), the draft is accepted as is. Otherwise
+    the chairman gets a short refinement call with the ranking summary.
+
+    Args:
+        user_query: The original user query
+        draft: Result of stage3_speculative_draft()
+        aggregate_rankings: Result of calculate_aggregate_rankings()
+        label_to_model: Mapping from anonymous labels to model names
+        chairman_model: Model identifier for chairman. If None, uses default.
+        deadline: time.monotonic() by which the answer is needed; the draft
+            is accepted if the refinement can't finish in time
+
+    Returns:
+        Dict with 'model', 'response', 'speculative' ("accepted" or "refined")
+        and 'usage' (draft and refinement calls)
+    """
+    if chairman_model is None:
+        chairman_model = CHAIRMAN_MODEL
+
+    preferred_model = label_to_model.get(draft.get("preferred"))
+    if not aggregate_rankings or aggregate_rankings[0]["model"] == preferred_model:
+        return {
+            "model": chairman_model,
+            "response": draft["response"],
+            "speculative": "accepted",
+            "usage": add_usage([draft.get("usage")])
+        }
+
+    model_to_label = {model: label for label, model in label_to_model.items()}
+    ranking_summary = "\n".join([
+        f"{position}. {model_to_label.get(entry['model'], entry['model'])} (average rank {entry['average_rank']})"
+        for position, entry in enumerate(aggregate_rankings, start=1)
+    ])
+
+    refine_prompt = f"""You are the Chairman of an LLM Council. You drafted a final answer before seeing the council's peer rankings.
+
+Original Question: {user_query}
+
+Your Draft Answer:
+{draft['response']}
+
+Peer Rankings (aggregate, best first; you preferred {draft.get('preferred') or 'no particular response'}):
+{ranking_summary}
+
+The peers ranked the responses differently from you. Revise your draft to give more weight to the responses the council ranked highest, keeping everything in it that is still correct. Reply with the final answer only:"""
+
+    messages = [{"role": "user", "content": refine_prompt}]
+    response = await query_model(
+        chairman_model, messages, extract_final_content_flag=True, stage="stage3", deadline=deadline
+    )
+
+    if response is None:
+        # The draft is still a complete answer; better than nothing
+        return {
+            "model": chairman_model,
+            "response": draft["response"],
+            "speculative": "accepted",
+            "usage": add_usage([draft.get("usage")])
+        }
+
+    return {
+        "model": chairman_model,
+        "response": response.get('content', ''),
+        "speculative": "refined",
+        "usage": add_usage([draft.get("usage"), response.get('usage')])
     }
 
 
@@ -290,17 +545,17 @@ def parse_ranking_from_text(ranking_text: str) -> List[str]:
             ranking_section = parts[1]
             # Try to extract numbered list format (e.g., "1. Response A")
             # This pattern looks for: number, period, optional space, "Response X"
-            numbered_matches = re.findall(r'\d+\.\s*Response [A-Z]', ranking_section)
+            numbered_matches = re.findall(r'\d+\.\s*Response [A-Z]+', ranking_section)
             if numbered_matches:
                 # Extract just the "Response X" part
-                return [re.search(r'Response [A-Z]', m).group() for m in numbered_matches]
+                return [re.search(r'Response [A-Z]+', m).group() for m in numbered_matches]
 
             # Fallback: Extract all "Response X" patterns in order
-            matches = re.findall(r'Response [A-Z]', ranking_section)
+            matches = re.findall(r'Response [A-Z]+', ranking_section)
             return matches
 
     # Fallback: try to find any "Response X" patterns in order
-    matches = re.findall(r'Response [A-Z]', ranking_text)
+    matches = re.findall(r'Response [A-Z]+', ranking_text)
     return matches
 
 
@@ -340,8 +595,9 @@ def check_context_limits(
 
 async def summarize_stage2_results(
     stage2_results: List[Dict[str, Any]],
-    label_to_model: Dict[str, str]
-) -> str:
+    label_to_model: Dict[str, str],
+    deadline: Optional[float] = None
+) -> Tuple[str, Optional[Dict[str, Any]]]:
     """
     Summarize Stage 2 rankings into a concise "Bulletin of Ratings" using an economic model.
     
@@ -351,9 +607,10 @@ async def summarize_stage2_results(
     Args:
         stage2_results: Rankings from each model
         label_to_model: Mapping from anonymous labels to model names
+        deadline: time.monotonic() by which the summary is needed
         
     Returns:
-        Concise summary of rankings
+        Tuple of (concise summary of rankings, usage of the summary call or None)
     """
     # Build full rankings text
     rankings_text = "\n\n".join([
@@ -374,13 +631,16 @@ Concise Summary:"""
     
     # Use Mistral Small for summarization (economic model as recommended)
     summary_model = "mistralai/mistral-small-24b-instruct-2501"
-    response = await query_model(summary_model, messages, timeout=60.0, extract_final_content_flag=True)
+    response = await query_model(
+        summary_model, messages, timeout=60.0, extract_final_content_flag=True, stage="summary",
+        deadline=deadline
+    )
     
     if response is None:
         # Fallback: return a simple summary
-        return f"Peer rankings from {len(stage2_results)} models. See full rankings for details."
+        return f"Peer rankings from {len(stage2_results)} models. See full rankings for details.", None
     
-    return response.get('content', '')
+    return response.get('content', ''), response.get('usage')
 
 
 def calculate_aggregate_rankings(
@@ -396,17 +656,27 @@ def calculate_aggregate_rankings(
 
     Returns:
         List of dicts with model name and average rank, sorted best to worst
+
+    For other aggregation methods (Borda, Bradley-Terry, Kemeny) and for
+    aggregating many runs at once, see backend/ranking.py. Sharded runs
+    are merged with Bradley-Terry, since positions on ballots over
+    different subsets aren't comparable; their entries also carry the
+    Bradley-Terry 'score'.
     """
     from collections import defaultdict
 
+    if any(ranking.get('shard') for ranking in stage2_results):
+        from .ranking import aggregate_run, METHOD_BRADLEY_TERRY
+        return aggregate_run(stage2_results, label_to_model, METHOD_BRADLEY_TERRY)
+
     # Track positions for each model
     model_positions = defaultdict(list)
 
     for ranking in stage2_results:
-        ranking_text = ranking['ranking']
-
-        # Parse the ranking from the structured format
-        parsed_ranking = parse_ranking_from_text(ranking_text)
+        # Use the ranking parsed in Stage 2; only re-parse older results stored without it
+        parsed_ranking = ranking.get('parsed_ranking')
+        if parsed_ranking is None:
+            parsed_ranking = parse_ranking_from_text(ranking['ranking'])
 
         for position, label in enumerate(parsed_ranking, start=1):
             if label in label_to_model:
@@ -430,12 +700,13 @@ def calculate_aggregate_rankings(
     return aggregate
 
 
-async def generate_conversation_title(user_query: str) -> str:
+async def generate_conversation_title(user_query: str, deadline: Optional[float] = None) -> str:
     """
     Generate a short title for a conversation based on the first user message.
 
     Args:
         user_query: The first user message
+        deadline: time.monotonic() by which the title is needed
 
     Returns:
         A short title (3-5 words)
@@ -450,13 +721,16 @@ Title:"""
     messages = [{"role": "user", "content": title_prompt}]
 
     # Use gemini-2.5-flash for title generation (fast and cheap)
-    response = await query_model("google/gemini-2.5-flash", messages, timeout=30.0)
+    response = await query_model(
+        "google/gemini-2.5-flash", messages, timeout=30.0, stage="title", deadline=deadline
+    )
 
     if response is None:
         # Fallback to a generic title
         return "New Conversation"
 
-    title = response.get('content', 'New Conversation').strip()
+    # A reply cut off at max_tokens can be empty
+    title = (response.get('content') or 'New Conversation').strip()
 
     # Clean up the title - remove quotes, limit length
     title = title.strip('"\'')
@@ -477,7 +751,7 @@ async def run_full_council(
 
     Args:
         user_query: The user's question
-        council_type: Type of council to use ("premium" or "economic")
+        council_type: Type of council to use ("premium", "economic", "free" or "cascade")
 
     Returns:
         Tuple of (stage1_results, stage2_results, stage3_result, metadata)
@@ -503,6 +777,24 @@ async def run_full_council(
     # Calculate aggregate rankings
     aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
 
+    # Cascade: escalate to the stronger council if the first tier's judges disagree
+    from .cascade import cascade_spec, decide
+    spec = cascade_spec(council_type)
+    decision = None
+    if spec is not None:
+        decision = decide(stage2_results, label_to_model, spec)
+        if decision["escalated"]:
+            council_models, chairman_model = get_council_config(spec.cascade[1])
+            answered = {result["model"] for result in stage1_results}
+            # The first tier's answers stay in as extra candidates
+            stage1_results = stage1_results + await stage1_collect_responses(
+                user_query, [model for model in council_models if model not in answered]
+            )
+            stage2_results, label_to_model = await stage2_collect_rankings(
+                user_query, stage1_results, council_models
+            )
+            aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
+
     # Stage 3: Synthesize final answer
     stage3_result = await stage3_synthesize_final(
         user_query,
@@ -518,5 +810,7 @@ async def run_full_council(
         "aggregate_rankings": aggregate_rankings,
         "council_type": council_type
     }
+    if decision is not None:
+        metadata["cascade"] = decision
 
     return stage1_results, stage2_results, stage3_result, metadata
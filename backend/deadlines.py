@@ -0,0 +1,84 @@
+"""Deadlines for council runs.
+
+A run can be given a total time budget. The budget is split into Stage 1,
+Stage 2 and Stage 3 deadlines by DEADLINE_STAGE_SHARES; a deadline is a
+point in time (time.monotonic()), so time an early stage doesn't use is
+left to the later ones. Every model call of a stage is given the time
+left until the stage's deadline, and is abandoned when it runs out.
+
+When a stage runs out of time the run degrades instead of failing:
+
+- Stage 1 keeps the responses that arrived in time
+- Stage 2 is skipped if too little time is left, or keeps the ballots
+  that arrived in time (the aggregate ranking is computed locally from them)
+- Stage 3 falls back to the best Stage 1 answer (top of the aggregate
+  ranking, or the first response) if the chairman can't answer in time
+
+The degradations are recorded in the run's metadata.
+"""
+
+import time
+from typing import List, Dict, Any, Optional
+
+from .config import DEADLINE_STAGE_SHARES, DEADLINE_MIN_STAGE_SECONDS
+
+STAGES = ("stage1", "stage2", "stage3")
+
+
+def stage_deadlines(total_seconds: float, start: Optional[float] = None) -> Dict[str, float]:
+    """
+    Split a run's time budget into per-stage deadlines.
+
+    Args:
+        total_seconds: Time budget of the whole run
+        start: When the run started (default: now), on the time.monotonic() clock
+
+    Returns:
+        Dict mapping each stage to its deadline; Stage 3's is the end of the budget
+    """
+    if start is None:
+        start = time.monotonic()
+    shares = [max(0.0, share) for share in DEADLINE_STAGE_SHARES] or [1.0]
+    total_share = sum(shares) or 1.0
+    deadlines = {}
+    elapsed = 0.0
+    for stage, share in zip(STAGES, shares + [0.0] * len(STAGES)):
+        elapsed += share / total_share
+        deadlines[stage] = start + total_seconds * min(elapsed, 1.0)
+    deadlines["stage3"] = start + total_seconds
+    return deadlines
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a deadline (None if there is none)."""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def too_late(deadline: Optional[float], needed: float = DEADLINE_MIN_STAGE_SECONDS) -> bool:
+    """Whether less than `needed` seconds are left before a deadline."""
+    left = remaining(deadline)
+    return left is not None and left < needed
+
+
+def best_stage1_answer(
+    stage1_results: List[Dict[str, Any]],
+    aggregate_rankings: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Stage 3 stand-in when the chairman is out of time: the Stage 1 answer
+    ranked best by the peers, or the first one if there are no rankings.
+
+    Returns:
+        Dict shaped like a Stage 3 result, with 'degraded' set
+    """
+    best = stage1_results[0]
+    if aggregate_rankings:
+        by_model = {result["model"]: result for result in stage1_results}
+        best = by_model.get(aggregate_rankings[0]["model"], best)
+    return {
+        "model": best["model"],
+        "response": best["response"],
+        "degraded": "best_stage1",
+    }
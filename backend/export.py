@@ -0,0 +1,502 @@
+"""Server-side conversation export (Markdown, JSONL, PDF and zip archives).
+
+Exports are generated incrementally and returned as byte chunks, so the
+API can stream them: a conversation's messages are read from storage and
+rendered one at a time (see storage.open_conversation()), a PDF is written
+out page by page, and the "export all" archive is zipped one conversation
+at a time. Memory stays bounded by the largest single message rather than
+the size of the conversation or of the export.
+"""
+
+import json
+import re
+import unicodedata
+import zlib
+import zipfile
+from datetime import datetime
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+
+from . import storage
+
+# format -> (file extension, media type)
+EXPORT_FORMATS = {
+    "markdown": ("md", "text/markdown; charset=utf-8"),
+    "jsonl": ("jsonl", "application/x-ndjson"),
+    "pdf": ("pdf", "application/pdf"),
+}
+
+COUNCIL_TYPE_DISPLAY = {
+    "premium": ("💎", "Premium"),
+    "economic": ("💰", "Economic"),
+    "free": ("🆓", "Free"),
+}
+
+
+def _short_model_name(model: str) -> str:
+    """Model name without the provider prefix."""
+    return model.split("/", 1)[1] if "/" in (model or "") else (model or "")
+
+
+def _council_type_label(council_type: str) -> str:
+    emoji, name = COUNCIL_TYPE_DISPLAY.get(council_type, ("", council_type or "Premium"))
+    return f"{emoji} {name}".strip()
+
+
+def _format_date(value: str) -> str:
+    try:
+        return datetime.fromisoformat(value).strftime("%B %d, %Y %I:%M %p")
+    except (TypeError, ValueError):
+        return value or ""
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (text or "conversation").lower()).strip("-") or "conversation"
+
+
+def export_filename(conversation: Dict[str, Any], fmt: str) -> str:
+    """Download filename for an exported conversation."""
+    extension, _ = EXPORT_FORMATS[fmt]
+    date = (conversation.get("created_at") or "")[:10] or datetime.now().strftime("%Y-%m-%d")
+    return f"llm-council-{_slug(conversation.get('title'))}-{date}.{extension}"
+
+
+# A conversation is first turned into a flat sequence of (kind, payload)
+# blocks, which the Markdown and PDF writers then render.
+Block = Tuple[str, Any]
+
+
+def _header_blocks(conversation: Dict[str, Any]) -> Iterator[Block]:
+    yield ("title", "LLM Council")
+    yield ("subtitle", conversation.get("title") or "Conversation")
+    yield ("meta", f"Date: {_format_date(conversation.get('created_at'))} · "
+                   f"Council Type: {_council_type_label(conversation.get('council_type'))}")
+    yield ("rule", None)
+
+
+def _message_blocks(conversation: Dict[str, Any], msg: Dict[str, Any]) -> Iterator[Block]:
+    if msg["role"] == "user":
+        yield ("section", "User Question")
+        yield ("text", msg.get("content") or "")
+        return
+
+    # Fall back to the conversation's council type for legacy messages
+    council_type = msg.get("council_type") or conversation.get("council_type")
+    yield ("section", f"LLM Council Response {_council_type_label(council_type)}")
+    metadata = msg.get("metadata") or {}
+    label_to_model = metadata.get("label_to_model") or {}
+
+    if msg.get("stage1"):
+        yield ("stage", "Stage 1: Individual Responses")
+        for response in msg["stage1"]:
+            yield ("model", _short_model_name(response.get("model")))
+            yield ("text", response.get("response") or "")
+
+    if msg.get("stage2"):
+        yield ("stage_rankings", "Stage 2: Peer Rankings")
+        yield ("info", "Each model evaluated all responses (anonymous as Response A, B, C, etc.) and provided rankings.")
+        for ranking in msg["stage2"]:
+            yield ("model", f"Evaluation by {_short_model_name(ranking.get('model'))}")
+            yield ("text", ranking.get("ranking") or "")
+            if ranking.get("parsed_ranking"):
+                yield ("label", "Extracted Ranking:")
+                yield ("list", [
+                    _short_model_name(label_to_model[label]) if label in label_to_model else label
+                    for label in ranking["parsed_ranking"]
+                ])
+
+        if metadata.get("aggregate_rankings"):
+            yield ("stage", "Aggregate Rankings (Street Cred)")
+            yield ("info", "Combined results from all evaluations (lower score is better):")
+            yield ("table", [["#", "Model", "Average", "Votes"]] + [
+                [str(i), _short_model_name(agg["model"]), f"{agg['average_rank']:.2f}", str(agg["rankings_count"])]
+                for i, agg in enumerate(metadata["aggregate_rankings"], start=1)
+            ])
+
+    if msg.get("stage3"):
+        yield ("stage_final", "Stage 3: Final Council Answer")
+        yield ("model", f"Chairman: {_short_model_name(msg['stage3'].get('model'))}")
+        yield ("text", msg["stage3"].get("response") or "")
+
+
+def _footer_blocks() -> Iterator[Block]:
+    yield ("rule", None)
+    yield ("footer", f"Generated by LLM Council - {datetime.now().strftime('%m/%d/%Y')}")
+
+
+# ---------------------------------------------------------------------------
+# Markdown / JSONL
+# ---------------------------------------------------------------------------
+
+def _markdown_block(kind: str, payload: Any) -> str:
+    if kind == "title":
+        return f"# {payload}\n\n"
+    if kind == "subtitle":
+        return f"## {payload}\n\n"
+    if kind in ("meta", "info", "footer"):
+        return f"_{payload}_\n\n"
+    if kind == "rule":
+        return "---\n\n"
+    if kind == "section":
+        return f"## {payload}\n\n"
+    if kind in ("stage", "stage_rankings", "stage_final"):
+        return f"### {payload}\n\n"
+    if kind == "model":
+        return f"#### {payload}\n\n"
+    if kind == "label":
+        return f"**{payload}**\n\n"
+    if kind == "list":
+        return "".join(f"{i}. {item}\n" for i, item in enumerate(payload, start=1)) + "\n"
+    if kind == "table":
+        header, *rows = payload
+        lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+        lines += ["| " + " | ".join(row) + " |" for row in rows]
+        return "\n".join(lines) + "\n\n"
+    return f"{payload.strip()}\n\n"
+
+
+def iter_markdown(conversation: Dict[str, Any], messages: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Render a conversation as Markdown, one chunk per message."""
+    yield "".join(_markdown_block(*b) for b in _header_blocks(conversation)).encode("utf-8")
+    for msg in messages:
+        yield "".join(_markdown_block(*b) for b in _message_blocks(conversation, msg)).encode("utf-8")
+    yield "".join(_markdown_block(*b) for b in _footer_blocks()).encode("utf-8")
+
+
+def iter_jsonl(conversation: Dict[str, Any], messages: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    Render a conversation as JSON Lines: a header line with the
+    conversation metadata, then one line per message.
+    """
+    header = {k: v for k, v in conversation.items() if k != "messages"}
+    header["type"] = "conversation"
+    yield (json.dumps(header, ensure_ascii=False) + "\n").encode("utf-8")
+    for index, msg in enumerate(messages):
+        line = {"type": "message", "index": index, **msg}
+        yield (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# PDF
+# ---------------------------------------------------------------------------
+
+# Helvetica glyph widths (1/1000 em) for ASCII 32..126, from the standard AFM
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+# kind -> (font, size, RGB color, space before, space after)
+_PDF_STYLES = {
+    "title": ("F2", 24, (0.29, 0.56, 0.89), 0, 10),
+    "subtitle": ("F1", 18, (0.2, 0.2, 0.2), 0, 10),
+    "meta": ("F1", 10, (0.4, 0.4, 0.4), 0, 10),
+    "section": ("F2", 14, (0.29, 0.56, 0.89), 10, 8),
+    "stage": ("F2", 16, (0.29, 0.56, 0.89), 15, 10),
+    "stage_rankings": ("F2", 16, (1.0, 0.6, 0.0), 15, 10),
+    "stage_final": ("F2", 16, (0.3, 0.69, 0.31), 15, 10),
+    "model": ("F2", 12, (0.2, 0.2, 0.2), 8, 5),
+    "label": ("F2", 10, (0.4, 0.4, 0.4), 5, 5),
+    "info": ("F1", 9, (0.4, 0.4, 0.4), 0, 10),
+    "text": ("F1", 10, (0.2, 0.2, 0.2), 0, 10),
+    "list": ("F1", 10, (0.2, 0.2, 0.2), 0, 10),
+    "table": ("F1", 10, (0.2, 0.2, 0.2), 0, 10),
+    "footer": ("F1", 9, (0.6, 0.6, 0.6), 10, 0),
+}
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN_X, MARGIN_Y = 40, 60
+LINE_SPACING = 1.4
+
+
+def _markdown_to_text(markdown: str) -> str:
+    """Strip the most common Markdown syntax, keeping the text readable."""
+    text = re.sub(r"```[^\n]*\n?", "", markdown)
+    text = re.sub(r"^\s{0,3}#{1,6}\s*", "", text, flags=re.MULTILINE)
+    text = re.sub(r"!?\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"(\*\*|__|`)", "", text)
+    text = re.sub(r"^(\s*)[*+-]\s+", "\\1• ", text, flags=re.MULTILINE)
+    return text
+
+
+def _pdf_text(text: str) -> str:
+    """
+    Make text representable in the standard PDF fonts (WinAnsi encoding):
+    symbols such as emoji are dropped, other unsupported characters become '?'.
+    """
+    chars = []
+    for char in text:
+        try:
+            char.encode("cp1252")
+            chars.append(char)
+        except UnicodeEncodeError:
+            if unicodedata.category(char) not in ("So", "Sk", "Mn", "Cf"):
+                chars.append("?")
+    return "".join(chars)
+
+
+def _text_width(text: str, size: float, bold: bool) -> float:
+    width = sum(
+        _HELVETICA_WIDTHS[ord(c) - 32] if 32 <= ord(c) <= 126 else 556
+        for c in text
+    )
+    # Helvetica-Bold is slightly wider; wrap conservatively
+    return width * size / 1000 * (1.08 if bold else 1.0)
+
+
+def _wrap(text: str, size: float, bold: bool, max_width: float) -> List[str]:
+    space = _text_width(" ", size, bold)
+    lines = []
+    for paragraph in text.split("\n"):
+        line, line_width = "", 0.0
+        for word in paragraph.split(" "):
+            word_width = _text_width(word, size, bold)
+            if line and line_width + space + word_width <= max_width:
+                line, line_width = f"{line} {word}", line_width + space + word_width
+                continue
+            if line:
+                lines.append(line)
+            # Hard-break words that don't fit on a line by themselves
+            while word_width > max_width:
+                cut = len(word) - 1
+                while cut > 1 and _text_width(word[:cut], size, bold) > max_width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+                word_width = _text_width(word, size, bold)
+            line, line_width = word, word_width
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + escaped.encode("cp1252") + b")"
+
+
+class PdfStreamWriter:
+    """
+    Minimal PDF writer that emits each page as soon as it is full.
+
+    Object numbers 1-5 are reserved for the catalog, the page tree, the two
+    fonts and the document info; the page tree is written last, once all
+    page ids are known, so only one page is ever held in memory.
+    """
+
+    CATALOG, PAGES, FONT_REGULAR, FONT_BOLD, INFO = 1, 2, 3, 4, 5
+
+    def __init__(self, title: str):
+        self.title = title
+        self.offset = 0
+        self.offsets: Dict[int, int] = {}
+        self.next_id = 6
+        self.page_ids: List[int] = []
+        self.ops: List[bytes] = []
+        self.y = PAGE_HEIGHT - MARGIN_Y
+
+    def _object(self, obj_id: int, body: bytes) -> bytes:
+        data = b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+        self.offsets[obj_id] = self.offset
+        self.offset += len(data)
+        return data
+
+    def _allocate(self) -> int:
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def start(self) -> bytes:
+        """PDF header, fonts and document info."""
+        data = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.offset = len(data)
+        data += self._object(self.FONT_REGULAR, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        data += self._object(self.FONT_BOLD, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        data += self._object(
+            self.INFO,
+            b"<< /Title " + _pdf_string(_pdf_text(f"LLM Council - {self.title}")) +
+            b" /Author (LLM Council) /Subject (LLM Council Conversation) >>"
+        )
+        return data
+
+    def _flush_page(self) -> bytes:
+        content = zlib.compress(b"\n".join(self.ops))
+        content_id, page_id = self._allocate(), self._allocate()
+        data = self._object(
+            content_id,
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content) + content + b"\nendstream"
+        )
+        data += self._object(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>"
+            % (self.PAGES, PAGE_WIDTH, PAGE_HEIGHT, self.FONT_REGULAR, self.FONT_BOLD, content_id)
+        )
+        self.page_ids.append(page_id)
+        self.ops = []
+        self.y = PAGE_HEIGHT - MARGIN_Y
+        return data
+
+    def _ensure_space(self, height: float) -> bytes:
+        if self.y - height < MARGIN_Y and self.ops:
+            return self._flush_page()
+        return b""
+
+    def _line(self, text: str, font: str, size: float, color: Tuple[float, float, float], x: float = MARGIN_X) -> bytes:
+        line_height = size * LINE_SPACING
+        data = self._ensure_space(line_height)
+        self.y -= line_height
+        if text:
+            self.ops.append(
+                b"BT /%s %g Tf %g %g %g rg %g %g Td " % ((font.encode(), size) + color + (x, self.y + size * 0.3)) +
+                _pdf_string(text) + b" Tj ET"
+            )
+        return data
+
+    def add_block(self, kind: str, payload: Any) -> bytes:
+        """Lay out one block, returning any pages that were completed."""
+        if kind == "rule":
+            data = self._ensure_space(20)
+            self.y -= 10
+            self.ops.append(b"0.88 0.88 0.88 RG 1 w %g %g m %g %g l S" % (MARGIN_X, self.y, PAGE_WIDTH - MARGIN_X, self.y))
+            self.y -= 10
+            return data
+
+        font, size, color, space_before, space_after = _PDF_STYLES.get(kind, _PDF_STYLES["text"])
+        bold = font == "F2"
+        max_width = PAGE_WIDTH - 2 * MARGIN_X
+        if kind == "list":
+            text = "\n".join(f"{i}. {item}" for i, item in enumerate(payload, start=1))
+        elif kind == "table":
+            text = "\n".join("    ".join(row) for row in payload)
+        elif kind == "text":
+            text = _markdown_to_text(payload)
+        else:
+            text = payload
+
+        data = b""
+        if self.y < PAGE_HEIGHT - MARGIN_Y:
+            self.y -= space_before
+        for line in _wrap(_pdf_text(text), size, bold, max_width):
+            data += self._line(line, font, size, color)
+        self.y -= space_after
+        return data
+
+    def finish(self) -> bytes:
+        """Last page, page tree, catalog, cross-reference table and trailer."""
+        data = self._flush_page() if self.ops or not self.page_ids else b""
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        data += self._object(self.PAGES, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self.page_ids))
+        data += self._object(self.CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES)
+
+        xref_offset = self.offset
+        size = self.next_id
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            xref.append(b"%010d 00000 n \n" % self.offsets[obj_id])
+        data += b"".join(xref)
+        data += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            size, self.CATALOG, self.INFO, xref_offset
+        )
+        return data
+
+
+def iter_pdf(conversation: Dict[str, Any], messages: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Render a conversation as a PDF, emitting pages as they fill up."""
+    writer = PdfStreamWriter(conversation.get("title") or "Conversation")
+    yield writer.start()
+    for block in _header_blocks(conversation):
+        yield writer.add_block(*block)
+    for msg in messages:
+        data = b"".join(writer.add_block(*block) for block in _message_blocks(conversation, msg))
+        if data:
+            yield data
+    for block in _footer_blocks():
+        yield writer.add_block(*block)
+    yield writer.finish()
+
+
+_RENDERERS = {
+    "markdown": iter_markdown,
+    "jsonl": iter_jsonl,
+    "pdf": iter_pdf,
+}
+
+
+def iter_export(conversation: Dict[str, Any], messages: Iterable[Dict[str, Any]], fmt: str) -> Iterator[bytes]:
+    """
+    Render a conversation in the given export format.
+
+    Args:
+        conversation: Conversation fields other than messages
+        messages: The conversation's messages, consumed one at a time
+            (see storage.open_conversation())
+        fmt: One of EXPORT_FORMATS
+
+    Yields:
+        Chunks of the exported file
+    """
+    for chunk in _RENDERERS[fmt](conversation, messages):
+        if chunk:
+            yield chunk
+
+
+# ---------------------------------------------------------------------------
+# Zip archive of all conversations
+# ---------------------------------------------------------------------------
+
+class _ChunkBuffer:
+    """Write-only, non-seekable file object that zipfile writes into."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_export_archive(fmt: str) -> Iterator[bytes]:
+    """
+    Export every stored conversation into a zip archive, streamed.
+
+    Conversations are read message by message and compressed one at a
+    time; the archive is written without seeking (entries use data descriptors), so chunks can
+    be sent as soon as they are produced.
+
+    Args:
+        fmt: One of EXPORT_FORMATS, used for every file in the archive
+
+    Yields:
+        Chunks of the zip file
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for conversation_id in storage.iter_conversation_ids():
+            opened = storage.open_conversation(conversation_id)
+            if opened is None:
+                continue
+            conversation, messages = opened
+            name = export_filename(conversation, fmt)
+            # Titles aren't unique; the id prefix keeps entry names distinct
+            name = name.replace("llm-council-", f"{conversation_id[:8]}-", 1)
+            with archive.open(name, "w") as entry:
+                for chunk in iter_export(conversation, messages, fmt):
+                    entry.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    yield buffer.drain()
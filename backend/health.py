@@ -0,0 +1,263 @@
+"""
+Circuit breakers and health scoring for upstream models.
+
+Breakers are kept per route, i.e. per (provider, model): a model served by
+several providers (see providers.py) stays available while one of them is
+failing. The health report shows each model's healthiest route, with the
+state of every route.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+
+from .config import (
+    BREAKER_WINDOW_SECONDS,
+    BREAKER_MIN_REQUESTS,
+    BREAKER_ERROR_THRESHOLD,
+    BREAKER_TIMEOUT_THRESHOLD,
+    BREAKER_COOLDOWN_SECONDS,
+    BREAKER_MAX_COOLDOWN_SECONDS,
+    HEALTH_PROBE_INTERVAL,
+    HEALTH_PROBE_TIMEOUT,
+)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Minimal request used by the background probe to check for recovery
+PROBE_MESSAGES = [{"role": "user", "content": "Reply with the single word: ok"}]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single upstream model on one provider.
+
+    closed: requests flow; outcomes are recorded in a rolling window.
+    open: requests are rejected (callers go to the fallback) until the
+        cooldown elapses.
+    half_open: a single trial request (usually the background probe) is let
+        through; success closes the breaker, failure re-opens it with a
+        doubled cooldown.
+    """
+
+    def __init__(self, model: str, provider: str):
+        self.model = model
+        self.provider = provider
+        self.state = STATE_CLOSED
+        # (timestamp, ok, timed_out, latency)
+        self.outcomes: deque = deque()
+        self.consecutive_timeouts = 0
+        self.opened_at: Optional[float] = None
+        self.cooldown = BREAKER_COOLDOWN_SECONDS
+        self.trial_in_flight = False
+        self.last_error: Optional[str] = None
+        self.last_latency: Optional[float] = None
+
+    def _prune(self, now: float):
+        while self.outcomes and now - self.outcomes[0][0] > BREAKER_WINDOW_SECONDS:
+            self.outcomes.popleft()
+
+    def _open(self, now: float):
+        if self.state == STATE_HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN_SECONDS)
+        self.state = STATE_OPEN
+        self.opened_at = now
+        self.trial_in_flight = False
+        print(f"Circuit breaker OPEN for {self.model} on {self.provider} (cooldown {self.cooldown:.0f}s)")
+
+    def _close(self):
+        if self.state != STATE_CLOSED:
+            print(f"Circuit breaker CLOSED for {self.model} on {self.provider}")
+        self.state = STATE_CLOSED
+        self.opened_at = None
+        self.cooldown = BREAKER_COOLDOWN_SECONDS
+        self.trial_in_flight = False
+        self.consecutive_timeouts = 0
+
+    def cooldown_elapsed(self, now: Optional[float] = None) -> bool:
+        """True if an open breaker is due for a recovery trial."""
+        now = time.monotonic() if now is None else now
+        return self.state == STATE_OPEN and now - self.opened_at >= self.cooldown
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be sent to this model right now.
+
+        Moves an open breaker to half-open once its cooldown has elapsed and
+        admits exactly one trial request in that state.
+        """
+        now = time.monotonic()
+        if self.state == STATE_CLOSED:
+            return True
+        if self.cooldown_elapsed(now):
+            self.state = STATE_HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == STATE_HALF_OPEN and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def abandon(self):
+        """Release a half-open trial slot whose request was cancelled."""
+        if self.state == STATE_HALF_OPEN:
+            self.trial_in_flight = False
+
+    def record_success(self, latency: float):
+        """Record a successful request."""
+        now = time.monotonic()
+        self.outcomes.append((now, True, False, latency))
+        self._prune(now)
+        self.consecutive_timeouts = 0
+        self.last_latency = latency
+        if self.state != STATE_CLOSED:
+            self._close()
+
+    def record_failure(self, error: str, timed_out: bool = False):
+        """Record a failed request and open the breaker if thresholds are hit."""
+        now = time.monotonic()
+        self.outcomes.append((now, False, timed_out, None))
+        self._prune(now)
+        self.last_error = error
+        self.consecutive_timeouts = self.consecutive_timeouts + 1 if timed_out else 0
+
+        if self.state == STATE_HALF_OPEN:
+            self._open(now)
+            return
+        if self.state == STATE_OPEN:
+            return
+
+        if self.consecutive_timeouts >= BREAKER_TIMEOUT_THRESHOLD:
+            self._open(now)
+        elif (
+            len(self.outcomes) >= BREAKER_MIN_REQUESTS
+            and self.error_rate() >= BREAKER_ERROR_THRESHOLD
+        ):
+            self._open(now)
+
+    def error_rate(self) -> float:
+        """Fraction of failed requests in the rolling window."""
+        if not self.outcomes:
+            return 0.0
+        failures = sum(1 for _, ok, _, _ in self.outcomes if not ok)
+        return failures / len(self.outcomes)
+
+    def average_latency(self) -> Optional[float]:
+        """Mean latency of successful requests in the rolling window."""
+        latencies = [lat for _, ok, _, lat in self.outcomes if ok]
+        if not latencies:
+            return None
+        return sum(latencies) / len(latencies)
+
+    def health_score(self, expected_latency: Optional[float] = None) -> float:
+        """
+        Health score in [0, 1]: success rate, penalised when the model is
+        slower than its expected latency. Open breakers score 0.
+        """
+        if self.state == STATE_OPEN:
+            return 0.0
+        score = 1.0 - self.error_rate()
+        avg_latency = self.average_latency()
+        if expected_latency and avg_latency and avg_latency > expected_latency:
+            score *= expected_latency / avg_latency
+        if self.state == STATE_HALF_OPEN:
+            score *= 0.5
+        return round(score, 3)
+
+    def snapshot(self, expected_latency: Optional[float] = None) -> Dict[str, Any]:
+        """Serialize breaker state for the API."""
+        now = time.monotonic()
+        self._prune(now)
+        timeouts = sum(1 for _, _, timed_out, _ in self.outcomes if timed_out)
+        avg_latency = self.average_latency()
+        retry_in = None
+        if self.state == STATE_OPEN:
+            retry_in = round(max(0.0, self.opened_at + self.cooldown - now), 1)
+        return {
+            "model": self.model,
+            "provider": self.provider,
+            "state": self.state,
+            "health_score": self.health_score(expected_latency),
+            "error_rate": round(self.error_rate(), 3),
+            "requests": len(self.outcomes),
+            "timeouts": timeouts,
+            "average_latency": round(avg_latency, 2) if avg_latency is not None else None,
+            "last_latency": round(self.last_latency, 2) if self.last_latency is not None else None,
+            "last_error": self.last_error,
+            "retry_in": retry_in,
+        }
+
+
+# (provider, model) -> breaker
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+
+def get_breaker(model: str, provider: str) -> CircuitBreaker:
+    """Get (or create) the circuit breaker for a model on a provider."""
+    breaker = _breakers.get((provider, model))
+    if breaker is None:
+        breaker = CircuitBreaker(model, provider)
+        _breakers[(provider, model)] = breaker
+    return breaker
+
+
+def get_model_breakers(model: str) -> List[CircuitBreaker]:
+    """The breakers of every route currently configured for a model."""
+    from .providers import get_routes
+    from .registry import get_model_spec
+
+    return [get_breaker(model, provider.name) for provider, _ in get_routes(get_model_spec(model))]
+
+
+def get_health_report(models: List[str]) -> List[Dict[str, Any]]:
+    """
+    Build the health report for a set of models.
+
+    Args:
+        models: Model identifiers to report on (models never queried are
+            reported as closed with a perfect score)
+
+    Returns:
+        List of snapshots of each model's healthiest route, with 'routes'
+        (provider -> state and health_score of each route), worst health first
+    """
+    from .registry import get_model_spec
+
+    report = []
+    for model in models:
+        expected_latency = get_model_spec(model).expected_latency
+        snapshots = [breaker.snapshot(expected_latency) for breaker in get_model_breakers(model)]
+        best = max(snapshots, key=lambda snapshot: snapshot["health_score"])
+        best["routes"] = {
+            snapshot["provider"]: {"state": snapshot["state"], "health_score": snapshot["health_score"]}
+            for snapshot in snapshots
+        }
+        report.append(best)
+    report.sort(key=lambda entry: entry["health_score"])
+    return report
+
+
+async def probe_open_breakers():
+    """Send a probe request to every open breaker whose cooldown has elapsed."""
+    from .openrouter import query_route
+
+    due = [b for b in list(_breakers.values()) if b.cooldown_elapsed()]
+    if not due:
+        return
+    print(f"Probing degraded routes: {[f'{b.model} on {b.provider}' for b in due]}")
+    await asyncio.gather(*[
+        query_route(b.model, b.provider, PROBE_MESSAGES, timeout=HEALTH_PROBE_TIMEOUT)
+        for b in due
+    ])
+
+
+async def run_probe_loop():
+    """Background task: periodically probe open breakers for recovery."""
+    while True:
+        await asyncio.sleep(HEALTH_PROBE_INTERVAL)
+        try:
+            await probe_open_breakers()
+        except Exception as e:
+            print(f"Error probing models: {e}")
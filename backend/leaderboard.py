@@ -0,0 +1,287 @@
+"""Cross-conversation model leaderboard (SQLite).
+
+Statistics are materialised per council type, day and model, and updated
+incrementally by the storage layer when a council run completes, so the
+leaderboard never has to load conversations. To (re)build them from
+existing conversations:
+
+    uv run python -m backend.leaderboard --backfill
+
+Per model: runs it was ranked in, runs it won (best average rank in the
+run, shared on ties; by Bradley-Terry strength for sharded runs), Stage 2 ballots, sum of positions and first places.
+Per pair of models: how often one was ranked above the other.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from .config import LEADERBOARD_PATH, LEADERBOARD_EXCLUDE_SELF, COUNCIL_TYPE_PREMIUM
+from .council import build_label_to_model
+from .ranking import ballots_from_run, bradley_terry, mean_rank, pairwise_wins
+
+_local = threading.local()
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(LEADERBOARD_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(LEADERBOARD_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS model_stats ("
+            "council_type TEXT NOT NULL, day TEXT NOT NULL, model TEXT NOT NULL, "
+            "runs INTEGER NOT NULL, wins REAL NOT NULL, ballots INTEGER NOT NULL, "
+            "rank_sum INTEGER NOT NULL, firsts INTEGER NOT NULL, "
+            "PRIMARY KEY (council_type, day, model))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS head_to_head ("
+            "council_type TEXT NOT NULL, day TEXT NOT NULL, model TEXT NOT NULL, "
+            "opponent TEXT NOT NULL, wins INTEGER NOT NULL, "
+            "PRIMARY KEY (council_type, day, model, opponent))"
+        )
+        # Runs already counted, so a run re-saved as complete isn't counted twice
+        conn.execute("CREATE TABLE IF NOT EXISTS recorded_runs (run_key TEXT PRIMARY KEY)")
+        _local.conn = conn
+    return conn
+
+
+def _record(
+    conn: sqlite3.Connection,
+    run_key: str,
+    council_type: str,
+    day: str,
+    message: Dict[str, Any]
+) -> bool:
+    """Add one run's statistics inside the caller's transaction."""
+    if conn.execute("SELECT 1 FROM recorded_runs WHERE run_key = ?", (run_key,)).fetchone():
+        return False
+    conn.execute("INSERT INTO recorded_runs (run_key) VALUES (?)", (run_key,))
+
+    label_to_model = (message.get("metadata") or {}).get("label_to_model") \
+        or build_label_to_model(message.get("stage1") or [])
+    ballots = ballots_from_run(message["stage2"], label_to_model, exclude_self=LEADERBOARD_EXCLUDE_SELF)
+    if not ballots.judges:
+        return True
+
+    ranked = ballots.ranked
+    counts = ranked.sum(axis=0)
+    rank_sums = ballots.positions.sum(axis=0, dtype=np.int64)
+    firsts = (ballots.positions == 1).sum(axis=0)
+    pairwise = pairwise_wins(ballots)
+    if any(result.get("shard") for result in message["stage2"]):
+        # Judges of a sharded run ranked different subsets, so positions
+        # aren't comparable across ballots; use the merged ranking instead
+        strengths = bradley_terry(pairwise)
+        winners = np.flatnonzero(np.isclose(strengths, strengths.max()))
+    else:
+        means = mean_rank(ballots)
+        winners = np.flatnonzero(means == np.nanmin(means))
+
+    model_rows = []
+    for c, model in enumerate(ballots.candidates):
+        if counts[c] == 0:
+            continue
+        wins = 1.0 / len(winners) if c in winners else 0.0
+        model_rows.append((council_type, day, model, 1, wins, int(counts[c]), int(rank_sums[c]), int(firsts[c])))
+    conn.executemany(
+        "INSERT INTO model_stats (council_type, day, model, runs, wins, ballots, rank_sum, firsts) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(council_type, day, model) DO UPDATE SET "
+        "runs = runs + excluded.runs, wins = wins + excluded.wins, ballots = ballots + excluded.ballots, "
+        "rank_sum = rank_sum + excluded.rank_sum, firsts = firsts + excluded.firsts",
+        model_rows
+    )
+
+    pair_rows = [
+        (council_type, day, ballots.candidates[a], ballots.candidates[b], int(pairwise[a, b]))
+        for a, b in zip(*np.nonzero(pairwise))
+    ]
+    conn.executemany(
+        "INSERT INTO head_to_head (council_type, day, model, opponent, wins) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(council_type, day, model, opponent) DO UPDATE SET wins = wins + excluded.wins",
+        pair_rows
+    )
+    return True
+
+
+def _run_key(conversation_id: str, message_index: int, message: Dict[str, Any]) -> str:
+    return message.get("run_id") or f"{conversation_id}:{message_index}"
+
+
+def record_run(
+    conversation_id: str,
+    message_index: int,
+    message: Dict[str, Any],
+    council_type: Optional[str] = None,
+    day: Optional[str] = None
+) -> bool:
+    """
+    Add a completed council run to the leaderboard statistics.
+
+    Args:
+        conversation_id: Conversation identifier
+        message_index: Position of the assistant message in the conversation
+        message: Assistant message with stage1/stage2 (and metadata)
+        council_type: Council type of the run
+        day: UTC day (YYYY-MM-DD) to file the run under, default today
+
+    Returns:
+        True if the run was added, False if it had no Stage 2 results, was
+        already recorded or reused another run's results
+    """
+    if not message.get("stage2") or message.get("coalesced_from") or message.get("cached_from"):
+        return False
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        recorded = _record(
+            conn,
+            _run_key(conversation_id, message_index, message),
+            council_type or message.get("council_type") or COUNCIL_TYPE_PREMIUM,
+            day or datetime.utcnow().date().isoformat(),
+            message
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return recorded
+
+
+def backfill() -> int:
+    """
+    Rebuild all statistics from the stored conversations.
+
+    Runs are filed under their conversation's creation day (messages
+    don't store their own timestamp).
+
+    Returns:
+        Number of runs recorded
+    """
+    from . import storage
+
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in ("model_stats", "head_to_head", "recorded_runs"):
+            conn.execute(f"DELETE FROM {table}")
+        count = 0
+        for conversation in storage.iter_conversations():
+            day = (conversation.get("created_at") or "")[:10] or datetime.utcnow().date().isoformat()
+            for index, message in enumerate(conversation["messages"]):
+                if message.get("role") != "assistant" or not message.get("stage2"):
+                    continue
+                if message.get("coalesced_from") or message.get("cached_from"):
+                    continue
+                if message.get("status", storage.RUN_STATUS_COMPLETE) != storage.RUN_STATUS_COMPLETE:
+                    continue
+                council_type = message.get("council_type") or conversation.get("council_type") or COUNCIL_TYPE_PREMIUM
+                if _record(conn, _run_key(conversation["id"], index, message), council_type, day, message):
+                    count += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return count
+
+
+def get_leaderboard(
+    council_type: Optional[str] = None,
+    days: Optional[int] = None,
+    min_runs: int = 1
+) -> Dict[str, Any]:
+    """
+    Read the leaderboard from the materialised statistics.
+
+    Args:
+        council_type: Restrict to one council tier (default: all tiers)
+        days: Only count runs from the last N days (default: all time)
+        min_runs: Leave out models ranked in fewer runs than this
+
+    Returns:
+        Dict with the filters, per-model statistics sorted by win rate
+        then average rank, and the head-to-head matrix
+    """
+    where, params = [], []
+    if council_type:
+        where.append("council_type = ?")
+        params.append(council_type)
+    since = None
+    if days:
+        since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+        where.append("day >= ?")
+        params.append(since)
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+    conn = _conn()
+    models = []
+    for model, runs, wins, ballots, rank_sum, firsts in conn.execute(
+        "SELECT model, SUM(runs), SUM(wins), SUM(ballots), SUM(rank_sum), SUM(firsts) "
+        f"FROM model_stats {clause} GROUP BY model",
+        params
+    ):
+        if runs < min_runs:
+            continue
+        models.append({
+            "model": model,
+            "runs": runs,
+            "wins": round(wins, 2),
+            "win_rate": round(wins / runs, 4),
+            "ballots": ballots,
+            "average_rank": round(rank_sum / ballots, 2) if ballots else None,
+            "first_place_rate": round(firsts / ballots, 4) if ballots else None,
+        })
+    models.sort(key=lambda m: (-m["win_rate"], m["average_rank"] or 0))
+
+    included = {m["model"] for m in models}
+    wins = {}
+    for model, opponent, count in conn.execute(
+        f"SELECT model, opponent, SUM(wins) FROM head_to_head {clause} GROUP BY model, opponent",
+        params
+    ):
+        if model in included and opponent in included:
+            wins[(model, opponent)] = count
+
+    head_to_head: Dict[str, Dict[str, Any]] = {}
+    for (model, opponent), count in wins.items():
+        losses = wins.get((opponent, model), 0)
+        head_to_head.setdefault(model, {})[opponent] = {
+            "wins": count,
+            "losses": losses,
+            "win_rate": round(count / (count + losses), 4),
+        }
+    # Pairs where one side never won still get an entry for the winner's opponent
+    for (model, opponent), count in wins.items():
+        if (opponent, model) not in wins:
+            head_to_head.setdefault(opponent, {})[model] = {"wins": 0, "losses": count, "win_rate": 0.0}
+
+    return {
+        "council_type": council_type,
+        "since": since,
+        "exclude_self_votes": LEADERBOARD_EXCLUDE_SELF,
+        "models": models,
+        "head_to_head": head_to_head,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Manage the model leaderboard statistics")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild statistics from stored conversations")
+    parser.add_argument("--council-type", help="Show the leaderboard for one council tier")
+    parser.add_argument("--days", type=int, help="Only count the last N days")
+    args = parser.parse_args()
+
+    if args.backfill:
+        print(f"Recorded {backfill()} runs into {LEADERBOARD_PATH}")
+    print(json.dumps(get_leaderboard(args.council_type, args.days), indent=2))
@@ -0,0 +1,228 @@
+"""HTTP load test of the backend with different numbers of worker processes.
+
+For each worker count, starts `python -m backend.main` with WEB_CONCURRENCY
+set to it (in a scratch directory, so it gets empty conversation and state
+databases) against the offline mock server (backend/mock_server.py), then
+drives it with concurrent clients. Each client owns a conversation and
+repeatedly either sends it a message through the streaming endpoint
+(reading the events to the end) or lists the conversations or loads one.
+Reports requests per second for each worker count:
+
+    uv run python -m backend.loadtest --workers 1 2 4 --seconds 30
+
+The backend listens on its usual port (8001), which must be free. Model
+calls take MOCK_LATENCY seconds (--mock-latency), so streamed runs mostly
+wait on the mock; the list and conversation requests measure the backend's
+own work and its shared state.
+"""
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any
+
+import httpx
+
+BACKEND_URL = "http://127.0.0.1:8001"
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUEST_KINDS = ("stream", "list", "get")
+
+
+def _start(args: List[str], cwd: str, env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    with open(log_path, "ab") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m"] + args, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+
+
+def _stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def _wait_until_ready(client: httpx.AsyncClient, url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode}")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:g}s")
+
+
+async def _stream_message(client: httpx.AsyncClient, conversation_id: str, content: str) -> bool:
+    """Send a message and read its events; True if the run completed."""
+    completed = False
+    async with client.stream(
+        "POST", f"{BACKEND_URL}/api/conversations/{conversation_id}/message/stream",
+        json={"content": content, "council_type": "economic"}
+    ) as response:
+        if response.status_code != 200:
+            return False
+        async for line in response.aiter_lines():
+            if line.startswith("data: ") and json.loads(line[len("data: "):]).get("type") == "complete":
+                completed = True
+    return completed
+
+
+async def _client_loop(
+    client: httpx.AsyncClient,
+    number: int,
+    conversation_ids: List[str],
+    stream_share: float,
+    end_at: float,
+    results: Dict[str, Dict[str, Any]]
+):
+    """One simulated user, sending requests back to back until end_at."""
+    own_id = conversation_ids[number]
+    sent = 0
+    while time.monotonic() < end_at:
+        roll = random.random()
+        if roll < stream_share:
+            kind = "stream"
+        else:
+            kind = "list" if roll < stream_share + (1 - stream_share) / 2 else "get"
+        start = time.monotonic()
+        try:
+            if kind == "stream":
+                sent += 1
+                # Distinct questions, so runs aren't coalesced or served from a cache
+                ok = await _stream_message(client, own_id, f"Load test question {number}-{sent}: what is {sent} + {number}?")
+            elif kind == "list":
+                ok = (await client.get(f"{BACKEND_URL}/api/conversations")).status_code == 200
+            else:
+                conversation_id = random.choice(conversation_ids)
+                ok = (await client.get(f"{BACKEND_URL}/api/conversations/{conversation_id}")).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        if time.monotonic() > end_at:
+            break  # Only count requests that finished within the run
+        result = results[kind]
+        if ok:
+            result["latencies"].append(time.monotonic() - start)
+        else:
+            result["errors"] += 1
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else 0.0
+
+
+async def _run(workers: int, clients: int, seconds: float, stream_share: float, mock_url: str) -> Dict[str, Dict[str, Any]]:
+    """Start the backend with this many workers, load it, and stop it."""
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get("PYTHONPATH")])),
+        WEB_CONCURRENCY=str(workers),
+        OPENROUTER_API_URL=mock_url,
+        OPENROUTER_API_KEY=os.environ.get("OPENROUTER_API_KEY") or "loadtest",
+        WARMUP_ENABLED="false",
+    )
+    results = {kind: {"latencies": [], "errors": 0} for kind in REQUEST_KINDS}
+    with tempfile.TemporaryDirectory(prefix="llm-council-loadtest-") as workdir:
+        backend = _start(["backend.main"], workdir, env, os.path.join(workdir, "backend.log"))
+        try:
+            limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+            async with httpx.AsyncClient(timeout=300.0, limits=limits) as client:
+                await _wait_until_ready(client, f"{BACKEND_URL}/api/ready", backend)
+                conversation_ids = []
+                for _ in range(clients):
+                    response = await client.post(f"{BACKEND_URL}/api/conversations", json={"council_type": "economic"})
+                    response.raise_for_status()
+                    conversation_ids.append(response.json()["id"])
+                end_at = time.monotonic() + seconds
+                await asyncio.gather(*(
+                    _client_loop(client, number, conversation_ids, stream_share, end_at, results)
+                    for number in range(clients)
+                ))
+        finally:
+            _stop(backend)
+    return results
+
+
+def load_test(
+    workers: List[int],
+    seconds: float = 30.0,
+    clients: int = 16,
+    stream_share: float = 0.2,
+    mock_latency: float = 0.2,
+    mock_port: int = 8002
+):
+    """
+    Run the load test for each worker count and print the results.
+
+    Args:
+        workers: Worker counts to compare
+        seconds: Duration of each run
+        clients: Number of concurrent clients
+        stream_share: Fraction of requests that send a message (the rest
+            are split evenly between listing and loading conversations)
+        mock_latency: Simulated latency of each model call, in seconds
+        mock_port: Port of the mock server started for the test
+    """
+    mock_env = dict(os.environ, MOCK_PORT=str(mock_port), MOCK_LATENCY=str(mock_latency), MOCK_LATENCY_JITTER="0")
+    mock_url = f"http://127.0.0.1:{mock_port}/api/v1/chat/completions"
+    print(
+        f"{os.cpu_count()} CPU(s), {clients} clients, {seconds:g}s per run, "
+        f"{stream_share:.0%} streamed messages, {mock_latency:g}s per model call"
+    )
+
+    with tempfile.TemporaryDirectory(prefix="llm-council-mock-") as mock_dir:
+        mock = _start(["backend.mock_server"], PROJECT_DIR, mock_env, os.path.join(mock_dir, "mock.log"))
+        try:
+            baseline = None
+            for count in workers:
+                async def run():
+                    async with httpx.AsyncClient() as client:
+                        await _wait_until_ready(client, f"http://127.0.0.1:{mock_port}/docs", mock)
+                    return await _run(count, clients, seconds, stream_share, mock_url)
+
+                results = asyncio.run(run())
+                completed = sum(len(result["latencies"]) for result in results.values())
+                errors = sum(result["errors"] for result in results.values())
+                throughput = completed / seconds
+                baseline = baseline or throughput
+                details = ", ".join(
+                    f"{kind} {len(result['latencies']) / seconds:.1f}/s "
+                    f"(p50 {_percentile(result['latencies'], 0.5) * 1000:.0f} ms, "
+                    f"p95 {_percentile(result['latencies'], 0.95) * 1000:.0f} ms)"
+                    for kind, result in results.items()
+                )
+                print(
+                    f"  {count:>2} worker(s): {throughput:7.1f} req/s ({throughput / baseline:.2f}x), "
+                    f"{errors} errors; {details}"
+                )
+        finally:
+            _stop(mock)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HTTP load test of the backend with several worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="Worker counts to compare (default: 1 2 4)")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Duration of each run (default: 30)")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients (default: 16)")
+    parser.add_argument("--stream-share", type=float, default=0.2,
+                        help="Fraction of requests that stream a new message (default: 0.2)")
+    parser.add_argument("--mock-latency", type=float, default=0.2,
+                        help="Simulated latency of each model call in seconds (default: 0.2)")
+    parser.add_argument("--mock-port", type=int, default=8002, help="Port for the mock server (default: 8002)")
+    args = parser.parse_args()
+
+    load_test(args.workers, args.seconds, args.clients, args.stream_share, args.mock_latency, args.mock_port)
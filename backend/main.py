@@ -1,17 +1,35 @@
 """FastAPI backend for LLM Council."""
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse
+from email.utils import formatdate, parsedate_to_datetime
+from starlette.requests import HTTPConnection
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import uuid
-import json
 import asyncio
+import hmac
 
 from . import storage
-from .council import run_full_council, generate_conversation_title, stage1_collect_responses, stage2_collect_rankings, stage3_synthesize_final, calculate_aggregate_rankings, get_council_config
-from .config import COUNCIL_TYPE_PREMIUM, COUNCIL_TYPE_ECONOMIC, COUNCIL_TYPE_FREE
+from . import metrics
+from . import search
+from . import leaderboard
+from . import costs
+from . import profiling
+from . import ws
+from . import archive
+from .ballots import get_ballot_stats
+from .cascade import get_cascade_stats
+from .export import EXPORT_FORMATS, export_filename, iter_export, iter_export_archive
+from .shared import rate_limit_exceeded
+from .runner import stream_new_run, stream_resume_run
+from .sse import sse_response
+from .config import COUNCIL_TYPE_PREMIUM, RATE_LIMIT_PER_MINUTE, WEB_CONCURRENCY, SPECULATIVE_CHAIRMAN, BUDGET_MAX_CONVERSATION_COST, DEADLINE_DEFAULT_SECONDS, PROFILING_TOKEN, NEARDUP_CACHE
+from .registry import get_registry, reload_registry
+from .health import get_health_report, run_probe_loop
+from .providers import get_route_latencies
+from .warmup import warm_up, get_warmup_status
 
 app = FastAPI(title="LLM Council API")
 
@@ -51,9 +69,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by the frontend to make conditional requests
+    expose_headers=["ETag", "Last-Modified"],
 )
 
 
+@app.on_event("startup")
+async def start_background_tasks():
+    """
+    Move conversations stored in the flat layout into shards, then start the
+    warm-up, the background probe that checks degraded models for recovery,
+    the archive compaction and the metrics flush.
+    """
+    storage.ensure_data_dir()
+    asyncio.create_task(warm_up())
+    asyncio.create_task(run_probe_loop())
+    asyncio.create_task(archive.run_compaction_loop())
+    asyncio.create_task(metrics.run_flush_loop())
+
+
+@app.on_event("shutdown")
+async def flush_metrics():
+    """Write the metrics recorded since the last flush before the worker exits."""
+    await asyncio.to_thread(metrics.flush)
+
+
 class CreateConversationRequest(BaseModel):
     """Request to create a new conversation."""
     council_type: str = Field(
@@ -69,6 +109,41 @@ class SendMessageRequest(BaseModel):
         default=COUNCIL_TYPE_PREMIUM,
         description="Type of council: premium, economic, or free"
     )
+    speculative: Optional[bool] = Field(
+        default=None,
+        description="Start the chairman in parallel with Stage 2 (defaults to SPECULATIVE_CHAIRMAN)"
+    )
+    cache: Optional[bool] = Field(
+        default=None,
+        description="Answer near-duplicate questions from earlier runs (defaults to NEARDUP_CACHE; false forces a fresh run; true is refused when NEARDUP_CACHE=off)"
+    )
+    deadline_seconds: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Total time budget for the run in seconds (defaults to DEADLINE_DEFAULT_SECONDS; 0 = none)"
+    )
+
+    def use_speculative(self) -> bool:
+        """Whether this request runs the chairman speculatively."""
+        return SPECULATIVE_CHAIRMAN if self.speculative is None else self.speculative
+
+    def use_deadline(self) -> Optional[float]:
+        """This request's time budget in seconds, or None for no deadline."""
+        seconds = DEADLINE_DEFAULT_SECONDS if self.deadline_seconds is None else self.deadline_seconds
+        return seconds or None
+
+
+class EstimateRequest(BaseModel):
+    """Request for a pre-flight cost estimate of a council run."""
+    content: str
+    council_type: str = Field(
+        default=COUNCIL_TYPE_PREMIUM,
+        description="Type of council: premium, economic, or free"
+    )
+    conversation_id: Optional[str] = Field(
+        default=None,
+        description="Conversation the run would belong to (counts its spend against the conversation cap)"
+    )
 
 
 class ConversationMetadata(BaseModel):
@@ -93,12 +168,204 @@ async def root():
     return {"status": "ok", "service": "LLM Council API"}
 
 
+@app.get("/api/ready")
+async def readiness(response: Response):
+    """Readiness check: 503 until the startup warm-up finishes or times out."""
+    status = get_warmup_status()
+    if not status["ready"]:
+        response.status_code = 503
+    return {**status, "routes": get_route_latencies()}
+
+
+@app.get("/api/council/config")
+async def get_council_registry():
+    """Get the active council registry (councils and per-model attributes)."""
+    return get_registry().to_dict()
+
+
+@app.post("/api/council/config/reload")
+async def reload_council_registry():
+    """Force a reload of the council registry file."""
+    return reload_registry(force=True).to_dict()
+
+
+@app.get("/api/health/models")
+async def get_models_health():
+    """Circuit breaker state and health score for every configured model, and provider route latencies."""
+    models = get_registry().council_models(include_fallbacks=True)
+    return {"models": get_health_report(models), "routes": get_route_latencies()}
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Counters and latency summaries, aggregated across all workers."""
+    return metrics.get_metrics()
+
+
+@app.get("/api/metrics/ballots")
+async def get_ballot_metrics():
+    """Stage 2 ballot parse failure and re-ask rates per judge model."""
+    return {"models": get_ballot_stats()}
+
+
+@app.get("/api/metrics/cascade")
+async def get_cascade_metrics():
+    """Cascade council runs: escalation rate, and latency and cost of each path."""
+    return get_cascade_stats()
+
+
+@app.get("/api/metrics/archive")
+async def get_archive_metrics():
+    """Archived conversations, pack files, and their total and still-referenced bytes."""
+    return archive.get_archive_stats()
+
+
+def check_rate_limit(http_request: HTTPConnection):
+    """Reject the request (or WebSocket run) with 429 if the client exceeded RATE_LIMIT_PER_MINUTE."""
+    client = http_request.client.host if http_request.client else "unknown"
+    if rate_limit_exceeded(client, RATE_LIMIT_PER_MINUTE):
+        metrics.incr("rate_limited_requests")
+        raise HTTPException(status_code=429, detail="Rate limit exceeded, try again in a minute")
+
+
+def profiling_requested(http_request: Request) -> bool:
+    """
+    Whether the request asks for profiling (X-Profile-Run header or ?profile=).
+
+    Raises:
+        HTTPException: 403 if it does without the right PROFILING_TOKEN
+    """
+    value = http_request.headers.get("x-profile-run") or http_request.query_params.get("profile")
+    if not value:
+        return False
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (set PROFILING_TOKEN)")
+    if not hmac.compare_digest(value, PROFILING_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+    return True
+
+
+@app.get("/api/profiles")
+async def list_profiles(http_request: Request):
+    """List captured run profiles, newest first (requires the profiling token)."""
+    if not profiling_requested(http_request):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+    return {"profiles": profiling.list_profiles()}
+
+
+@app.get("/api/profiles/{run_id}")
+async def get_profile(run_id: str, http_request: Request):
+    """Summary of a run's profile: sample counts, event-loop lag and top functions."""
+    if not profiling_requested(http_request):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+    path = profiling.get_profile_path(run_id, "json")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
+
+
+@app.get("/api/profiles/{run_id}/folded")
+async def download_profile(run_id: str, http_request: Request):
+    """Download a run's stacks in folded format (flamegraph.pl, inferno, speedscope)."""
+    if not profiling_requested(http_request):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+    path = profiling.get_profile_path(run_id, "folded")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"run-{run_id}.folded")
+
+
+def not_modified(http_request: Request, response: Response, etag: str, modified_ns: int) -> Optional[Response]:
+    """
+    Handle a conditional GET.
+
+    Sets the ETag and Last-Modified validators on `response`, and returns a
+    304 response if the client's copy is current (If-None-Match, or
+    If-Modified-Since when no ETag was sent), else None.
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(modified_ns / 1e9, usegmt=True),
+        # Cache, but revalidate every time
+        "Cache-Control": "no-cache",
+    }
+    response.headers.update(headers)
+
+    if_none_match = http_request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        current = etag in tags or "*" in tags
+    else:
+        if_modified_since = http_request.headers.get("if-modified-since")
+        try:
+            current = if_modified_since is not None and \
+                int(modified_ns / 1e9) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            current = False
+    if not current:
+        return None
+    metrics.incr("http_not_modified")
+    return Response(status_code=304, headers=headers)
+
+
 @app.get("/api/conversations", response_model=List[ConversationMetadata])
-async def list_conversations():
-    """List all conversations (metadata only)."""
+async def list_conversations(http_request: Request, response: Response):
+    """List all conversations (metadata only). Supports If-None-Match / If-Modified-Since."""
+    version, modified_ns = storage.get_list_version()
+    cached = not_modified(http_request, response, f'"{version}"', modified_ns)
+    if cached is not None:
+        return cached
     return storage.list_conversations()
 
 
+@app.get("/api/search")
+async def search_conversations(
+    q: str = Query(..., min_length=1, description="Search text"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    kind: Optional[List[str]] = Query(None, description="Restrict to user, stage1 and/or stage3")
+):
+    """Full-text search over user questions and council answers."""
+    return {"query": q, "results": search.search(q, limit=limit, offset=offset, kinds=kind)}
+
+
+@app.get("/api/leaderboard")
+async def get_leaderboard(
+    council_type: Optional[str] = Query(None, description="Council tier (default: all tiers)"),
+    days: Optional[int] = Query(None, ge=1, description="Only count the last N days"),
+    min_runs: int = Query(1, ge=1)
+):
+    """Model win rates, average rank and head-to-head results across all conversations."""
+    return leaderboard.get_leaderboard(council_type=council_type, days=days, min_runs=min_runs)
+
+
+@app.get("/api/usage")
+async def get_usage(
+    days: Optional[int] = Query(None, ge=1, description="Only count the last N days"),
+    council_type: Optional[str] = Query(None, description="Council tier (default: all tiers)")
+):
+    """Token and cost totals per council tier and per model and stage."""
+    return costs.get_usage_stats(days=days, council_type=council_type)
+
+
+@app.post("/api/estimate")
+async def estimate_run(request: EstimateRequest):
+    """
+    Pre-flight estimate of a council run's tokens and cost.
+    Applies the budget caps the same way a real run would; 402 if the run can't fit.
+    """
+    spent = 0.0
+    if request.conversation_id and BUDGET_MAX_CONVERSATION_COST > 0:
+        conversation = storage.get_conversation(request.conversation_id)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        spent = costs.conversation_usage(conversation)["total"]["cost"]
+    try:
+        return costs.plan_run(request.content, request.council_type, spent)
+    except costs.BudgetExceededError as e:
+        raise HTTPException(status_code=402, detail=str(e))
+
+
 @app.post("/api/conversations", response_model=Conversation)
 async def create_conversation(request: CreateConversationRequest):
     """Create a new conversation."""
@@ -108,14 +375,62 @@ async def create_conversation(request: CreateConversationRequest):
 
 
 @app.get("/api/conversations/{conversation_id}", response_model=Conversation)
-async def get_conversation(conversation_id: str):
-    """Get a specific conversation with all its messages."""
+async def get_conversation(conversation_id: str, http_request: Request, response: Response):
+    """
+    Get a specific conversation with all its messages. Supports
+    If-None-Match / If-Modified-Since: a 304 is answered without reading
+    the messages.
+    """
+    version = storage.get_conversation_version(conversation_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    cached = not_modified(http_request, response, f'"{conversation_id}.{version[0]}"', version[1])
+    if cached is not None:
+        return cached
     conversation = storage.get_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    # The conversation may have been saved again since its version was read
+    response.headers["ETag"] = f'"{conversation_id}.{conversation.get("version", 0)}"'
     return conversation
 
 
+@app.get("/api/conversations/{conversation_id}/messages")
+async def get_conversation_messages(
+    conversation_id: str,
+    http_request: Request,
+    response: Response,
+    before: Optional[int] = Query(None, ge=0, description="Cursor: return the messages before this index"),
+    limit: int = Query(20, ge=1, le=200)
+):
+    """
+    A page of a conversation's messages, latest first. Pass the returned
+    `next_cursor` as `before` to load older ones (null when there are none).
+    Only the requested messages are read from storage. Supports
+    If-None-Match / If-Modified-Since like the conversation endpoint.
+    """
+    version = storage.get_conversation_version(conversation_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    cached = not_modified(http_request, response, f'"{conversation_id}.{version[0]}"', version[1])
+    if cached is not None:
+        return cached
+    page = storage.get_messages_page(conversation_id, before=before, limit=limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    response.headers["ETag"] = f'"{conversation_id}.{page.get("version", 0)}"'
+    return page
+
+
+@app.get("/api/conversations/{conversation_id}/usage")
+async def get_conversation_usage(conversation_id: str):
+    """Token and cost usage of each council run in a conversation, and the total."""
+    conversation = storage.get_conversation(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return costs.conversation_usage(conversation)
+
+
 @app.delete("/api/conversations/{conversation_id}")
 async def delete_conversation(conversation_id: str):
     """Delete a conversation."""
@@ -125,12 +440,65 @@ async def delete_conversation(conversation_id: str):
     return {"status": "success", "id": conversation_id}
 
 
-@app.post("/api/conversations/{conversation_id}/message")
-async def send_message(conversation_id: str, request: SendMessageRequest):
+def export_format(format: str) -> str:
+    """Validate the requested export format."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown export format, expected one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    return format
+
+
+@app.get("/api/conversations/{conversation_id}/export")
+async def export_conversation(conversation_id: str, format: str = Query("pdf")):
     """
-    Send a message and run the 3-stage council process.
-    Returns the complete response with all stages.
+    Download a conversation as Markdown, JSONL or PDF.
+    Messages are read, rendered and streamed one at a time.
+    """
+    fmt = export_format(format)
+    opened = storage.open_conversation(conversation_id)
+    if opened is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    conversation, messages = opened
+
+    _, media_type = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        iter_export(conversation, messages, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(conversation, fmt)}"'}
+    )
+
+
+@app.get("/api/export")
+async def export_all_conversations(format: str = Query("markdown")):
+    """
+    Download every conversation as a zip archive (one file per conversation).
+    Conversations are loaded and compressed one at a time while streaming.
+    """
+    fmt = export_format(format)
+    return StreamingResponse(
+        iter_export_archive(fmt),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="llm-council-conversations.zip"'}
+    )
+
+
+def open_new_run(conversation_id: str, request: SendMessageRequest):
     """
+    Start a council run for a new message (shared by the message endpoints and the WebSocket).
+
+    Returns:
+        The run's event stream
+
+    Raises:
+        HTTPException: 404 if the conversation doesn't exist, 400 if the
+            request asks for the near-duplicate cache while it is off
+    """
+    if request.cache and NEARDUP_CACHE == "off":
+        # Runs aren't indexed while the cache is off, so there is nothing to serve
+        raise HTTPException(status_code=400, detail="The near-duplicate cache is disabled (NEARDUP_CACHE=off)")
+
     # Check if conversation exists
     conversation = storage.get_conversation(conversation_id)
     if conversation is None:
@@ -139,143 +507,142 @@ async def send_message(conversation_id: str, request: SendMessageRequest):
     # Check if this is the first message
     is_first_message = len(conversation["messages"]) == 0
 
-    # Add user message
-    storage.add_user_message(conversation_id, request.content)
-
-    # If this is the first message, generate a title
-    if is_first_message:
-        title = await generate_conversation_title(request.content)
-        storage.update_conversation_title(conversation_id, title)
-
     # Validate council_type
-    valid_types = [COUNCIL_TYPE_PREMIUM, COUNCIL_TYPE_ECONOMIC, COUNCIL_TYPE_FREE]
+    valid_types = get_registry().council_types()
     if request.council_type not in valid_types:
         request.council_type = COUNCIL_TYPE_PREMIUM  # Fallback to premium if invalid
-    
-    # Run the 3-stage council process
-    print(f"DEBUG: send_message - Received council_type: {request.council_type}")
-    stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
-        request.content,
-        council_type=request.council_type
-    )
 
-    # Add assistant message with all stages (include council_type for display in chat and PDF)
-    storage.add_assistant_message(
+    print(f"DEBUG: Received council_type: {request.council_type}")
+    return stream_new_run(
         conversation_id,
-        stage1_results,
-        stage2_results,
-        stage3_result,
-        council_type=request.council_type
+        request.content,
+        request.council_type,
+        generate_title=is_first_message,
+        speculative=request.use_speculative(),
+        cache=request.cache,
+        deadline_seconds=request.use_deadline()
     )
 
+
+def open_resumed_run(conversation_id: str, run_id: str):
+    """
+    Resume an interrupted council run (shared by the resume endpoint and the WebSocket).
+
+    Returns:
+        The run's event stream
+
+    Raises:
+        HTTPException: 404 if the run doesn't exist, 409 if it is complete
+    """
+    run = storage.get_run(conversation_id, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    _, message = run
+    if message.get("status", storage.RUN_STATUS_COMPLETE) == storage.RUN_STATUS_COMPLETE:
+        raise HTTPException(status_code=409, detail="Run is already complete")
+    return stream_resume_run(conversation_id, run_id, speculative=SPECULATIVE_CHAIRMAN)
+
+
+@app.post("/api/conversations/{conversation_id}/message")
+async def send_message(conversation_id: str, request: SendMessageRequest, http_request: Request):
+    """
+    Send a message and run the 3-stage council process.
+    Returns the complete response with all stages.
+    """
+    check_rate_limit(http_request)
+
+    # Run the 3-stage council process, checkpointing each stage
+    result = {"stage1": [], "stage2": [], "stage3": {}, "metadata": {}}
+    events = open_new_run(conversation_id, request)
+    if profiling_requested(http_request):
+        events = profiling.profiled(events, conversation_id)
+    async for event in events:
+        if event['type'] == 'run_started':
+            result["run_id"] = event['run_id']
+        elif event['type'] == 'stage1_complete':
+            result["stage1"] = event['data']
+        elif event['type'] == 'stage2_complete':
+            result["stage2"] = event['data']
+            result["metadata"] = event['metadata']
+        elif event['type'] == 'stage3_complete':
+            result["stage3"] = event['data']
+        elif event['type'] == 'budget_adjusted':
+            result["budget"] = event['data']
+        elif event['type'] == 'usage':
+            result["usage"] = event['data']
+        elif event['type'] == 'cache_hit':
+            result["cached_from"] = event['data']
+        elif event['type'] == 'profile':
+            result["profile"] = event['data']
+        elif event['type'] == 'error':
+            status_code = 402 if event.get('code') == 'budget_exceeded' else 500
+            raise HTTPException(status_code=status_code, detail=event['message'])
+
     # Return the complete response with metadata
-    return {
-        "stage1": stage1_results,
-        "stage2": stage2_results,
-        "stage3": stage3_result,
-        "metadata": metadata
-    }
+    return result
 
 
 @app.post("/api/conversations/{conversation_id}/message/stream")
-async def send_message_stream(conversation_id: str, request: SendMessageRequest):
+async def send_message_stream(conversation_id: str, request: SendMessageRequest, http_request: Request):
     """
     Send a message and stream the 3-stage council process.
     Returns Server-Sent Events as each stage completes.
+    Each stage is checkpointed, so an interrupted run can be resumed.
     """
-    # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
-    if conversation is None:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    check_rate_limit(http_request)
+    events = open_new_run(conversation_id, request)
+    if profiling_requested(http_request):
+        events = profiling.profiled(events, conversation_id)
+    return sse_response(events, http_request.headers.get("accept-encoding", ""))
 
-    # Validate council_type
-    valid_types = [COUNCIL_TYPE_PREMIUM, COUNCIL_TYPE_ECONOMIC, COUNCIL_TYPE_FREE]
-    if request.council_type not in valid_types:
-        request.council_type = COUNCIL_TYPE_PREMIUM  # Fallback to premium if invalid
 
-    # Check if this is the first message
-    is_first_message = len(conversation["messages"]) == 0
+@app.post("/api/conversations/{conversation_id}/runs/{run_id}/resume")
+async def resume_run(conversation_id: str, run_id: str, http_request: Request):
+    """
+    Resume an interrupted council run from its last completed stage.
+    Stored Stage 1/Stage 2 results are reused; only the missing stages run.
+    Returns Server-Sent Events like the streaming message endpoint.
+    """
+    check_rate_limit(http_request)
+    return sse_response(
+        open_resumed_run(conversation_id, run_id),
+        http_request.headers.get("accept-encoding", "")
+    )
 
-    async def event_generator():
-        try:
-            # Add user message
-            storage.add_user_message(conversation_id, request.content)
-
-            # Start title generation in parallel (don't await yet)
-            title_task = None
-            if is_first_message:
-                title_task = asyncio.create_task(generate_conversation_title(request.content))
-
-            # Get council configuration
-            print(f"DEBUG: Received council_type: {request.council_type}")
-            council_models, chairman_model = get_council_config(request.council_type)
-            print(f"DEBUG: Using council models: {council_models}")
-            print(f"DEBUG: Using chairman model: {chairman_model}")
-
-            # Stage 1: Collect responses (include council_type so frontend has it even when stage2 is skipped)
-            yield f"data: {json.dumps({'type': 'stage1_start'})}\n\n"
-            stage1_results = await stage1_collect_responses(request.content, council_models)
-            print(f"DEBUG: Stage 1 completed with {len(stage1_results)} results")
-            if stage1_results:
-                print(f"DEBUG: Stage 1 first result: {stage1_results[0]}")
-            yield f"data: {json.dumps({'type': 'stage1_complete', 'data': stage1_results, 'council_type': request.council_type})}\n\n"
-
-            # Stage 2: Collect rankings (only if Stage 1 has results)
-            if not stage1_results:
-                print(f"DEBUG: Skipping Stage 2 - Stage 1 has 0 results")
-                stage2_results = []
-                label_to_model = {}
-                aggregate_rankings = []
-            else:
-                yield f"data: {json.dumps({'type': 'stage2_start'})}\n\n"
-                stage2_results, label_to_model = await stage2_collect_rankings(request.content, stage1_results, council_models)
-                aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
-                yield f"data: {json.dumps({'type': 'stage2_complete', 'data': stage2_results, 'metadata': {'label_to_model': label_to_model, 'aggregate_rankings': aggregate_rankings, 'council_type': request.council_type}})}\n\n"
-
-            # Stage 3: Synthesize final answer (only if we have results)
-            if not stage1_results:
-                stage3_result = {
-                    "model": chairman_model,
-                    "response": "Error: No models responded successfully. Please check your API key and model availability, or try a different council type."
-                }
-                yield f"data: {json.dumps({'type': 'stage3_complete', 'data': stage3_result, 'council_type': request.council_type})}\n\n"
-            else:
-                yield f"data: {json.dumps({'type': 'stage3_start'})}\n\n"
-                stage3_result = await stage3_synthesize_final(request.content, stage1_results, stage2_results, chairman_model)
-                yield f"data: {json.dumps({'type': 'stage3_complete', 'data': stage3_result, 'council_type': request.council_type})}\n\n"
-
-            # Wait for title generation if it was started
-            if title_task:
-                title = await title_task
-                storage.update_conversation_title(conversation_id, title)
-                yield f"data: {json.dumps({'type': 'title_complete', 'data': {'title': title}})}\n\n"
-
-            # Save complete assistant message
-            storage.add_assistant_message(
-                conversation_id,
-                stage1_results,
-                stage2_results,
-                stage3_result,
-                council_type=request.council_type
-            )
-
-            # Send completion event
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
-
-        except Exception as e:
-            # Send error event
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
 
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
-    )
+@app.websocket("/api/ws")
+async def runs_websocket(websocket: WebSocket):
+    """
+    Run any number of council runs concurrently over one connection (see
+    backend/ws.py for the protocol). Each "start" or "resume" message is
+    handled like the streaming message and resume endpoints.
+    """
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in allowed_origins:
+        # Browsers don't apply CORS to WebSockets
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    def open_run(message: Dict[str, Any]):
+        check_rate_limit(websocket)
+        conversation_id = message.get("conversation_id")
+        if not isinstance(conversation_id, str):
+            raise HTTPException(status_code=400, detail="Missing conversation_id")
+        if message["type"] == "resume":
+            run_id = message.get("run_id")
+            if not isinstance(run_id, str):
+                raise HTTPException(status_code=400, detail="Missing run_id")
+            return open_resumed_run(conversation_id, run_id)
+        return open_new_run(conversation_id, SendMessageRequest.model_validate(message))
+
+    await ws.serve_runs(websocket, open_run)
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    if WEB_CONCURRENCY > 1:
+        # Multi-worker mode: uvicorn needs an import string to spawn workers
+        uvicorn.run("backend.main:app", host="0.0.0.0", port=8001, workers=WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8001)
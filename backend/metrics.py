@@ -0,0 +1,170 @@
+"""Counters and latency timings, stored in the shared state backend.
+
+incr() and observe() only add to an in-process buffer; run_flush_loop()
+writes it to the shared state backend in one transaction every
+METRICS_FLUSH_INTERVAL seconds, in a thread, so recording a metric never
+waits on the SQLite backend's write lock on the event loop. Reads include
+this process's buffered values.
+"""
+
+import asyncio
+import atexit
+import threading
+from typing import List, Dict, Any, Tuple
+
+from .config import METRICS_FLUSH_INTERVAL
+from .shared import get_shared_state
+
+COUNTER_PREFIX = "metric:"
+TIMING_PREFIX = "timing:"
+
+# Most samples kept per timing (here and in the shared state backend)
+MAX_SAMPLES = 1000
+
+_pending_lock = threading.Lock()
+_pending_counters: Dict[str, float] = {}
+_pending_samples: Dict[str, List[float]] = {}
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    label_text = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_text}}}"
+
+
+def incr(name: str, amount: float = 1, **labels):
+    """
+    Increment a counter.
+
+    Args:
+        name: Metric name (e.g. "model_requests")
+        amount: Amount to add
+        **labels: Label values (e.g. model="openai/gpt-5.1")
+    """
+    key = COUNTER_PREFIX + _key(name, labels)
+    with _pending_lock:
+        _pending_counters[key] = _pending_counters.get(key, 0) + amount
+
+
+def observe(name: str, value: float, **labels):
+    """
+    Record a timing (or any distribution) sample.
+
+    Args:
+        name: Metric name (e.g. "model_latency_seconds")
+        value: Sample value
+        **labels: Label values
+    """
+    key = TIMING_PREFIX + _key(name, labels)
+    with _pending_lock:
+        samples = _pending_samples.setdefault(key, [])
+        samples.append(value)
+        if len(samples) > MAX_SAMPLES:
+            del samples[:len(samples) - MAX_SAMPLES]
+
+
+@atexit.register
+def flush():
+    """Write the buffered counters and samples to the shared state backend."""
+    global _pending_counters, _pending_samples
+    with _pending_lock:
+        counters, samples = _pending_counters, _pending_samples
+        _pending_counters, _pending_samples = {}, {}
+    if not counters and not samples:
+        return
+    state = get_shared_state()
+    try:
+        if counters:
+            state.incr_many(counters)
+    except Exception as e:
+        # Metrics must never break a council run; keep the counts for the next flush
+        print(f"Error recording metrics: {e}")
+        with _pending_lock:
+            for key, amount in counters.items():
+                _pending_counters[key] = _pending_counters.get(key, 0) + amount
+    try:
+        if samples:
+            state.add_samples(
+                [(key, value) for key, values in samples.items() for value in values], MAX_SAMPLES
+            )
+    except Exception as e:
+        print(f"Error recording metrics: {e}")
+
+
+async def run_flush_loop():
+    """Flush the buffered metrics every METRICS_FLUSH_INTERVAL seconds, in a thread."""
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+        await asyncio.to_thread(flush)
+
+
+def _pending_items(prefix: str) -> Tuple[Dict[str, float], Dict[str, List[float]]]:
+    """This process's buffered counters and samples whose keys start with prefix."""
+    with _pending_lock:
+        return (
+            {key: amount for key, amount in _pending_counters.items() if key.startswith(prefix)},
+            {key: list(values) for key, values in _pending_samples.items() if key.startswith(prefix)},
+        )
+
+
+def get_counters(name: str) -> List[Tuple[Dict[str, str], float]]:
+    """
+    Get every labelled value of one counter across workers.
+
+    Args:
+        name: Metric name (e.g. "model_requests")
+
+    Returns:
+        List of (labels, value) pairs
+    """
+    values = []
+    items = get_shared_state().items(COUNTER_PREFIX + name)
+    for key, amount in _pending_items(COUNTER_PREFIX + name)[0].items():
+        items[key] = items.get(key, 0) + amount
+    for key, value in items.items():
+        rest = key[len(COUNTER_PREFIX + name):]
+        if rest and not rest.startswith("{"):
+            continue  # A different metric sharing the prefix
+        labels = dict(pair.split("=", 1) for pair in rest.strip("{}").split(",") if "=" in pair)
+        values.append((labels, value))
+    return values
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def get_metrics() -> Dict[str, Any]:
+    """
+    Get all counters and timing summaries across workers.
+
+    Returns:
+        Dict with 'counters' (name -> value) and 'timings'
+        (name -> count/mean/p50/p95/max over recent samples)
+    """
+    state = get_shared_state()
+    items = state.items(COUNTER_PREFIX)
+    for key, amount in _pending_items(COUNTER_PREFIX)[0].items():
+        items[key] = items.get(key, 0) + amount
+    counters = {key[len(COUNTER_PREFIX):]: value for key, value in sorted(items.items())}
+
+    samples = state.samples(TIMING_PREFIX)
+    for key, values in _pending_items(TIMING_PREFIX)[1].items():
+        samples[key] = (samples.get(key, []) + values)[-MAX_SAMPLES:]
+
+    timings = {}
+    for key, values in sorted(samples.items()):
+        if not values:
+            continue
+        ordered = sorted(values)
+        timings[key[len(TIMING_PREFIX):]] = {
+            "count": len(ordered),
+            "mean": round(sum(ordered) / len(ordered), 3),
+            "p50": round(_percentile(ordered, 0.5), 3),
+            "p95": round(_percentile(ordered, 0.95), 3),
+            "max": round(ordered[-1], 3),
+        }
+
+    return {"counters": counters, "timings": timings}
@@ -0,0 +1,144 @@
+"""Offline mock of the OpenRouter chat completions API.
+
+Lets the whole council run locally without an API key or network, with
+simulated latency, for development and for timing experiments:
+
+    uv run python -m backend.mock_server
+    OPENROUTER_API_URL=http://localhost:8002/api/v1/chat/completions uv run python -m backend.main
+
+It also answers on /v1/chat/completions, so it can stand in for a
+self-hosted OpenAI-compatible provider (base_url http://localhost:8002/v1).
+
+Answers are canned, but Stage 2 prompts get a well-formed FINAL RANKING
+(or JSON ranking in compact mode) and speculative chairman prompts get a
+PREFERRED RESPONSE line, so every code path of the council can be
+exercised. With MOCK_TOKENS_PER_SECOND set, latency also grows with the
+number of generated tokens, including simulated reasoning tokens whose
+amount follows the request's reasoning effort, and max_tokens is enforced.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from typing import List
+
+from fastapi import FastAPI, Request
+
+# Base simulated latency per request in seconds, and relative jitter
+MOCK_LATENCY = float(os.getenv("MOCK_LATENCY", "1.0"))
+MOCK_LATENCY_JITTER = float(os.getenv("MOCK_LATENCY_JITTER", "0.25"))
+# Probability that a judge's ranking deviates from the consensus order
+MOCK_DISAGREEMENT = float(os.getenv("MOCK_DISAGREEMENT", "0.2"))
+# Probability that a text ranking is malformed (a label missing from FINAL RANKING)
+MOCK_MALFORMED_BALLOTS = float(os.getenv("MOCK_MALFORMED_BALLOTS", "0"))
+# Simulated generation speed (0 = latency doesn't depend on output length)
+MOCK_TOKENS_PER_SECOND = float(os.getenv("MOCK_TOKENS_PER_SECOND", "0"))
+# Median hidden reasoning tokens per call, by requested reasoning effort
+MOCK_REASONING_TOKENS = {"none": 0, "low": 200, "medium": 1500, "high": 5000}
+
+app = FastAPI(title="LLM Council mock OpenRouter")
+
+
+def _consensus_order(labels: List[str], seed: str) -> List[str]:
+    """Deterministic 'true' quality order of the labels for a given prompt."""
+    return sorted(labels, key=lambda label: hashlib.sha1(f"{seed}:{label}".encode()).hexdigest())
+
+
+def _mock_reply(model: str, prompt: str, structured: bool = False) -> str:
+    labels = list(dict.fromkeys(re.findall(r'^(Response [A-Z]+):', prompt, flags=re.MULTILINE)))
+    question = re.search(r'Question: (.*)', prompt)
+    seed = question.group(1) if question else prompt[:200]
+
+    if "could not be read" in prompt:
+        # Stage 2 re-ask: the labels are listed in the first line
+        labels = list(dict.fromkeys(re.findall(r'Response [A-Z]+', prompt.split("\n", 1)[0])))
+        order = _consensus_order(labels, seed)
+        if structured:
+            return json.dumps({"final_ranking": order})
+        return "FINAL RANKING:\n" + "\n".join(f"{i}. {label}" for i, label in enumerate(order, start=1))
+
+    if '"final_ranking"' in prompt and labels:
+        order = _consensus_order(labels, seed)
+        if '"critiques"' in prompt:
+            return json.dumps({
+                "final_ranking": order,
+                "critiques": {label: "Reasonable but could be more specific." for label in labels},
+            })
+        return json.dumps({
+            "evaluation": "\n".join(f"{label} is reasonable but could be more specific." for label in labels),
+            "final_ranking": order,
+        })
+
+    if "FINAL RANKING:" in prompt and labels:
+        order = _consensus_order(labels, seed)
+        if len(order) > 1 and random.random() < MOCK_DISAGREEMENT:
+            i = random.randrange(len(order) - 1)
+            order[i], order[i + 1] = order[i + 1], order[i]
+        critique = "\n".join(f"{label} is reasonable but could be more specific." for label in labels)
+        if random.random() < MOCK_MALFORMED_BALLOTS:
+            order = order[:-1]
+        ranking = "\n".join(f"{i}. {label}" for i, label in enumerate(order, start=1))
+        return f"{critique}\n\nFINAL RANKING:\n{ranking}"
+
+    if "PREFERRED RESPONSE:" in prompt and labels:
+        preferred = _consensus_order(labels, seed)[0]
+        return f"Mock synthesis by {model} of {len(labels)} responses.\n\nPREFERRED RESPONSE: {preferred}"
+
+    if "Title:" in prompt:
+        return "Mock Conversation Title"
+
+    return f"Mock answer from {model}. " + "Lorem ipsum dolor sit amet. " * 20
+
+
+@app.post("/api/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI-compatible chat completions endpoint."""
+    body = await request.json()
+    model = body.get("model", "mock")
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+
+    latency = MOCK_LATENCY * (1 + random.uniform(-MOCK_LATENCY_JITTER, MOCK_LATENCY_JITTER))
+
+    content = _mock_reply(model, prompt, structured="response_format" in body)
+    finish_reason = "stop"
+    completion_tokens = len(content) // 4
+    if MOCK_TOKENS_PER_SECOND > 0:
+        # Reasoning tokens are long-tailed and count against max_tokens
+        effort = (body.get("reasoning") or {}).get("effort", "medium")
+        reasoning_tokens = int(MOCK_REASONING_TOKENS.get(effort, 1500) * random.lognormvariate(0, 0.8))
+        reasoning_tokens = min(reasoning_tokens, (body.get("reasoning") or {}).get("max_tokens") or reasoning_tokens)
+        completion_tokens += reasoning_tokens
+        max_tokens = body.get("max_tokens")
+        if max_tokens and completion_tokens > max_tokens:
+            content = content[:max(0, max_tokens - reasoning_tokens) * 4]
+            completion_tokens = max_tokens
+            finish_reason = "length"
+        latency += completion_tokens / MOCK_TOKENS_PER_SECOND
+    await asyncio.sleep(max(0.0, latency))
+
+    return {
+        "id": "mock",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": completion_tokens,
+            "total_tokens": len(prompt) // 4 + completion_tokens,
+        },
+    }
+
+
+@app.get("/api/v1/models")
+@app.get("/v1/models")
+async def list_models():
+    """OpenAI-compatible models list (any model name is answered)."""
+    return {"object": "list", "data": [{"id": "mock", "object": "model"}]}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("MOCK_PORT", "8002")))
@@ -0,0 +1,403 @@
+"""Near-duplicate question cache (MinHash LSH over normalized shingles).
+
+Completed council runs are indexed by their user question, so a later
+question that only differs by trivial rewording ("how do I X?" vs "how
+can I X") can be answered from the stored run instead of running the
+council again. Everything is computed locally; no embedding service.
+
+Questions are normalized (case, punctuation, filler words) and cut into
+character shingles. Each question gets a MinHash signature of NUM_PERM
+values, split into BANDS bands: two questions become candidates when any
+band matches exactly, and a candidate is a hit when the share of equal
+signature values (an estimate of the shingles' Jaccard similarity)
+reaches NEARDUP_THRESHOLD and both questions have the same key tokens:
+numbers ("World War 1" / "2"), symbol tokens ("C" / "C++" / "C#") and
+negations ("safe" / "not safe"), which change the question while barely
+changing its shingles. Band keys are indexed in SQLite, so a lookup
+is BANDS index probes plus a comparison with the few candidates found.
+
+The index is updated by the storage layer as runs complete. To (re)build
+it from existing conversations, or benchmark lookups:
+
+    uv run python -m backend.neardup --rebuild
+    uv run python -m backend.neardup --benchmark 100000
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .config import NEARDUP_CACHE, NEARDUP_INDEX_PATH, NEARDUP_THRESHOLD, NEARDUP_MAX_AGE_DAYS
+from . import metrics
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# Words that rewordings of the same question typically swap or drop
+FILLER_WORDS = frozenset(
+    "a an the do does did can could would should will shall may might i you "
+    "please is are was be to of".split()
+)
+
+# Words that invert a question's meaning; must match exactly for a hit
+NEGATIONS = frozenset("not no never without nor neither cannot".split())
+
+# Word tokens, keeping trailing symbols that name something ("c++", "c#", "f#")
+TOKEN_RE = re.compile(r"\w+[+#]*")
+
+# Universal hashing h(x) = (a * x + b) mod p over 32-bit shingle hashes;
+# a * x + b stays below 2**64, so the arithmetic fits in uint64
+_PRIME = np.uint64(4294967311)
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+
+_local = threading.local()
+
+
+def _conn(path: Optional[str] = None) -> sqlite3.Connection:
+    if path is not None:
+        return _open(path)
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _open(NEARDUP_INDEX_PATH)
+    return conn
+
+
+def _open(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        "id INTEGER PRIMARY KEY, conversation_id TEXT NOT NULL, message_index INTEGER NOT NULL, "
+        "council_type TEXT NOT NULL, question TEXT NOT NULL, signature BLOB NOT NULL, "
+        "created_at REAL NOT NULL, UNIQUE (conversation_id, message_index))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS bands ("
+        "key INTEGER NOT NULL, entry_id INTEGER NOT NULL, PRIMARY KEY (key, entry_id)) WITHOUT ROWID"
+    )
+    return conn
+
+
+def _tokens(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    # "isn't" -> "is not", so the negation survives as a word
+    text = re.sub(r"n['’]t\b", " not", text)
+    return TOKEN_RE.findall(text)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation (but not "++" / "#" suffixes), and drop filler words."""
+    return " ".join(w for w in _tokens(text) if w not in FILLER_WORDS)
+
+
+def key_tokens(text: str) -> frozenset:
+    """Numbers, symbol tokens and negations of a question: near-duplicates must share them exactly."""
+    return frozenset(
+        w for w in _tokens(text)
+        if w in NEGATIONS or any(c.isdigit() for c in w) or w[-1] in "+#"
+    )
+
+
+def shingles(text: str) -> List[str]:
+    """Character shingles of the normalized text (the text itself if shorter)."""
+    if len(text) <= SHINGLE_SIZE:
+        return [text] if text else []
+    return [text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)]
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of a question."""
+    grams = shingles(normalize(text))
+    if not grams:
+        return np.zeros(NUM_PERM, dtype=np.uint32)
+    hashes = np.fromiter((zlib.crc32(g.encode()) for g in set(grams)), dtype=np.uint64)
+    values = (hashes[:, None] * _A[None, :] + _B[None, :]) % _PRIME
+    return values.min(axis=0).astype(np.uint32)
+
+
+def band_keys(sig: np.ndarray) -> List[int]:
+    """One signed 64-bit key per band (band number and its rows)."""
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8, salt=band.to_bytes(2, "little")
+        ).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def _delete_bands(conn: sqlite3.Connection, entries: List[Tuple[int, bytes]]):
+    """Remove entries' band keys (found from their stored signatures, using the primary key)."""
+    conn.executemany(
+        "DELETE FROM bands WHERE key = ? AND entry_id = ?",
+        [
+            (key, entry_id)
+            for entry_id, blob in entries
+            for key in band_keys(np.frombuffer(blob, dtype=np.uint32))
+        ]
+    )
+
+
+def _insert(
+    conn: sqlite3.Connection,
+    conversation_id: str,
+    message_index: int,
+    council_type: str,
+    question: str,
+    created_at: Optional[float] = None
+):
+    existing = conn.execute(
+        "SELECT id, signature FROM entries WHERE conversation_id = ? AND message_index = ?",
+        (conversation_id, message_index)
+    ).fetchone()
+    if existing is not None:
+        _delete_bands(conn, [existing])
+    sig = signature(question)
+    row = conn.execute(
+        "INSERT INTO entries (conversation_id, message_index, council_type, question, signature, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(conversation_id, message_index) DO UPDATE SET "
+        "council_type = excluded.council_type, question = excluded.question, "
+        "signature = excluded.signature, created_at = excluded.created_at "
+        "RETURNING id",
+        (conversation_id, message_index, council_type, question, sig.tobytes(), created_at or time.time())
+    ).fetchone()
+    conn.executemany(
+        "INSERT OR IGNORE INTO bands (key, entry_id) VALUES (?, ?)",
+        [(key, row[0]) for key in band_keys(sig)]
+    )
+
+
+def cacheable(message: Dict[str, Any]) -> bool:
+    """Whether a completed run's answer can be reused for similar questions."""
+    stage3 = message.get("stage3") or {}
+    response = stage3.get("response") or ""
+    if not response or response.startswith("Error:") or not message.get("stage1"):
+        return False
+    # Answers that are themselves copies are already indexed under their source
+    return not message.get("cached_from") and not message.get("coalesced_from")
+
+
+def index_run(
+    conversation_id: str,
+    message_index: int,
+    question: str,
+    message: Dict[str, Any],
+    council_type: str
+):
+    """
+    Add a completed run to the index under its user question.
+
+    Args:
+        conversation_id: Conversation identifier
+        message_index: Position of the assistant message in the conversation
+        question: The user message the run answered
+        message: Assistant message with stage results
+        council_type: Council tier of the run (hits are only served within a tier)
+    """
+    if NEARDUP_CACHE == "off" or not cacheable(message):
+        return
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _insert(conn, conversation_id, message_index, council_type, question)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def remove_conversation(conversation_id: str):
+    """Drop a conversation's runs from the index."""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _delete_bands(conn, conn.execute(
+            "SELECT id, signature FROM entries WHERE conversation_id = ?", (conversation_id,)
+        ).fetchall())
+        conn.execute("DELETE FROM entries WHERE conversation_id = ?", (conversation_id,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _lookup(
+    conn: sqlite3.Connection,
+    question: str,
+    council_type: Optional[str],
+    threshold: float,
+    max_age_days: float
+) -> Optional[Dict[str, Any]]:
+    sig = signature(question)
+    keys = band_keys(sig)
+    sql = (
+        "SELECT DISTINCT e.id, e.conversation_id, e.message_index, e.question, e.signature, e.created_at "
+        f"FROM bands b JOIN entries e ON e.id = b.entry_id WHERE b.key IN ({','.join('?' * len(keys))})"
+    )
+    params: List[Any] = list(keys)
+    if council_type:
+        sql += " AND e.council_type = ?"
+        params.append(council_type)
+    if max_age_days > 0:
+        sql += " AND e.created_at >= ?"
+        params.append(time.time() - max_age_days * 86400)
+    rows = conn.execute(sql, params).fetchall()
+    if not rows:
+        return None
+
+    candidates = np.frombuffer(b"".join(row[4] for row in rows), dtype=np.uint32).reshape(len(rows), NUM_PERM)
+    similarity = (candidates == sig).mean(axis=1)
+    keys_wanted = key_tokens(question)
+    matches = [
+        i for i in range(len(rows))
+        if similarity[i] >= threshold and key_tokens(rows[i][3]) == keys_wanted
+    ]
+    if not matches:
+        return None
+    # Most similar first, then most recent
+    best = max(matches, key=lambda i: (similarity[i], rows[i][5]))
+    _, conversation_id, message_index, cached_question, _, created_at = rows[best]
+    return {
+        "conversation_id": conversation_id,
+        "message_index": int(message_index),
+        "question": cached_question,
+        "similarity": round(float(similarity[best]), 3),
+        "created_at": created_at,
+    }
+
+
+def find_similar(
+    question: str,
+    council_type: Optional[str] = None,
+    threshold: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Find an earlier run whose question is a near-duplicate of this one.
+
+    Args:
+        question: The new user question
+        council_type: Only consider runs of this council tier
+        threshold: Minimum estimated similarity (0-1). If None, uses NEARDUP_THRESHOLD.
+
+    Returns:
+        Dict with conversation_id, message_index (of the assistant
+        message), question, similarity and created_at, or None
+    """
+    start = time.perf_counter()
+    hit = _lookup(
+        _conn(), question, council_type,
+        NEARDUP_THRESHOLD if threshold is None else threshold, NEARDUP_MAX_AGE_DAYS
+    )
+    metrics.observe("neardup_lookup_seconds", time.perf_counter() - start)
+    metrics.incr("neardup_lookups", outcome="hit" if hit else "miss")
+    return hit
+
+
+def rebuild_index() -> int:
+    """
+    Rebuild the index from the stored conversations.
+
+    Returns:
+        Number of runs indexed
+    """
+    from . import storage
+    from .config import COUNCIL_TYPE_PREMIUM
+
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM bands")
+        conn.execute("DELETE FROM entries")
+        count = 0
+        for conversation in storage.iter_conversations():
+            messages = conversation["messages"]
+            for index, message in enumerate(messages):
+                if message.get("role") != "assistant" or index == 0:
+                    continue
+                if message.get("status", storage.RUN_STATUS_COMPLETE) != storage.RUN_STATUS_COMPLETE:
+                    continue
+                if not cacheable(message):
+                    continue
+                council_type = message.get("council_type") or conversation.get("council_type") or COUNCIL_TYPE_PREMIUM
+                _insert(conn, conversation["id"], index, council_type, messages[index - 1]["content"])
+                count += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return count
+
+
+def benchmark(entries: int = 100000, lookups: int = 500, seed: int = 0):
+    """Index synthetic questions into a scratch database and time lookups."""
+    import random
+    import tempfile
+
+    rng = random.Random(seed)
+    vocabulary = [f"{rng.choice('bcdfghklmnprstvz')}{rng.choice('aeiou')}{rng.choice('bcdfghklmnprstvz')}{i}" for i in range(5000)]
+    starts = ["how do i", "how can i", "what is the best way to", "why does", "explain how to"]
+
+    def question() -> str:
+        return f"{rng.choice(starts)} {' '.join(rng.choice(vocabulary) for _ in range(rng.randint(4, 10)))}?"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _conn(os.path.join(tmp, "neardup.db"))
+        questions = [question() for _ in range(entries)]
+        start = time.perf_counter()
+        conn.execute("BEGIN")
+        for i, text in enumerate(questions):
+            _insert(conn, f"c{i}", 1, "premium", text)
+        conn.execute("COMMIT")
+        elapsed = time.perf_counter() - start
+        print(f"Indexed {entries} questions in {elapsed:.1f}s ({elapsed / entries * 1e6:.0f} us each)")
+
+        for label, make in (
+            ("near-duplicate", lambda: rng.choice(questions).replace("how do i", "how can i").rstrip("?")),
+            ("unrelated", question),
+        ):
+            timings, hits = [], 0
+            for _ in range(lookups):
+                text = make()
+                start = time.perf_counter()
+                hits += _lookup(conn, text, "premium", NEARDUP_THRESHOLD, 0) is not None
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(
+                f"  {label:<15} lookups: p50 {timings[len(timings) // 2] * 1000:.2f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms, hit rate {hits / lookups:.0%}"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Manage the near-duplicate question index")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index from stored conversations")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Benchmark lookups over N synthetic entries")
+    parser.add_argument("query", nargs="*", help="Question to look up")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"Indexed {rebuild_index()} runs into {NEARDUP_INDEX_PATH}")
+    if args.benchmark:
+        benchmark(args.benchmark)
+    if args.query:
+        print(json.dumps(find_similar(" ".join(args.query)), indent=2, ensure_ascii=False))
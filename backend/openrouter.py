@@ -1,9 +1,15 @@
-"""OpenRouter API client for making LLM requests."""
+"""Client for making LLM requests through OpenRouter or other providers (see providers.py)."""
 
+import asyncio
 import httpx
 import re
-from typing import List, Dict, Any, Optional
-from .config import OPENROUTER_API_KEY, OPENROUTER_API_URL, MODEL_FALLBACK_MAP
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from .config import COALESCE_MODEL_CALLS
+from .registry import get_model_spec, generation_params, ModelSpec, ProviderSpec, PROVIDER_KIND_OPENROUTER
+from .health import CircuitBreaker, get_breaker
+from .singleflight import SingleFlight, flight_key
+from . import metrics, costs, providers
 
 
 def extract_final_content(response_text: str) -> str:
@@ -54,50 +60,211 @@ def get_fallback_model(model_id: str) -> Optional[str]:
     Returns:
         Fallback model identifier or None if no fallback available
     """
-    return MODEL_FALLBACK_MAP.get(model_id)
+    fallbacks = get_model_spec(model_id).fallbacks
+    return fallbacks[0] if fallbacks else None
+
+
+# Identical concurrent model calls share one request
+_model_calls = SingleFlight("query_model")
+
+# Per-model concurrency limits: model id -> (limit, semaphore)
+_model_semaphores: Dict[str, Tuple[int, asyncio.Semaphore]] = {}
+
+
+def get_model_semaphore(spec: ModelSpec) -> asyncio.Semaphore:
+    """
+    Get the semaphore bounding concurrent requests to a model.
+
+    If a registry reload changed the model's max_concurrency, a new semaphore
+    is created; requests holding the old one still release it normally.
+    """
+    entry = _model_semaphores.get(spec.id)
+    if entry is None or entry[0] != spec.max_concurrency:
+        entry = (spec.max_concurrency, asyncio.Semaphore(spec.max_concurrency))
+        _model_semaphores[spec.id] = entry
+    return entry[1]
+
+
+async def _query_fallbacks(
+    spec: ModelSpec,
+    messages: List[Dict[str, str]],
+    extract_final_content_flag: bool,
+    stage: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """Try each fallback in the model's chain until one succeeds."""
+    for fallback_model in spec.fallbacks:
+        print(f"Attempting fallback to {fallback_model}")
+        result = await query_model(
+            fallback_model,
+            messages,
+            extract_final_content_flag=extract_final_content_flag,
+            use_fallback=False,  # Don't recurse on fallback
+            stage=stage,
+            params=params
+        )
+        if result is not None:
+            return result
+    return None
 
 
 async def query_model(
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float = 120.0,
+    timeout: Optional[float] = None,
     extract_final_content_flag: bool = False,
-    use_fallback: bool = True
+    use_fallback: bool = True,
+    stage: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Query a single model via OpenRouter API with fallback support.
 
+    The request goes to the model's fastest configured provider (see
+    providers.py); if it fails, the model's other providers are tried, then
+    its fallback chain. Providers whose circuit breaker for the model is
+    open are skipped without sending anything.
+
+    Identical concurrent calls (same model, messages and settings) share
+    one request when COALESCE_MODEL_CALLS is on; the callers that joined
+    get a copy with 'coalesced' set and no 'usage', since they didn't pay.
+
     Args:
         model: OpenRouter model identifier (e.g., "openai/gpt-4o" or "model:free")
         messages: List of message dicts with 'role' and 'content'
-        timeout: Request timeout in seconds
+        timeout: Request timeout in seconds. If None, uses the model's registry timeout,
+            capped by the timeout of the provider serving it.
         extract_final_content_flag: If True, extract only final content (remove reasoning tokens)
-        use_fallback: If True, try fallback model if free model fails
+        use_fallback: If True, walk the model's fallback chain if it fails
+        stage: Council stage the call belongs to; selects the stage's generation
+            parameters, and its usage is added to the per-model, per-stage statistics
+        params: Generation parameters for this call (max_tokens, temperature,
+            reasoning...); they take precedence over per-model registry settings
+        deadline: time.monotonic() by which the call (fallbacks included) must
+            finish; it is abandoned then, or not sent if the deadline has passed
 
     Returns:
-        Response dict with 'content', 'original_content', and optional 'reasoning_details', or None if failed
+        Response dict with 'content', 'original_content', optional 'reasoning_details',
+        'finish_reason', 'usage' (model, tokens, cost of the model that answered)
+        and 'provider' (the backend that answered), or None if failed
     """
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    def send():
+        return _query_model(model, messages, timeout, extract_final_content_flag, use_fallback, stage, params)
+
+    async def call():
+        if not COALESCE_MODEL_CALLS:
+            return await send()
+        key = flight_key(model, messages, timeout, extract_final_content_flag, use_fallback, stage, params)
+        result, shared = await _model_calls.call(key, send)
+        if shared and result is not None:
+            result = dict(result, usage=None, coalesced=True)
+        return result
+
+    if deadline is None:
+        return await call()
+    left = deadline - time.monotonic()
+    if left <= 0:
+        print(f"Skipping {model}: deadline passed")
+        metrics.incr("model_requests", model=model, outcome="deadline")
+        return None
+    try:
+        return await asyncio.wait_for(call(), left)
+    except asyncio.TimeoutError:
+        print(f"Error querying model {model}: deadline reached after {left:.1f}s")
+        metrics.incr("model_requests", model=model, outcome="deadline")
+        return None
+
+
+async def _query_model(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: Optional[float] = None,
+    extract_final_content_flag: bool = False,
+    use_fallback: bool = True,
+    stage: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """Send one request (see query_model()), without coalescing."""
+    spec = get_model_spec(model)
+    attempted = False
+    for provider, provider_model in providers.rank_routes(spec):
+        breaker = get_breaker(model, provider.name)
+        if not breaker.allow_request():
+            print(f"Skipping {model} on {provider.name}: circuit breaker is {breaker.state}")
+            continue
+        attempted = True
+        result = await _query_route(
+            spec, provider, provider_model, breaker, messages, timeout, extract_final_content_flag, stage, params
+        )
+        if result is not None:
+            return result
+
+    if not attempted:
+        metrics.incr("model_requests", model=model, outcome="skipped")
+    # Try the fallback chain if enabled (e.g. free model -> paid version)
+    if use_fallback:
+        return await _query_fallbacks(spec, messages, extract_final_content_flag, stage, params)
+    return None
+
+
+async def query_route(
+    model: str,
+    provider_name: str,
+    messages: List[Dict[str, str]],
+    timeout: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Query a model on one particular provider, without coalescing, other
+    routes or fallbacks (used to probe a route whose breaker is open).
+
+    Returns:
+        Response dict as for query_model(), or None if the call failed, the
+        route's breaker refused it, or the route is no longer configured
+    """
+    spec = get_model_spec(model)
+    for provider, provider_model in providers.get_routes(spec):
+        if provider.name == provider_name:
+            breaker = get_breaker(model, provider.name)
+            if not breaker.allow_request():
+                return None
+            return await _query_route(spec, provider, provider_model, breaker, messages, timeout)
+    return None
+
+
+async def _query_route(
+    spec: ModelSpec,
+    provider: ProviderSpec,
+    provider_model: str,
+    breaker: CircuitBreaker,
+    messages: List[Dict[str, str]],
+    timeout: Optional[float] = None,
+    extract_final_content_flag: bool = False,
+    stage: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """Send a request to one route, recording the outcome on its breaker; None if it failed."""
+    model = spec.id
+    if timeout is None:
+        # A provider's timeout caps its models' own timeouts
+        timeout = min(provider.timeout, spec.timeout) if provider.timeout else spec.timeout
 
     payload = {
-        "model": model,
+        "model": provider_model,
         "messages": messages,
+        **generation_params(model, stage, params),
     }
+    if provider.kind == PROVIDER_KIND_OPENROUTER:
+        # Ask OpenRouter to report token counts and cost in the response
+        payload["usage"] = {"include": True}
 
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                OPENROUTER_API_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            message = data['choices'][0]['message']
+        async with get_model_semaphore(spec):
+            start = time.monotonic()
+            data = await providers.chat_completion(provider, payload, timeout)
+            choice = data['choices'][0]
+            message = choice['message']
+            finish_reason = choice.get('finish_reason')
 
             original_content = message.get('content', '')
             reasoning_details = message.get('reasoning_details')
@@ -110,11 +277,40 @@ async def query_model(
             else:
                 final_content = original_content
 
+            # Self-hosted providers report tokens but cost nothing
+            reported = data.get('usage') if provider.billed else dict(data.get('usage') or {}, cost=0.0)
+            usage = costs.call_usage(
+                model,
+                reported,
+                prompt_text="".join(m.get('content') or '' for m in messages),
+                completion_text=original_content or ''
+            )
             result = {
                 'content': final_content if final_content else original_content,
                 'original_content': original_content,
-                'reasoning_details': reasoning_details
+                'reasoning_details': reasoning_details,
+                'finish_reason': finish_reason,
+                'usage': usage,
+                'provider': provider.name
             }
+            latency = time.monotonic() - start
+            breaker.record_success(latency)
+            providers.record_latency(provider, provider_model, latency)
+            metrics.incr("model_requests", model=model, outcome="ok")
+            metrics.observe("model_latency_seconds", latency, model=model)
+            metrics.incr("model_tokens", usage["prompt_tokens"], model=model, kind="prompt")
+            metrics.incr("model_tokens", usage["completion_tokens"], model=model, kind="completion")
+            metrics.incr("model_cost_usd", usage["cost"], model=model)
+            if finish_reason == "length":
+                # Hit max_tokens: the answer may be cut short
+                print(f"DEBUG: {model} stopped at max_tokens ({payload.get('max_tokens')}) in {stage}")
+                metrics.incr("model_truncated", model=model, stage=stage or "none")
+            if stage:
+                try:
+                    # A SQLite write: kept off the event loop
+                    await asyncio.to_thread(costs.record_call, stage, usage)
+                except Exception as e:
+                    print(f"Error recording usage for {model}: {e}")
             
             # Debug log
             content_length = len(original_content) if original_content else 0
@@ -127,72 +323,72 @@ async def query_model(
             
             return result
 
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+    except httpx.TimeoutException as e:
+        error_msg = f"Timeout after {timeout}s: {type(e).__name__}"
+        print(f"Error querying model {model} on {provider.name}: {error_msg}")
+        breaker.record_failure(error_msg, timed_out=True)
+        providers.record_latency(provider, provider_model, timeout)
+        metrics.incr("model_requests", model=model, outcome="timeout")
     except httpx.HTTPStatusError as e:
         error_msg = f"HTTP {e.response.status_code}: {e.response.text[:200] if e.response.text else 'No response body'}"
-        print(f"Error querying model {model}: {error_msg}")
-        
-        # Try fallback if enabled and model is a free model
-        if use_fallback:
-            fallback_model = get_fallback_model(model)
-            if fallback_model:
-                print(f"Attempting fallback to {fallback_model}")
-                return await query_model(
-                    fallback_model,
-                    messages,
-                    timeout,
-                    extract_final_content_flag,
-                    use_fallback=False  # Don't recurse on fallback
-                )
-        
-        return None
+        print(f"Error querying model {model} on {provider.name}: {error_msg}")
+        # 400/413 are about this particular request (e.g. prompt too long),
+        # not the health of the model, so they don't count against the breaker
+        if e.response.status_code in (400, 413):
+            breaker.abandon()
+        else:
+            breaker.record_failure(error_msg)
+            providers.record_latency(provider, provider_model, timeout)
+        metrics.incr("model_requests", model=model, outcome="error")
     except Exception as e:
         error_msg = str(e)
-        print(f"Error querying model {model}: {error_msg}")
-        
-        # Try fallback if enabled and model is a free model
-        if use_fallback:
-            fallback_model = get_fallback_model(model)
-            if fallback_model:
-                print(f"Attempting fallback to {fallback_model}")
-                return await query_model(
-                    fallback_model,
-                    messages,
-                    timeout,
-                    extract_final_content_flag,
-                    use_fallback=False  # Don't recurse on fallback
-                )
-        
-        return None
+        print(f"Error querying model {model} on {provider.name}: {error_msg}")
+        breaker.record_failure(error_msg)
+        providers.record_latency(provider, provider_model, timeout)
+        metrics.incr("model_requests", model=model, outcome="error")
+    return None
 
 
 async def query_models_parallel(
     models: List[str],
     messages: List[Dict[str, str]],
     extract_final_content_flag: bool = False,
-    use_fallback: bool = True
+    use_fallback: bool = True,
+    stage: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None
 ) -> Dict[str, Optional[Dict[str, Any]]]:
     """
     Query multiple models in parallel.
 
+    Each model uses its own registry timeout (capped by its provider's) and
+    concurrency limit.
+
     Args:
         models: List of OpenRouter model identifiers
         messages: List of message dicts to send to each model
         extract_final_content_flag: If True, extract only final content (remove reasoning tokens)
         use_fallback: If True, try fallback model if free model fails
+        stage: Council stage the calls belong to (generation parameters, usage statistics)
+        params: Generation parameters for these calls, taking precedence over per-model registry settings
+        deadline: time.monotonic() by which every call must finish (see query_model())
 
     Returns:
         Dict mapping model identifier to response dict (or None if failed)
     """
-    import asyncio
-
     # Create tasks for all models
     tasks = [
         query_model(
             model,
             messages,
-            timeout=120.0,
             extract_final_content_flag=extract_final_content_flag,
-            use_fallback=use_fallback
+            use_fallback=use_fallback,
+            stage=stage,
+            params=params,
+            deadline=deadline
         )
         for model in models
     ]
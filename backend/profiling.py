@@ -0,0 +1,263 @@
+"""On-demand profiling of individual council runs.
+
+A message request carrying the profiling token (`X-Profile-Run` header or
+`profile` query parameter, see PROFILING_TOKEN) is run under a sampling
+profiler: a background thread reads the event-loop thread's Python stack
+every PROFILING_INTERVAL_MS and keeps the samples taken while one of the
+run's tasks was running (the run's tasks are tracked through a context
+variable and the loop's task factory, so concurrent runs don't mix). A
+watcher coroutine measures event-loop lag alongside.
+
+Profiles are written to PROFILES_DIR keyed by run ID: `<run_id>.folded`
+holds the stacks in the folded format read by flamegraph.pl, inferno and
+speedscope, `<run_id>.json` the summary (sample counts, loop lag, top
+functions). When no run is being profiled nothing is installed, so the
+only cost is checking the request for the token.
+
+    curl -N -H "X-Profile-Run: $PROFILING_TOKEN" -d '{"content": "..."}' \\
+        localhost:8001/api/conversations/<id>/message/stream
+    curl -H "X-Profile-Run: $PROFILING_TOKEN" localhost:8001/api/profiles/<run_id>/folded | flamegraph.pl > run.svg
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Dict, Any, Optional, AsyncIterator
+
+from .config import PROFILES_DIR, PROFILING_INTERVAL_MS, PROFILES_MAX_KEEP
+from . import metrics
+
+# Event-loop lag is measured by how late a sleep of this length wakes up
+LAG_PROBE_SECONDS = 0.05
+
+# Lag above this counts as a stall in the summary
+STALL_SECONDS = 0.1
+
+_RUN_ID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# Profile of the run the current task belongs to
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+# Tasks created while a profile was current -> that profile
+_task_profiles: "weakref.WeakKeyDictionary[asyncio.Task, Profile]" = weakref.WeakKeyDictionary()
+
+# Loops with the profiling task factory installed: loop -> (previous factory, active profiles)
+_installed: Dict[Any, List[Any]] = {}
+
+_labels: Dict[Any, str] = {}
+
+
+def _task_factory(loop, coro, **kwargs):
+    previous = _installed[loop][0] if loop in _installed else None
+    task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+    profile = _current_profile.get()
+    if profile is not None:
+        _task_profiles[task] = profile
+    return task
+
+
+def _install(loop):
+    if loop in _installed:
+        _installed[loop][1] += 1
+        return
+    _installed[loop] = [loop.get_task_factory(), 1]
+    loop.set_task_factory(_task_factory)
+
+
+def _uninstall(loop):
+    entry = _installed.get(loop)
+    if entry is None:
+        return
+    entry[1] -= 1
+    if entry[1] == 0:
+        loop.set_task_factory(entry[0])
+        del _installed[loop]
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+class Profile:
+    """Samples and event-loop lag collected for one run."""
+
+    def __init__(self, conversation_id: str, loop, interval: float):
+        self.conversation_id = conversation_id
+        self.run_id: Optional[str] = None
+        self.loop = loop
+        self.thread_id = threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = {"run": 0, "other": 0, "idle": 0}
+        self.lags: List[float] = []
+        self.started_at = datetime.utcnow().isoformat()
+        self.start = time.monotonic()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample_loop, name="run-profiler", daemon=True)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            task = asyncio.current_task(self.loop)
+            if task is None:
+                self.samples["idle"] += 1
+                continue
+            if _task_profiles.get(task) is not self:
+                self.samples["other"] += 1
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples["run"] += 1
+
+    async def _watch_loop(self):
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(LAG_PROBE_SECONDS)
+            self.lags.append(max(0.0, self.loop.time() - start - LAG_PROBE_SECONDS))
+
+    def summary(self, top: int = 15) -> Dict[str, Any]:
+        """Sample counts, loop lag and the functions with the most samples."""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        lags = sorted(self.lags)
+        return {
+            "run_id": self.run_id,
+            "conversation_id": self.conversation_id,
+            "started_at": self.started_at,
+            "duration_seconds": round(self.duration, 3),
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": dict(self.samples),
+            "loop_lag": {
+                "probes": len(lags),
+                "mean_ms": round(sum(lags) / len(lags) * 1000, 2) if lags else 0.0,
+                "p95_ms": round(lags[int(len(lags) * 0.95)] * 1000, 2) if lags else 0.0,
+                "max_ms": round(lags[-1] * 1000, 2) if lags else 0.0,
+                "stalls": sum(1 for lag in lags if lag >= STALL_SECONDS),
+            },
+            "top_self": [{"frame": frame, "samples": count} for frame, count in self_counts.most_common(top)],
+            "top_total": [{"frame": frame, "samples": count} for frame, count in total_counts.most_common(top)],
+        }
+
+
+async def profiled(
+    events: AsyncIterator[Dict[str, Any]],
+    conversation_id: str,
+    interval_ms: Optional[float] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Relay a run's events while profiling it.
+
+    The run ID is taken from its 'run_started' event. After the run, the
+    profile is saved and a final 'profile' event with its summary is sent.
+
+    Args:
+        events: The run's event stream (e.g. stream_new_run())
+        conversation_id: Conversation the run belongs to
+        interval_ms: Sampling interval. If None, uses PROFILING_INTERVAL_MS.
+    """
+    loop = asyncio.get_running_loop()
+    profile = Profile(conversation_id, loop, (interval_ms or PROFILING_INTERVAL_MS) / 1000)
+    token = _current_profile.set(profile)
+    _install(loop)
+    _task_profiles[asyncio.current_task()] = profile
+    watcher = asyncio.create_task(profile._watch_loop())
+    profile._thread.start()
+    try:
+        async for event in events:
+            if event.get('type') == 'run_started' and profile.run_id is None:
+                profile.run_id = event['run_id']
+            yield event
+    finally:
+        profile._stop.set()
+        watcher.cancel()
+        _uninstall(loop)
+        try:
+            _current_profile.reset(token)
+        except ValueError:
+            pass  # finalized from another context
+        profile.duration = time.monotonic() - profile.start
+        summary = None
+        if profile.run_id:
+            try:
+                summary = save_profile(profile)
+            except Exception as e:
+                print(f"Error saving profile of run {profile.run_id}: {e}")
+    if summary is not None:
+        yield {'type': 'profile', 'data': summary}
+
+
+def save_profile(profile: Profile) -> Dict[str, Any]:
+    """
+    Write a profile's folded stacks and summary, and prune old profiles.
+
+    Returns:
+        The summary
+    """
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    summary = profile.summary()
+    folded = "".join(f"{stack} {count}\n" for stack, count in sorted(profile.stacks.items()))
+    with open(os.path.join(PROFILES_DIR, f"{profile.run_id}.folded"), "w", encoding="utf-8") as f:
+        f.write(folded)
+    with open(os.path.join(PROFILES_DIR, f"{profile.run_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    metrics.incr("profiles_captured")
+    print(f"DEBUG: Saved profile of run {profile.run_id} ({profile.samples['run']} samples)")
+
+    saved = sorted(
+        (name for name in os.listdir(PROFILES_DIR) if name.endswith(".json")),
+        key=lambda name: os.path.getmtime(os.path.join(PROFILES_DIR, name)),
+        reverse=True
+    )
+    for name in saved[PROFILES_MAX_KEEP:]:
+        for suffix in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(PROFILES_DIR, name[:-len(".json")] + suffix))
+            except FileNotFoundError:
+                pass
+    return summary
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Summaries of the saved profiles, newest first (without the top-function lists)."""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILES_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILES_DIR, name), encoding="utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({k: v for k, v in summary.items() if not k.startswith("top_")})
+    profiles.sort(key=lambda p: p.get("started_at") or "", reverse=True)
+    return profiles
+
+
+def get_profile_path(run_id: str, kind: str = "json") -> Optional[str]:
+    """Path of a saved profile's summary ("json") or stacks ("folded"), or None."""
+    if not _RUN_ID.fullmatch(run_id) or kind not in ("json", "folded"):
+        return None
+    path = os.path.join(PROFILES_DIR, f"{run_id}.{kind}")
+    return path if os.path.exists(path) else None
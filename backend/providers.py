@@ -0,0 +1,189 @@
+"""Provider backends for model calls.
+
+A provider is an OpenAI-compatible chat completions server: OpenRouter,
+or a self-hosted vLLM / llama.cpp / TGI server declared under "providers"
+in the council config. Each provider has its own HTTP connection pool
+(kept alive between calls), API key, timeout and concurrency limit.
+
+A model can be served by several providers (its "provider" list in the
+registry). Each call goes to the route with the lowest recent latency;
+routes that haven't been tried yet are tried first, and a failed call
+counts as a slow one, so traffic moves away from a failing backend. If
+the call fails, the model's other routes are tried in the same order
+before its fallback models. Each route has its own circuit breaker
+(see health.py).
+
+The offline mock server doubles as a local provider for testing:
+
+    MOCK_PORT=8003 uv run python -m backend.mock_server
+    # council.json: "providers": {"local": {"base_url": "http://localhost:8003/v1", "billed": false}}
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+import httpx
+
+from .config import DEFAULT_PROVIDER
+from .registry import get_registry, ModelSpec, ProviderSpec
+from . import metrics
+
+# Weight of the newest sample in the per-route latency average
+LATENCY_EWMA_ALPHA = 0.3
+
+# A replaced client is closed after this long, so requests still in
+# flight on it can finish
+RETIRED_CLIENT_GRACE_SECONDS = 600.0
+
+# Per-provider HTTP clients: name -> (spec, event loop, client)
+_clients: Dict[str, Tuple[ProviderSpec, Any, httpx.AsyncClient]] = {}
+
+# Tasks closing replaced clients, kept referenced until they finish
+_closing: Set[Any] = set()
+
+# Per-provider concurrency limits: name -> (limit, semaphore)
+_semaphores: Dict[str, Tuple[int, asyncio.Semaphore]] = {}
+
+# Smoothed latency per (provider, model name on that provider)
+_latency: Dict[Tuple[str, str], float] = {}
+
+
+def get_client(provider: ProviderSpec) -> httpx.AsyncClient:
+    """
+    Get the provider's pooled HTTP client.
+
+    A new client is created if the provider's settings changed in a
+    registry reload, or when called from another event loop (clients
+    can't be shared between loops); the old one is closed (see
+    _retire_client()).
+    """
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(provider.name)
+    if entry is None or entry[0] != provider or entry[1] is not loop:
+        if entry is not None:
+            _retire_client(entry[1], entry[2])
+        limits = httpx.Limits(
+            max_connections=provider.max_connections,
+            max_keepalive_connections=provider.max_connections
+        )
+        entry = (provider, loop, httpx.AsyncClient(limits=limits))
+        _clients[provider.name] = entry
+    return entry[2]
+
+
+async def _close_later(client: httpx.AsyncClient):
+    await asyncio.sleep(RETIRED_CLIENT_GRACE_SECONDS)
+    await client.aclose()
+
+
+def _retire_client(loop: Any, client: httpx.AsyncClient):
+    """
+    Close a replaced client, on its own event loop, once the requests
+    still using it had time to finish.
+    """
+    if loop.is_closed():
+        return  # its connections were dropped with the loop
+    if loop is asyncio.get_running_loop():
+        task = loop.create_task(_close_later(client))
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+    else:
+        asyncio.run_coroutine_threadsafe(_close_later(client), loop)
+
+
+def get_provider_semaphore(provider: ProviderSpec) -> asyncio.Semaphore:
+    """Get the semaphore bounding concurrent requests to a provider."""
+    entry = _semaphores.get(provider.name)
+    if entry is None or entry[0] != provider.max_concurrency:
+        entry = (provider.max_concurrency, asyncio.Semaphore(provider.max_concurrency))
+        _semaphores[provider.name] = entry
+    return entry[1]
+
+
+def get_routes(spec: ModelSpec) -> List[Tuple[ProviderSpec, str]]:
+    """The (provider, model name) pairs that can serve a model."""
+    providers = get_registry().providers
+    routes = [(providers[name], remote) for name, remote in spec.routes if name in providers]
+    return routes or [(providers[DEFAULT_PROVIDER], spec.id)]
+
+
+def rank_routes(spec: ModelSpec) -> List[Tuple[ProviderSpec, str]]:
+    """
+    Order a model's backends for a call: lowest smoothed latency first,
+    untried routes before any, ties in configured order.
+    """
+    routes = get_routes(spec)
+    if len(routes) == 1:
+        return routes
+    return sorted(routes, key=lambda route: _latency.get((route[0].name, route[1]), 0.0))
+
+
+def record_latency(provider: ProviderSpec, model: str, seconds: float):
+    """Add a call's latency (or a penalty for a failed call) to the route's average."""
+    key = (provider.name, model)
+    previous = _latency.get(key)
+    _latency[key] = seconds if previous is None else (
+        LATENCY_EWMA_ALPHA * seconds + (1 - LATENCY_EWMA_ALPHA) * previous
+    )
+
+
+def get_models_url(provider: ProviderSpec) -> str:
+    """The provider's models list endpoint, next to its chat completions endpoint."""
+    base = provider.url.rstrip("/")
+    if base.endswith("/chat/completions"):
+        base = base[:-len("/chat/completions")]
+    return f"{base}/models"
+
+
+def request_headers(provider: ProviderSpec) -> Dict[str, str]:
+    """Headers for a request to a provider, with its API key if it has one."""
+    headers = {"Content-Type": "application/json", **provider.headers}
+    api_key = os.getenv(provider.api_key_env) if provider.api_key_env else None
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+
+def get_route_latencies() -> Dict[str, Dict[str, float]]:
+    """Smoothed latency per provider and model, for the health report."""
+    latencies: Dict[str, Dict[str, float]] = {}
+    for (provider, model), seconds in _latency.items():
+        latencies.setdefault(provider, {})[model] = round(seconds, 3)
+    return latencies
+
+
+async def chat_completion(
+    provider: ProviderSpec,
+    payload: Dict[str, Any],
+    timeout: float
+) -> Dict[str, Any]:
+    """
+    Send a chat completions request to a provider.
+
+    Args:
+        provider: Provider to call
+        payload: Request body (with the provider's model name)
+        timeout: Request timeout in seconds
+
+    Returns:
+        The decoded response body
+
+    Raises:
+        httpx.HTTPError: On timeouts, connection errors and error statuses
+    """
+    headers = request_headers(provider)
+    async with get_provider_semaphore(provider):
+        start = time.monotonic()
+        try:
+            response = await get_client(provider).post(
+                provider.url, headers=headers, json=payload, timeout=timeout
+            )
+            response.raise_for_status()
+        except httpx.HTTPError:
+            metrics.incr("provider_requests", provider=provider.name, outcome="error")
+            raise
+        metrics.incr("provider_requests", provider=provider.name, outcome="ok")
+        metrics.observe("provider_latency_seconds", time.monotonic() - start, provider=provider.name)
+        return response.json()
@@ -0,0 +1,413 @@
+"""Vectorized aggregation of Stage 2 peer rankings.
+
+Ballots (one per judge per run) are stored as a compact position matrix
+of shape (judges, candidates): entry [j, c] is the 1-based position judge
+j gave candidate c, or 0 if j didn't rank c. A single run and a corpus of
+thousands of stored runs use the same representation; in a corpus the
+candidate columns are the union of all council members.
+
+Aggregation methods:
+    mean            Average position (what the UI shows)
+    borda           Average normalized Borda score (1.0 = always first)
+    bradley_terry   Bradley-Terry strengths fitted to the pairwise win matrix
+    kemeny          Kemeny-optimal order, approximated by local search
+
+Self-votes (a judge ranking its own Stage 1 answer) can be excluded.
+
+    uv run python -m backend.ranking --method bradley_terry --exclude-self
+    uv run python -m backend.ranking --benchmark
+"""
+
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+from .ballots import response_label
+from .council import parse_ranking_from_text, build_label_to_model
+
+METHOD_MEAN = "mean"
+METHOD_BORDA = "borda"
+METHOD_BRADLEY_TERRY = "bradley_terry"
+METHOD_KEMENY = "kemeny"
+METHODS = (METHOD_MEAN, METHOD_BORDA, METHOD_BRADLEY_TERRY, METHOD_KEMENY)
+
+# Judges per block when building the (judges x candidates x candidates)
+# comparison tensor, to bound memory on large corpora
+PAIRWISE_BLOCK = 8192
+
+
+@dataclass
+class Ballots:
+    """Stage 2 ballots as a judge x candidate position matrix."""
+    positions: np.ndarray  # int16, 1 = best, 0 = not ranked
+    candidates: List[str]
+    judges: List[str]
+
+    @property
+    def ranked(self) -> np.ndarray:
+        return self.positions > 0
+
+
+class BallotBuilder:
+    """Accumulates ballots from any number of runs into one matrix."""
+
+    def __init__(self, exclude_self: bool = False):
+        self.exclude_self = exclude_self
+        self.columns: Dict[str, int] = {}
+        self.judges: List[str] = []
+        self._rows: List[int] = []
+        self._cols: List[int] = []
+        self._positions: List[int] = []
+
+    def add_run(self, stage2_results: List[Dict[str, Any]], label_to_model: Dict[str, str]):
+        """
+        Add the ballots of one council run.
+
+        Args:
+            stage2_results: Stage 2 results (uses `parsed_ranking`, parsing
+                the ranking text only for results stored without it)
+            label_to_model: Mapping from anonymous labels to model names
+        """
+        for result in stage2_results:
+            labels = result.get("parsed_ranking")
+            if labels is None:
+                labels = parse_ranking_from_text(result.get("ranking", ""))
+            judge = result.get("model")
+            models = [label_to_model[label] for label in labels if label in label_to_model]
+            # A model listed twice keeps its best position
+            models = list(dict.fromkeys(models))
+            if self.exclude_self:
+                models = [model for model in models if model != judge]
+            if not models:
+                continue
+
+            row = len(self.judges)
+            self.judges.append(judge)
+            for position, model in enumerate(models, start=1):
+                self._rows.append(row)
+                self._cols.append(self.columns.setdefault(model, len(self.columns)))
+                self._positions.append(position)
+
+    def build(self) -> Ballots:
+        positions = np.zeros((len(self.judges), len(self.columns)), dtype=np.int16)
+        if self._rows:
+            positions[self._rows, self._cols] = self._positions
+        return Ballots(positions=positions, candidates=list(self.columns), judges=list(self.judges))
+
+
+def ballots_from_run(
+    stage2_results: List[Dict[str, Any]],
+    label_to_model: Dict[str, str],
+    exclude_self: bool = False
+) -> Ballots:
+    """Build the ballot matrix of a single council run."""
+    builder = BallotBuilder(exclude_self=exclude_self)
+    builder.add_run(stage2_results, label_to_model)
+    return builder.build()
+
+
+def ballots_from_conversations(
+    conversations: Iterable[Dict[str, Any]],
+    council_type: Optional[str] = None,
+    exclude_self: bool = False
+) -> Ballots:
+    """
+    Build one ballot matrix from every run in a set of conversations.
+
+    Args:
+        conversations: Conversation dicts (e.g. storage.iter_conversations())
+        council_type: Only include runs of this council type
+        exclude_self: Drop each judge's vote on its own response
+
+    Returns:
+        Ballots over the union of all models that were ranked
+    """
+    builder = BallotBuilder(exclude_self=exclude_self)
+    for conversation in conversations:
+        for msg in conversation["messages"]:
+            if msg.get("role") != "assistant" or not msg.get("stage2"):
+                continue
+            metadata = msg.get("metadata") or {}
+            run_council_type = msg.get("council_type") or conversation.get("council_type")
+            if council_type and run_council_type != council_type:
+                continue
+            label_to_model = metadata.get("label_to_model") or build_label_to_model(msg.get("stage1") or [])
+            builder.add_run(msg["stage2"], label_to_model)
+    return builder.build()
+
+
+def mean_rank(ballots: Ballots) -> np.ndarray:
+    """Average position per candidate (NaN if never ranked)."""
+    counts = ballots.ranked.sum(axis=0)
+    sums = ballots.positions.sum(axis=0, dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def borda(ballots: Ballots) -> np.ndarray:
+    """
+    Average normalized Borda score per candidate.
+
+    On a ballot ranking k candidates, position p earns (k - p) / (k - 1)
+    points, so 1.0 is first and 0.0 last regardless of council size.
+    """
+    ranked = ballots.ranked
+    k = ranked.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        points = np.where(ranked & (k > 1), (k - ballots.positions) / (k - 1), 0.0)
+        return np.where(ranked.any(axis=0), points.sum(axis=0) / ranked.sum(axis=0), np.nan)
+
+
+def pairwise_wins(ballots: Ballots) -> np.ndarray:
+    """
+    Pairwise win matrix: W[a, b] is the number of ballots that ranked
+    candidate a above candidate b. Only ballots ranking both count.
+    """
+    n = len(ballots.candidates)
+    wins = np.zeros((n, n), dtype=np.int64)
+    for start in range(0, ballots.positions.shape[0], PAIRWISE_BLOCK):
+        block = ballots.positions[start:start + PAIRWISE_BLOCK]
+        ranked = block > 0
+        both = ranked[:, :, None] & ranked[:, None, :]
+        wins += ((block[:, :, None] < block[:, None, :]) & both).sum(axis=0)
+    return wins
+
+
+def bradley_terry(
+    wins: np.ndarray,
+    prior: float = 0.5,
+    max_iter: int = 500,
+    tol: float = 1e-9
+) -> np.ndarray:
+    """
+    Fit Bradley-Terry strengths with the MM algorithm (Hunter, 2004).
+
+    Args:
+        wins: Pairwise win matrix from pairwise_wins()
+        prior: Pseudo-wins added to every pair that met, so a model that
+            never won still gets a finite strength
+        max_iter: Maximum number of iterations
+        tol: Convergence threshold on the strengths
+
+    Returns:
+        Strengths summing to 1 (P(a beats b) = s_a / (s_a + s_b)); 0 for
+        candidates that were never compared
+    """
+    games = wins + wins.T
+    wins = wins + prior * (games > 0)
+    games = wins + wins.T
+    total_wins = wins.sum(axis=1)
+    compared = games.sum(axis=1) > 0
+    strengths = np.where(compared, 1.0, 0.0)
+    if not compared.any():
+        return strengths
+    strengths /= strengths.sum()
+
+    for _ in range(max_iter):
+        pair_sums = strengths[:, None] + strengths[None, :]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            denominators = np.where(pair_sums > 0, games / pair_sums, 0.0).sum(axis=1)
+            updated = np.where(denominators > 0, total_wins / denominators, 0.0)
+        updated /= updated.sum()
+        converged = np.abs(updated - strengths).max() < tol
+        strengths = updated
+        if converged:
+            break
+    return strengths
+
+
+def kemeny_order(wins: np.ndarray, max_sweeps: int = 50) -> List[int]:
+    """
+    Approximate the Kemeny-optimal order (the order disagreeing with the
+    fewest pairwise ballot preferences).
+
+    Starts from the Copeland order (net pairwise wins) and moves single
+    candidates to their best position until no move lowers the number of
+    disagreements. Exact Kemeny is NP-hard; for council-sized candidate
+    sets this local search usually finds the optimum.
+
+    Returns:
+        Candidate indices, best first
+    """
+    order = list(np.argsort(-(wins - wins.T).sum(axis=1), kind="stable"))
+    for _ in range(max_sweeps):
+        improved = False
+        for candidate in list(order):
+            rest = [c for c in order if c != candidate]
+            # Disagreements if inserted at position i: ballots preferring the
+            # candidate over those placed before it, plus ballots preferring
+            # those placed after it over the candidate
+            beats_earlier = np.concatenate(([0], np.cumsum(wins[candidate, rest])))
+            beaten_by_later = wins[rest, candidate].sum() - np.concatenate(([0], np.cumsum(wins[rest, candidate])))
+            costs = beats_earlier + beaten_by_later
+            best = int(np.argmin(costs))
+            current = order.index(candidate)
+            if costs[best] < costs[current]:
+                rest.insert(best, candidate)
+                order = rest
+                improved = True
+        if not improved:
+            break
+    return [int(c) for c in order]
+
+
+def kemeny_disagreements(wins: np.ndarray, order: List[int]) -> int:
+    """Number of pairwise ballot preferences an order contradicts."""
+    ordered = wins[np.ix_(order, order)]
+    return int(np.tril(ordered, -1).sum())
+
+
+def concordance(ballots: Ballots) -> float:
+    """
+    Kendall's W: how much the judges agree, from 0 (no agreement) to 1
+    (identical rankings).
+
+    Candidates a judge didn't rank share the positions after its ranked
+    ones (as ties, with the usual tie correction).
+
+    Returns:
+        W, or 0.0 with fewer than 2 judges or candidates
+    """
+    judges, candidates = ballots.positions.shape
+    if judges < 2 or candidates < 2:
+        return 0.0
+    ranked = ballots.ranked
+    unranked = candidates - ranked.sum(axis=1)
+    tied_rank = (2 * candidates - unranked + 1) / 2.0
+    ranks = np.where(ranked, ballots.positions, tied_rank[:, None]).astype(np.float64)
+    totals = ranks.sum(axis=0)
+    spread = float(((totals - totals.mean()) ** 2).sum())
+    ties = float((unranked ** 3 - unranked).sum())
+    denominator = judges ** 2 * (candidates ** 3 - candidates) - judges * ties
+    return 12 * spread / denominator if denominator > 0 else 0.0
+
+
+def aggregate(ballots: Ballots, method: str = METHOD_MEAN) -> List[Dict[str, Any]]:
+    """
+    Aggregate ballots into a ranking of candidates.
+
+    Args:
+        ballots: Ballot matrix
+        method: One of METHODS
+
+    Returns:
+        List of dicts with model, score (average rank for "mean", Borda
+        score, Bradley-Terry strength or Kemeny position), average rank and
+        number of ballots ranking the model, sorted best to worst
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown ranking method {method!r}, expected one of {METHODS}")
+
+    means = mean_rank(ballots)
+    counts = ballots.ranked.sum(axis=0)
+    present = np.flatnonzero(counts > 0)
+
+    if method == METHOD_MEAN:
+        scores = means
+        order = present[np.argsort(means[present], kind="stable")]
+    elif method == METHOD_BORDA:
+        scores = borda(ballots)
+        order = present[np.argsort(-scores[present], kind="stable")]
+    elif method == METHOD_BRADLEY_TERRY:
+        scores = bradley_terry(pairwise_wins(ballots))
+        order = present[np.argsort(-scores[present], kind="stable")]
+    else:
+        wins = pairwise_wins(ballots)
+        kemeny = kemeny_order(wins)
+        scores = np.empty(len(ballots.candidates))
+        scores[kemeny] = np.arange(1, len(kemeny) + 1)
+        order = [c for c in kemeny if counts[c] > 0]
+
+    return [
+        {
+            "model": ballots.candidates[c],
+            "score": round(float(scores[c]), 4),
+            "average_rank": round(float(means[c]), 2),
+            "rankings_count": int(counts[c]),
+        }
+        for c in order
+    ]
+
+
+def aggregate_run(
+    stage2_results: List[Dict[str, Any]],
+    label_to_model: Dict[str, str],
+    method: str = METHOD_MEAN,
+    exclude_self: bool = False
+) -> List[Dict[str, Any]]:
+    """Aggregate the Stage 2 rankings of a single run (see aggregate())."""
+    return aggregate(ballots_from_run(stage2_results, label_to_model, exclude_self), method)
+
+
+def _synthetic_corpus(runs: int, council_size: int, seed: int = 0):
+    """Random Stage 2 results shaped like stored ones, for benchmarking."""
+    rng = np.random.default_rng(seed)
+    models = [f"provider/model-{i}" for i in range(council_size * 2)]
+    quality = rng.normal(size=len(models))
+    corpus = []
+    for _ in range(runs):
+        members = list(rng.choice(models, size=council_size, replace=False))
+        label_to_model = {f"Response {response_label(i)}": m for i, m in enumerate(members)}
+        stage2 = []
+        for judge in members:
+            noise = quality[[models.index(m) for m in members]] + rng.normal(scale=1.0, size=council_size)
+            labels = [f"Response {response_label(i)}" for i in np.argsort(-noise)]
+            text = "Evaluation...\n\nFINAL RANKING:\n" + "\n".join(f"{i}. {l}" for i, l in enumerate(labels, start=1))
+            stage2.append({"model": judge, "ranking": text, "parsed_ranking": labels})
+        corpus.append((stage2, label_to_model))
+    return corpus
+
+
+def benchmark(runs: int = 5000, council_size: int = 5):
+    """Compare the vectorized engine with council.calculate_aggregate_rankings()."""
+    import time
+    from .council import calculate_aggregate_rankings
+
+    corpus = _synthetic_corpus(runs, council_size)
+    print(f"{runs} runs x {council_size} judges x {council_size} candidates")
+
+    start = time.perf_counter()
+    for stage2, label_to_model in corpus:
+        calculate_aggregate_rankings(stage2, label_to_model)
+    legacy = time.perf_counter() - start
+    print(f"  calculate_aggregate_rankings, per run:     {legacy * 1000:8.1f} ms")
+
+    start = time.perf_counter()
+    for stage2, label_to_model in corpus:
+        aggregate_run(stage2, label_to_model)
+    print(f"  aggregate_run (mean), per run:             {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    start = time.perf_counter()
+    builder = BallotBuilder()
+    for stage2, label_to_model in corpus:
+        builder.add_run(stage2, label_to_model)
+    ballots = builder.build()
+    print(f"  build corpus ballot matrix {ballots.positions.shape}: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    for method in METHODS:
+        start = time.perf_counter()
+        aggregate(ballots, method)
+        print(f"  corpus {method:<14}                     {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Aggregate Stage 2 rankings across stored conversations")
+    parser.add_argument("--method", choices=METHODS, default=METHOD_MEAN)
+    parser.add_argument("--council-type", help="Only include runs of this council type")
+    parser.add_argument("--exclude-self", action="store_true", help="Ignore judges' votes on their own response")
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark on a synthetic corpus instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        from . import storage
+        ballots = ballots_from_conversations(
+            storage.iter_conversations(), council_type=args.council_type, exclude_self=args.exclude_self
+        )
+        print(f"{len(ballots.judges)} ballots over {len(ballots.candidates)} models")
+        print(json.dumps(aggregate(ballots, args.method), indent=2))
@@ -0,0 +1,492 @@
+"""Council registry: per-model attributes loaded from a hot-reloadable file."""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Tuple
+
+from .config import (
+    COUNCIL_CONFIG_FILE,
+    COUNCIL_CONFIG_RELOAD_INTERVAL,
+    DEFAULT_MODEL_TIMEOUT,
+    DEFAULT_CONTEXT_WINDOW,
+    DEFAULT_MAX_CONCURRENCY,
+    STAGE_GENERATION_PARAMS,
+    COUNCIL_TYPE_PREMIUM,
+    COUNCIL_TYPE_ECONOMIC,
+    COUNCIL_TYPE_FREE,
+    COUNCIL_TYPE_CASCADE,
+    CASCADE_FIRST_TIER,
+    CASCADE_ESCALATION_TIER,
+    CASCADE_CONFIDENCE_THRESHOLD,
+    COUNCIL_MODELS_PREMIUM,
+    CHAIRMAN_MODEL_PREMIUM,
+    COUNCIL_MODELS_ECONOMIC,
+    CHAIRMAN_MODEL_ECONOMIC,
+    COUNCIL_MODELS_FREE,
+    CHAIRMAN_MODEL_FREE,
+    MODEL_FALLBACK_MAP,
+    OPENROUTER_API_URL,
+    DEFAULT_PROVIDER,
+    DEFAULT_PROVIDER_MAX_CONCURRENCY,
+    DEFAULT_PROVIDER_MAX_CONNECTIONS,
+)
+
+# Provider kinds: OpenRouter gets its extra request fields (usage
+# accounting); "openai" is any other OpenAI-compatible server
+PROVIDER_KIND_OPENROUTER = "openrouter"
+PROVIDER_KIND_OPENAI = "openai"
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Per-model attributes used for scheduling, timeouts and budgeting."""
+    id: str
+    timeout: float = DEFAULT_MODEL_TIMEOUT
+    context_window: int = DEFAULT_CONTEXT_WINDOW
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    fallbacks: Tuple[str, ...] = ()
+    # Prices are USD per 1M tokens, as listed on OpenRouter
+    price_prompt: float = 0.0
+    price_completion: float = 0.0
+    expected_latency: Optional[float] = None
+    # Supports JSON-schema structured output (used for Stage 2 ballots)
+    structured_output: bool = False
+    # Generation parameters (max_tokens, temperature, reasoning...) under
+    # "default" and/or per stage ("stage1", "stage2", "stage3"...)
+    generation: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Backends serving the model, as (provider, model name on that provider);
+    # empty means OpenRouter under the model's own ID
+    routes: Tuple[Tuple[str, str], ...] = ()
+
+    def estimate_cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """Estimate the USD cost of a call with the given token counts."""
+        return (
+            prompt_tokens * self.price_prompt
+            + completion_tokens * self.price_completion
+        ) / 1_000_000
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """An OpenAI-compatible chat completions backend."""
+    name: str
+    # Full chat completions URL
+    url: str
+    kind: str = PROVIDER_KIND_OPENAI
+    # Environment variable holding the API key (None: no Authorization header)
+    api_key_env: Optional[str] = None
+    # Cap on the request timeout of models on this provider (None: the
+    # model's own timeout)
+    timeout: Optional[float] = None
+    max_concurrency: int = DEFAULT_PROVIDER_MAX_CONCURRENCY
+    max_connections: int = DEFAULT_PROVIDER_MAX_CONNECTIONS
+    # False for self-hosted servers: calls cost nothing
+    billed: bool = True
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class CouncilSpec:
+    """
+    A named council: its members and its chairman.
+
+    A cascade council names two other councils instead (see
+    backend/cascade.py); its members and chairman are the first tier's.
+    """
+    name: str
+    members: Tuple[str, ...]
+    chairman: str
+    # (first tier, escalation tier) for a cascade council
+    cascade: Tuple[str, ...] = ()
+    # Stage 2 agreement below which a cascade escalates
+    threshold: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class Registry:
+    """
+    Immutable snapshot of the council configuration.
+
+    A reload produces a new snapshot; runs that already resolved their
+    council keep using the snapshot they started with.
+    """
+    councils: Dict[str, CouncilSpec]
+    models: Dict[str, ModelSpec]
+    providers: Dict[str, ProviderSpec] = field(default_factory=dict)
+    version: int = 0
+    source: Optional[str] = None
+    loaded_at: float = field(default_factory=time.time)
+
+    def model(self, model_id: str) -> ModelSpec:
+        """Get the spec for a model, or defaults if it is not configured."""
+        spec = self.models.get(model_id)
+        if spec is None:
+            spec = ModelSpec(id=model_id)
+        return spec
+
+    def council(self, council_type: str) -> CouncilSpec:
+        """Get a council by type, falling back to premium if unknown."""
+        if council_type in self.councils:
+            return self.councils[council_type]
+        if COUNCIL_TYPE_PREMIUM in self.councils:
+            return self.councils[COUNCIL_TYPE_PREMIUM]
+        return next(iter(self.councils.values()))
+
+    def council_types(self) -> List[str]:
+        """List the configured council types."""
+        return list(self.councils.keys())
+
+    def council_models(self, include_fallbacks: bool = False) -> List[str]:
+        """Members and chairmen of every council (and their fallbacks), without duplicates."""
+        models: List[str] = []
+        for council in self.councils.values():
+            for model in list(council.members) + [council.chairman]:
+                if model not in models:
+                    models.append(model)
+                for fallback in self.model(model).fallbacks if include_fallbacks else ():
+                    if fallback not in models:
+                        models.append(fallback)
+        return models
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the registry for the API."""
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "councils": {name: asdict(spec) for name, spec in self.councils.items()},
+            "models": {model_id: asdict(spec) for model_id, spec in self.models.items()},
+            "providers": {name: asdict(spec) for name, spec in self.providers.items()},
+        }
+
+
+def _builtin_config() -> Dict[str, Any]:
+    """Build the raw config from the constants in config.py."""
+    models: Dict[str, Dict[str, Any]] = {}
+
+    for model_id in COUNCIL_MODELS_FREE + [CHAIRMAN_MODEL_FREE]:
+        # Free models typically have a 32k context limit
+        models.setdefault(model_id, {})["context_window"] = 32000
+
+    for model_id, fallback in MODEL_FALLBACK_MAP.items():
+        models.setdefault(model_id, {})["fallbacks"] = [fallback]
+
+    for model_id in COUNCIL_MODELS_PREMIUM:
+        models.setdefault(model_id, {})["structured_output"] = True
+
+    return {
+        "councils": {
+            COUNCIL_TYPE_PREMIUM: {
+                "members": COUNCIL_MODELS_PREMIUM,
+                "chairman": CHAIRMAN_MODEL_PREMIUM,
+            },
+            COUNCIL_TYPE_ECONOMIC: {
+                "members": COUNCIL_MODELS_ECONOMIC,
+                "chairman": CHAIRMAN_MODEL_ECONOMIC,
+            },
+            COUNCIL_TYPE_FREE: {
+                "members": COUNCIL_MODELS_FREE,
+                "chairman": CHAIRMAN_MODEL_FREE,
+            },
+            COUNCIL_TYPE_CASCADE: {
+                "cascade": [CASCADE_FIRST_TIER, CASCADE_ESCALATION_TIER],
+                "threshold": CASCADE_CONFIDENCE_THRESHOLD,
+            },
+        },
+        "models": models,
+    }
+
+
+def _read_config_file(path: str) -> Dict[str, Any]:
+    """Read a JSON or YAML council config file."""
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to load YAML council configs")
+            try:
+                return yaml.safe_load(f) or {}
+            except yaml.YAMLError as e:
+                raise ValueError(f"invalid YAML: {e}")
+        return json.load(f)
+
+
+def _mapping(value: Any, what: str) -> Dict[str, Any]:
+    """Check that a config section is an object (None counts as empty)."""
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{what} must be an object, not {type(value).__name__}")
+    return value
+
+
+def _model_list(value: Any, what: str) -> List[str]:
+    """Check that a config value is a list of model identifiers (or a single one)."""
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{what} must be a list of model identifiers")
+    return value
+
+
+def _parse_providers(raw_providers: Dict[str, Any]) -> Dict[str, ProviderSpec]:
+    """Build the provider specs; "openrouter" is always defined."""
+    entries = {DEFAULT_PROVIDER: {
+        "url": OPENROUTER_API_URL,
+        "kind": PROVIDER_KIND_OPENROUTER,
+        "api_key_env": "OPENROUTER_API_KEY",
+    }}
+    for name, entry in raw_providers.items():
+        entries[name] = {**entries.get(name, {}), **_mapping(entry, f"provider '{name}'")}
+
+    providers = {}
+    for name, attrs in entries.items():
+        url = attrs.get("url")
+        if not url and attrs.get("base_url"):
+            url = attrs["base_url"].rstrip("/") + "/chat/completions"
+        if not url:
+            raise ValueError(f"provider '{name}' needs a 'base_url' or 'url'")
+        kind = attrs.get("kind", PROVIDER_KIND_OPENAI)
+        if kind not in (PROVIDER_KIND_OPENROUTER, PROVIDER_KIND_OPENAI):
+            raise ValueError(f"provider '{name}' has unknown kind '{kind}'")
+        try:
+            providers[name] = ProviderSpec(
+                name=name,
+                url=url,
+                kind=kind,
+                api_key_env=attrs.get("api_key_env"),
+                timeout=float(attrs["timeout"]) if attrs.get("timeout") is not None else None,
+                max_concurrency=max(1, int(attrs.get("max_concurrency", DEFAULT_PROVIDER_MAX_CONCURRENCY))),
+                max_connections=max(1, int(attrs.get("max_connections", DEFAULT_PROVIDER_MAX_CONNECTIONS))),
+                billed=bool(attrs.get("billed", True)),
+                headers={str(k): str(v) for k, v in _mapping(attrs.get("headers"), "headers").items()},
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"invalid attributes for provider '{name}': {e}")
+    return providers
+
+
+def _parse_routes(model_id: str, raw: Any, providers: Dict[str, ProviderSpec]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Parse a model's "provider" attribute: a provider name, or a list of
+    names and {"provider": ..., "model": ...} objects (for servers that
+    know the model under another name).
+    """
+    if raw is None:
+        return ()
+    routes = []
+    for entry in ([raw] if isinstance(raw, (str, dict)) else raw):
+        if isinstance(entry, str):
+            name, remote = entry, model_id
+        elif isinstance(entry, dict) and entry.get("provider"):
+            name, remote = entry["provider"], entry.get("model") or model_id
+        else:
+            raise ValueError(f"invalid provider entry for model '{model_id}': {entry!r}")
+        if name not in providers:
+            raise ValueError(f"model '{model_id}' uses unknown provider '{name}'")
+        routes.append((name, remote))
+    return tuple(routes)
+
+
+def parse_registry(raw: Dict[str, Any], version: int = 0, source: Optional[str] = None) -> Registry:
+    """
+    Validate a raw config dict and build a Registry from it.
+
+    Args:
+        raw: Dict with 'councils' and optional 'models', 'defaults' and
+            'providers' sections
+        version: Version number to stamp on the snapshot
+        source: Path the config was loaded from (None for built-in)
+
+    Returns:
+        Registry snapshot
+
+    Raises:
+        ValueError: If the config is malformed
+    """
+    raw = _mapping(raw, "council config")
+    raw_councils = _mapping(raw.get("councils"), "'councils'")
+    if not raw_councils:
+        raise ValueError("council config must define at least one council under 'councils'")
+    for name, entry in raw_councils.items():
+        _mapping(entry, f"council '{name}'")
+
+    defaults = _mapping(raw.get("defaults"), "'defaults'")
+    raw_models = dict(_mapping(raw.get("models"), "'models'"))
+
+    councils = {}
+    for name, entry in raw_councils.items():
+        if entry.get("cascade"):
+            continue  # resolved below, once the councils it names are known
+        members = _model_list(entry.get("members") or [], f"'members' of council '{name}'")
+        chairman = entry.get("chairman")
+        if not members or not chairman:
+            raise ValueError(f"council '{name}' needs 'members' and a 'chairman'")
+        if not isinstance(chairman, str):
+            raise ValueError(f"'chairman' of council '{name}' must be a model identifier")
+        councils[name] = CouncilSpec(name=name, members=tuple(members), chairman=chairman)
+        # Every referenced model gets a spec, even if only defaults apply
+        for model_id in list(members) + [chairman]:
+            raw_models.setdefault(model_id, {})
+
+    for name, entry in raw_councils.items():
+        tiers = entry.get("cascade")
+        if not tiers:
+            continue
+        if not isinstance(tiers, list) or len(tiers) != 2 or not all(isinstance(tier, str) for tier in tiers):
+            raise ValueError(f"cascade council '{name}' needs 'cascade': [first tier, escalation tier]")
+        missing = [tier for tier in tiers if tier not in councils or councils[tier].cascade]
+        if missing:
+            raise ValueError(f"cascade council '{name}' names unknown or cascade councils: {', '.join(missing)}")
+        try:
+            threshold = float(entry.get("threshold", CASCADE_CONFIDENCE_THRESHOLD))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid 'threshold' for cascade council '{name}'")
+        first = councils[tiers[0]]
+        councils[name] = CouncilSpec(
+            name=name, members=first.members, chairman=first.chairman, cascade=tuple(tiers), threshold=threshold
+        )
+
+    providers = _parse_providers(_mapping(raw.get("providers"), "'providers'"))
+
+    models = {}
+    for model_id, entry in raw_models.items():
+        attrs = {**defaults, **_mapping(entry, f"model '{model_id}'")}
+        routes = _parse_routes(model_id, attrs.get("provider"), providers)
+        fallbacks = _model_list(
+            attrs.get("fallbacks", attrs.get("fallback", [])) or [], f"'fallbacks' of model '{model_id}'"
+        )
+        generation = attrs.get("generation") or {}
+        if not isinstance(generation, dict) or not all(isinstance(v, dict) for v in generation.values()):
+            raise ValueError(f"'generation' of model '{model_id}' must map stages to parameter objects")
+        try:
+            models[model_id] = ModelSpec(
+                id=model_id,
+                timeout=float(attrs.get("timeout", DEFAULT_MODEL_TIMEOUT)),
+                context_window=int(attrs.get("context_window", DEFAULT_CONTEXT_WINDOW)),
+                max_concurrency=max(1, int(attrs.get("max_concurrency", DEFAULT_MAX_CONCURRENCY))),
+                fallbacks=tuple(f for f in fallbacks if f != model_id),
+                price_prompt=float(attrs.get("price_prompt", 0.0)),
+                price_completion=float(attrs.get("price_completion", 0.0)),
+                expected_latency=(
+                    float(attrs["expected_latency"])
+                    if attrs.get("expected_latency") is not None else None
+                ),
+                structured_output=bool(attrs.get("structured_output", False)),
+                generation=generation,
+                routes=routes,
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"invalid attributes for model '{model_id}': {e}")
+
+    return Registry(councils=councils, models=models, providers=providers, version=version, source=source)
+
+
+_lock = threading.Lock()
+_registry: Optional[Registry] = None
+_loaded_mtime: Optional[float] = None
+_last_check = 0.0
+
+
+def _config_mtime() -> Optional[float]:
+    try:
+        return os.path.getmtime(COUNCIL_CONFIG_FILE)
+    except OSError:
+        return None
+
+
+def reload_registry(force: bool = False) -> Registry:
+    """
+    Reload the registry from COUNCIL_CONFIG_FILE if it changed.
+
+    A broken file never replaces a working snapshot: the error is logged
+    and the previous registry stays active.
+
+    Args:
+        force: Reload even if the file modification time is unchanged
+
+    Returns:
+        The active Registry
+    """
+    global _registry, _loaded_mtime, _last_check
+
+    with _lock:
+        _last_check = time.monotonic()
+        mtime = _config_mtime()
+        if not force and _registry is not None and mtime == _loaded_mtime:
+            return _registry
+
+        version = (_registry.version + 1) if _registry is not None else 1
+        try:
+            if mtime is None:
+                registry = parse_registry(_builtin_config(), version=version)
+            else:
+                registry = parse_registry(
+                    _read_config_file(COUNCIL_CONFIG_FILE),
+                    version=version,
+                    source=COUNCIL_CONFIG_FILE
+                )
+        except (OSError, ValueError) as e:
+            print(f"Error loading council config {COUNCIL_CONFIG_FILE}: {e}")
+            if _registry is None:
+                _registry = parse_registry(_builtin_config(), version=version)
+            _loaded_mtime = mtime
+            return _registry
+
+        _registry = registry
+        _loaded_mtime = mtime
+        print(f"Loaded council registry v{registry.version} from {registry.source or 'built-in defaults'}")
+        return _registry
+
+
+def get_registry() -> Registry:
+    """
+    Get the active registry, checking the config file for changes at most
+    once every COUNCIL_CONFIG_RELOAD_INTERVAL seconds.
+
+    Returns:
+        The active Registry snapshot
+    """
+    if _registry is None or time.monotonic() - _last_check >= COUNCIL_CONFIG_RELOAD_INTERVAL:
+        return reload_registry()
+    return _registry
+
+
+def get_model_spec(model_id: str) -> ModelSpec:
+    """Get the spec for a model from the active registry."""
+    return get_registry().model(model_id)
+
+
+def generation_params(
+    model_id: str,
+    stage: Optional[str] = None,
+    overrides: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Resolve the generation parameters for a call.
+
+    Later layers win: the stage defaults from config, the model's "default"
+    and per-stage registry settings, then the call's own overrides (a
+    compact ballot's max_tokens or a re-ask's response_format must not be
+    undone by the registry). Parameters resolved to None are left out.
+
+    Args:
+        model_id: Model identifier
+        stage: Council stage of the call (e.g. "stage2"), if any
+        overrides: Parameters for this particular call (e.g. compact Stage 2)
+
+    Returns:
+        Dict of parameters to add to the request payload
+    """
+    generation = get_model_spec(model_id).generation
+    params: Dict[str, Any] = {}
+    params.update(STAGE_GENERATION_PARAMS.get(stage, {}) if stage else {})
+    params.update(generation.get("default", {}))
+    if stage:
+        params.update(generation.get(stage, {}))
+    params.update(overrides or {})
+    return {key: value for key, value in params.items() if value is not None}
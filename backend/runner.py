@@ -0,0 +1,690 @@
+"""Checkpointed council runs that stream progress events.
+
+Each stage's output is saved to the conversation as soon as it completes,
+so a crash, deploy or error at a later stage doesn't throw away the
+Stage 1/Stage 2 results already paid for. A run that didn't finish can be
+resumed from its last completed stage.
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Dict, Any, AsyncIterator, Optional
+
+from . import storage
+from . import metrics
+from . import costs
+from . import neardup
+from . import cascade
+from .deadlines import stage_deadlines, too_late, best_stage1_answer
+from .config import (
+    COUNCIL_TYPE_PREMIUM,
+    BUDGET_MAX_CONVERSATION_COST,
+    STAGE2_COMPACT,
+    COALESCE_RUNS,
+    NEARDUP_CACHE,
+)
+from .singleflight import SingleFlight, flight_key
+from .council import (
+    generate_conversation_title,
+    stage1_collect_responses,
+    stage2_collect_rankings,
+    stage3_synthesize_final,
+    stage3_speculative_draft,
+    stage3_finalize_speculative,
+    calculate_aggregate_rankings,
+    get_council_config,
+    build_label_to_model,
+)
+from .registry import get_registry
+
+# Identical concurrent runs share one set of stages
+_runs = SingleFlight("run")
+
+# Background re-runs of answers served from the near-duplicate cache
+_refresh_tasks = set()
+
+
+async def _run_stages(
+    conversation_id: str,
+    run_id: str,
+    user_query: str,
+    council_type: str,
+    message: Dict[str, Any],
+    title_task: Optional[asyncio.Task] = None,
+    speculative: bool = False,
+    deadline_seconds: Optional[float] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run (or continue) the 3 stages of a council run, checkpointing each one.
+
+    Stages already present in `message` are not re-run; their stored
+    results are replayed as completion events instead. With `speculative`,
+    the chairman drafts the final answer from Stage 1 while Stage 2 runs.
+    The council comes from `message["council"]` when the budget planner
+    chose it, otherwise from the registry. With `deadline_seconds`, each
+    stage gets a share of the time and degrades when it runs out (see
+    backend/deadlines.py); the degradations are recorded in the metadata
+    under 'deadline'. A cascade council runs its first tier and may
+    escalate after Stage 2 (see backend/cascade.py).
+    """
+    run_start = time.monotonic()
+    speculative_task = None
+    deadlines: Dict[str, float] = stage_deadlines(deadline_seconds, run_start) if deadline_seconds else {}
+    degradations = []
+    metadata: Dict[str, Any] = {}
+    stage1_results = stage2_results = None
+    council_models, chairman_model = [], None
+    spec = cascade.cascade_spec(council_type)
+
+    def degrade(stage: str, kind: str, detail: str):
+        print(f"DEBUG: Run {run_id} degraded at {stage} ({kind}): {detail}")
+        metrics.incr("deadline_degradations", stage=stage, kind=kind)
+        degradations.append({"stage": stage, "kind": kind, "detail": detail})
+
+    def deadline_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        if deadlines:
+            metadata['deadline'] = {"seconds": deadline_seconds, "degradations": list(degradations)}
+        return metadata
+
+    async def collect_rankings():
+        """Run Stage 2 with the current council (sets stage2_results and metadata)."""
+        nonlocal stage2_results, metadata, speculative_task
+        if speculative and (spec is None or "cascade" in message):
+            # Most of the chairman's prompt is known now; start it alongside Stage 2
+            speculative_task = asyncio.create_task(
+                stage3_speculative_draft(user_query, stage1_results, chairman_model, deadlines.get("stage3"))
+            )
+        yield {'type': 'stage2_start'}
+        stage_start = time.monotonic()
+        stage2_results, label_to_model = await stage2_collect_rankings(
+            user_query, stage1_results, council_models, deadline=deadlines.get("stage2")
+        )
+        metrics.observe(
+            "stage_latency_seconds",
+            time.monotonic() - stage_start,
+            stage="stage2",
+            mode="compact" if STAGE2_COMPACT else "full"
+        )
+        if deadlines and len(stage2_results) < len(council_models) and too_late(deadlines["stage2"], 0):
+            degrade(
+                "stage2", "partial" if stage2_results else "timed_out",
+                f"{len(stage2_results)} of {len(council_models)} ballots arrived in time"
+            )
+        aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
+        metadata = deadline_metadata({
+            'label_to_model': label_to_model,
+            'aggregate_rankings': aggregate_rankings,
+            'council_type': council_type
+        })
+        # An escalated cascade run also paid for the first tier's ballots
+        first_tier_ballots = (message.get("cascade") or {}).get("stage2") or []
+        message["usage"] = costs.message_usage(message, "stage2", first_tier_ballots + stage2_results)
+        storage.update_assistant_message(
+            conversation_id, run_id, stage2=stage2_results, metadata=metadata, usage=message["usage"]
+        )
+        yield {'type': 'stage2_complete', 'data': stage2_results, 'metadata': metadata}
+
+    try:
+        if message.get("council"):
+            council_models = list(message["council"]["members"])
+            chairman_model = message["council"]["chairman"]
+        else:
+            council_models, chairman_model = get_council_config(council_type)
+        print(f"DEBUG: Run {run_id} using council models: {council_models}")
+        print(f"DEBUG: Run {run_id} using chairman model: {chairman_model}")
+
+        # Stage 1: Collect responses (an empty checkpoint means nothing was paid for, so re-run)
+        stage1_results = message.get("stage1")
+        if stage1_results:
+            print(f"DEBUG: Run {run_id} reusing {len(stage1_results)} checkpointed Stage 1 results")
+        else:
+            yield {'type': 'stage1_start'}
+            stage_start = time.monotonic()
+            stage1_results = await stage1_collect_responses(user_query, council_models, deadlines.get("stage1"))
+            metrics.observe("stage_latency_seconds", time.monotonic() - stage_start, stage="stage1")
+            print(f"DEBUG: Stage 1 completed with {len(stage1_results)} results")
+            if deadlines and len(stage1_results) < len(council_models) and too_late(deadlines["stage1"], 0):
+                degrade(
+                    "stage1", "partial" if stage1_results else "timed_out",
+                    f"{len(stage1_results)} of {len(council_models)} responses arrived in time"
+                )
+            message["usage"] = costs.message_usage(message, "stage1", stage1_results)
+            storage.update_assistant_message(
+                conversation_id, run_id, stage1=stage1_results, usage=message["usage"]
+            )
+        yield {'type': 'stage1_complete', 'data': stage1_results, 'council_type': council_type}
+
+        # Stage 2: Collect rankings (only if Stage 1 has results)
+        if not stage1_results:
+            print(f"DEBUG: Skipping Stage 2 - Stage 1 has 0 results")
+            stage2_results = []
+        elif message.get("stage2") is not None:
+            stage2_results = message["stage2"]
+            metadata = message.get("metadata") or {
+                'label_to_model': build_label_to_model(stage1_results),
+                'aggregate_rankings': calculate_aggregate_rankings(
+                    stage2_results, build_label_to_model(stage1_results)
+                ),
+                'council_type': council_type
+            }
+            print(f"DEBUG: Run {run_id} reusing checkpointed Stage 2 results")
+            yield {'type': 'stage2_complete', 'data': stage2_results, 'metadata': metadata}
+        elif deadlines and too_late(deadlines["stage2"]):
+            # No time left for peer review: go straight to the chairman
+            degrade("stage2", "skipped", "No time left for peer review")
+            stage2_results = []
+            metadata = deadline_metadata({
+                'label_to_model': build_label_to_model(stage1_results),
+                'aggregate_rankings': [],
+                'council_type': council_type
+            })
+            storage.update_assistant_message(conversation_id, run_id, stage2=stage2_results, metadata=metadata)
+            yield {'type': 'stage2_complete', 'data': stage2_results, 'metadata': metadata}
+        else:
+            async for event in collect_rankings():
+                yield event
+
+        # Cascade: bring in the escalation tier if the first tier's judges disagree
+        if spec is not None and stage1_results and "cascade" not in message:
+            decision = cascade.decide(stage2_results, metadata.get('label_to_model') or {}, spec)
+            if decision["escalated"]:
+                escalation = get_registry().council(spec.cascade[1])
+                answered = {result["model"] for result in stage1_results}
+                new_members = [model for model in escalation.members if model not in answered]
+                run_cost = (message.get("usage") or {}).get("total", {}).get("cost", 0.0)
+                if deadlines and too_late(deadlines["stage2"]):
+                    decision.update(escalated=False, reason="no_time")
+                elif not cascade.escalation_fits_budget(
+                    conversation_id, user_query, new_members, escalation.chairman, run_cost
+                ):
+                    decision.update(escalated=False, reason="over_budget")
+            print(
+                f"DEBUG: Run {run_id} cascade confidence {decision['confidence']} "
+                f"(threshold {decision['threshold']}): {decision['reason']}"
+            )
+            message["cascade"] = decision
+            yield {'type': 'cascade', 'data': dict(decision)}
+
+            if not decision["escalated"]:
+                storage.update_assistant_message(conversation_id, run_id, cascade=decision)
+            else:
+                council_models, chairman_model = list(escalation.members), escalation.chairman
+                message["council"] = {"members": council_models, "chairman": chairman_model}
+                # Keep the first tier's ballots: their cost belongs to this run
+                decision["stage2"] = stage2_results
+                yield {'type': 'stage1_start'}
+                stage_start = time.monotonic()
+                extra_results = await stage1_collect_responses(user_query, new_members, deadlines.get("stage2"))
+                metrics.observe("stage_latency_seconds", time.monotonic() - stage_start, stage="stage1")
+                # The first tier's answers stay in as extra candidates
+                stage1_results = stage1_results + extra_results
+                message["usage"] = costs.message_usage(message, "stage1", stage1_results)
+                storage.update_assistant_message(
+                    conversation_id, run_id,
+                    stage1=stage1_results, stage2=None, metadata=None,
+                    cascade=decision, council=message["council"], usage=message["usage"]
+                )
+                yield {'type': 'stage1_complete', 'data': stage1_results, 'council_type': council_type}
+                async for event in collect_rankings():
+                    yield event
+
+        # Stage 3: Synthesize final answer (only if we have results)
+        if not stage1_results:
+            stage3_result = {
+                "model": chairman_model,
+                "response": "Error: No models responded successfully. Please check your API key and model availability, or try a different council type."
+            }
+        elif deadlines and too_late(deadlines["stage3"]) and not (speculative_task and speculative_task.done()):
+            # No time left for the chairman: answer with the best Stage 1 response
+            if speculative_task:
+                speculative_task.cancel()
+            degrade("stage3", "skipped", "No time left for the chairman; showing the best Stage 1 answer")
+            stage3_result = best_stage1_answer(stage1_results, metadata['aggregate_rankings'])
+        else:
+            yield {'type': 'stage3_start'}
+            stage_start = time.monotonic()
+            draft = await speculative_task if speculative_task else None
+            if draft is not None:
+                stage3_result = await stage3_finalize_speculative(
+                    user_query,
+                    draft,
+                    metadata['aggregate_rankings'],
+                    metadata['label_to_model'],
+                    chairman_model,
+                    deadlines.get("stage3")
+                )
+                metrics.incr("speculative_chairman", outcome=stage3_result["speculative"])
+            else:
+                if speculative_task:
+                    metrics.incr("speculative_chairman", outcome="draft_failed")
+                stage3_result = await stage3_synthesize_final(
+                    user_query, stage1_results, stage2_results, chairman_model, council_type, deadlines.get("stage3")
+                )
+            metrics.observe("stage_latency_seconds", time.monotonic() - stage_start, stage="stage3")
+            if deadlines and stage3_result['response'].startswith("Error:") and too_late(deadlines["stage3"], 0):
+                degrade("stage3", "timed_out", "The chairman ran out of time; showing the best Stage 1 answer")
+                stage3_result = dict(
+                    best_stage1_answer(stage1_results, metadata['aggregate_rankings']),
+                    usage=stage3_result.get('usage')
+                )
+        message["usage"] = costs.message_usage(message, "stage3", stage3_result)
+        stage3_fields = {}
+        if degradations:
+            stage3_fields["metadata"] = deadline_metadata(metadata)
+        storage.update_assistant_message(
+            conversation_id,
+            run_id,
+            stage3=stage3_result,
+            usage=message["usage"],
+            status=storage.RUN_STATUS_COMPLETE,
+            **stage3_fields
+        )
+        yield {'type': 'stage3_complete', 'data': stage3_result, 'council_type': council_type, **stage3_fields}
+        yield {'type': 'usage', 'data': message["usage"]}
+        if message.get("cascade"):
+            cascade.record_run(message["cascade"], time.monotonic() - run_start, message["usage"]["total"]["cost"])
+        metrics.observe(
+            "run_latency_seconds",
+            time.monotonic() - run_start,
+            speculative=str(speculative_task is not None).lower()
+        )
+
+        # Wait for title generation if it was started
+        if title_task:
+            title = await title_task
+            storage.update_conversation_title(conversation_id, title)
+            yield {'type': 'title_complete', 'data': {'title': title}}
+
+        yield {'type': 'complete', 'run_id': run_id}
+
+    except Exception as e:
+        if speculative_task and not speculative_task.done():
+            speculative_task.cancel()
+        print(f"Error in council run {run_id}: {e}")
+        try:
+            storage.update_assistant_message(
+                conversation_id, run_id, status=storage.RUN_STATUS_FAILED, error=str(e)
+            )
+        except Exception as checkpoint_error:
+            print(f"Error checkpointing failed run {run_id}: {checkpoint_error}")
+        yield {'type': 'error', 'message': str(e), 'run_id': run_id}
+
+
+async def stream_new_run(
+    conversation_id: str,
+    user_query: str,
+    council_type: str,
+    generate_title: bool = False,
+    speculative: bool = False,
+    cache: Optional[bool] = None,
+    deadline_seconds: Optional[float] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Start a new checkpointed council run and stream its events.
+
+    Args:
+        conversation_id: Conversation identifier
+        user_query: The user's question
+        council_type: Type of council to use
+        generate_title: If True, generate a conversation title in parallel
+        speculative: If True, start the chairman on Stage 1 alone in parallel with Stage 2
+        cache: Serve a near-duplicate question's stored answer. If None, uses
+            NEARDUP_CACHE; False always runs the council. Ignored when
+            NEARDUP_CACHE is "off" (nothing is indexed then).
+        deadline_seconds: Total time budget for the run (None: no deadline)
+
+    Yields:
+        Event dicts ('run_started', 'budget_adjusted', 'stage1_start', ...,
+        'complete' or 'error'). If the run can't fit the budget caps, only an
+        'error' event with code 'budget_exceeded' is sent and nothing is stored.
+        If an identical run (same question, council and options) is already in
+        flight, its stages are relayed and stored instead of being run again.
+        A cache hit sends the stored stages and a 'cache_hit' event instead.
+    """
+    run_id = str(uuid.uuid4())
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+
+    cache_mode = NEARDUP_CACHE if cache is not False else "off"
+    if cache_mode != "off":
+        source = _find_cached_run(user_query, council_type)
+        if source is not None:
+            async for event in _serve_cached_run(
+                conversation_id, run_id, user_query, council_type, source,
+                generate_title, refresh=cache_mode == "refresh", deadline_seconds=deadline_seconds
+            ):
+                yield event
+            return
+
+    # Fit the council to the budget before anything is stored or paid for
+    spent = 0.0
+    if BUDGET_MAX_CONVERSATION_COST > 0:
+        conversation = storage.get_conversation(conversation_id)
+        spent = costs.conversation_usage(conversation)["total"]["cost"] if conversation else 0.0
+    try:
+        plan = costs.plan_run(user_query, council_type, spent)
+    except costs.BudgetExceededError as e:
+        print(f"DEBUG: Refusing run in {conversation_id}: {e}")
+        metrics.incr("budget_refused", council_type=council_type)
+        yield {'type': 'error', 'code': 'budget_exceeded', 'message': str(e)}
+        return
+    council_type = plan["council_type"]
+
+    # Add user message and the placeholder the stages are checkpointed into
+    storage.add_user_message(conversation_id, user_query)
+    storage.start_assistant_message(conversation_id, run_id, council_type=council_type)
+    yield {
+        'type': 'run_started',
+        'run_id': run_id,
+        'council_type': council_type,
+        'estimate': plan["estimate"]["total"]
+    }
+
+    message = {
+        "stage1": None,
+        "stage2": None,
+        "stage3": None,
+        "council": {"members": plan["members"], "chairman": plan["chairman"]}
+    }
+    if plan["adjustments"]:
+        budget = {
+            "adjustments": plan["adjustments"],
+            "estimated_cost": plan["estimate"]["total"]["cost"],
+            "limit": plan["limit"]
+        }
+        print(f"DEBUG: Run {run_id} adjusted to fit the budget: {', '.join(plan['adjustments'])}")
+        metrics.incr("budget_adjusted", council_type=council_type)
+        # Store the trimmed council so a resumed run uses the same one
+        storage.update_assistant_message(
+            conversation_id, run_id, council=message["council"], budget=budget
+        )
+        yield {'type': 'budget_adjusted', 'data': budget, 'council_type': council_type}
+
+    # Start title generation in parallel (don't await yet)
+    title_task = None
+    if generate_title:
+        title_task = asyncio.create_task(generate_conversation_title(user_query, deadline))
+
+    def run_stages():
+        return _run_stages(
+            conversation_id, run_id, user_query, council_type, message, title_task, speculative, deadline_seconds
+        )
+
+    if not COALESCE_RUNS:
+        async for event in run_stages():
+            yield event
+        return
+
+    key = flight_key(user_query, council_type, message["council"], speculative, deadline_seconds)
+    events, leader_run_id = _runs.stream(key, run_stages, owner=run_id)
+    if leader_run_id is None:
+        async for event in events:
+            yield event
+        return
+
+    print(f"DEBUG: Run {run_id} joined identical run {leader_run_id}")
+    storage.update_assistant_message(conversation_id, run_id, coalesced_from=leader_run_id)
+    async for event in _follow_run(conversation_id, run_id, events, title_task):
+        yield event
+
+
+def _find_cached_run(user_query: str, council_type: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a completed run of this council for a near-duplicate question.
+
+    Returns:
+        Dict with the 'hit' from neardup.find_similar() and the stored
+        'message', or None (also when the indexed run no longer exists)
+    """
+    try:
+        hit = neardup.find_similar(user_query, council_type)
+    except Exception as e:
+        print(f"Error looking up near-duplicate questions: {e}")
+        return None
+    if hit is None:
+        return None
+    conversation = storage.get_conversation(hit["conversation_id"])
+    messages = conversation["messages"] if conversation else []
+    if hit["message_index"] >= len(messages) or not neardup.cacheable(messages[hit["message_index"]]):
+        return None
+    if messages[hit["message_index"]].get("status", storage.RUN_STATUS_COMPLETE) != storage.RUN_STATUS_COMPLETE:
+        return None
+    return {"hit": hit, "message": messages[hit["message_index"]]}
+
+
+async def _serve_cached_run(
+    conversation_id: str,
+    run_id: str,
+    user_query: str,
+    council_type: str,
+    source: Dict[str, Any],
+    generate_title: bool = False,
+    refresh: bool = False,
+    deadline_seconds: Optional[float] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Answer from a near-duplicate question's stored run.
+
+    The stages are copied into this conversation as a complete run marked
+    `cached_from` (nothing is paid for, so it has no usage and isn't
+    counted in the leaderboard). With `refresh`, the council then re-runs
+    in the background and replaces the copy when it finishes; the re-run
+    gets the request's time budget, like a run of its own.
+    """
+    hit, stored = source["hit"], source["message"]
+    cached_from = {
+        "conversation_id": hit["conversation_id"],
+        "message_index": hit["message_index"],
+        "question": hit["question"],
+        "similarity": hit["similarity"],
+        "refreshing": refresh,
+    }
+    print(f"DEBUG: Run {run_id} served from near-duplicate {hit['conversation_id']}#{hit['message_index']} "
+          f"(similarity {hit['similarity']})")
+
+    title_task = None
+    if generate_title:
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        title_task = asyncio.create_task(generate_conversation_title(user_query, deadline))
+
+    storage.add_user_message(conversation_id, user_query)
+    storage.start_assistant_message(conversation_id, run_id, council_type=council_type)
+    storage.update_assistant_message(
+        conversation_id,
+        run_id,
+        stage1=stored["stage1"],
+        stage2=stored.get("stage2") or [],
+        metadata=stored.get("metadata"),
+        stage3=stored["stage3"],
+        cached_from=cached_from,
+        status=storage.RUN_STATUS_COMPLETE
+    )
+
+    yield {'type': 'run_started', 'run_id': run_id, 'council_type': council_type, 'cached': True}
+    yield {'type': 'cache_hit', 'data': cached_from}
+    yield {'type': 'stage1_complete', 'data': stored["stage1"], 'council_type': council_type}
+    yield {'type': 'stage2_complete', 'data': stored.get("stage2") or [], 'metadata': stored.get("metadata") or {}}
+    yield {'type': 'stage3_complete', 'data': stored["stage3"], 'council_type': council_type}
+
+    if refresh:
+        task = asyncio.create_task(
+            _refresh_cached_run(conversation_id, run_id, user_query, council_type, deadline_seconds)
+        )
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+
+    if title_task:
+        title = await title_task
+        storage.update_conversation_title(conversation_id, title)
+        yield {'type': 'title_complete', 'data': {'title': title}}
+
+    yield {'type': 'complete', 'run_id': run_id}
+
+
+async def _refresh_cached_run(
+    conversation_id: str,
+    run_id: str,
+    user_query: str,
+    council_type: str,
+    deadline_seconds: Optional[float] = None
+):
+    """
+    Re-run the council for an answer served from the cache and store the
+    fresh stages over the copy in one update. The copy is kept if the
+    budget doesn't allow the run, it fails, or it runs out of time.
+    """
+    deadlines: Dict[str, float] = stage_deadlines(deadline_seconds) if deadline_seconds else {}
+    try:
+        conversation = storage.get_conversation(conversation_id)
+        spent = costs.conversation_usage(conversation)["total"]["cost"] if conversation else 0.0
+        plan = costs.plan_run(user_query, council_type, spent)
+        if plan["council_type"] != council_type:
+            raise costs.BudgetExceededError(f"only {plan['council_type']} fits the budget")
+
+        members, chairman = plan["members"], plan["chairman"]
+        message: Dict[str, Any] = {}
+        stage1_results = await stage1_collect_responses(user_query, members, deadlines.get("stage1"))
+        if not stage1_results:
+            raise RuntimeError("No models responded")
+        message["usage"] = costs.message_usage(message, "stage1", stage1_results)
+        stage2_results, label_to_model = await stage2_collect_rankings(
+            user_query, stage1_results, members, deadline=deadlines.get("stage2")
+        )
+        message["usage"] = costs.message_usage(message, "stage2", stage2_results)
+        metadata = {
+            'label_to_model': label_to_model,
+            'aggregate_rankings': calculate_aggregate_rankings(stage2_results, label_to_model),
+            'council_type': council_type
+        }
+        stage3_result = await stage3_synthesize_final(
+            user_query, stage1_results, stage2_results, chairman, council_type, deadlines.get("stage3")
+        )
+        if (stage3_result.get("response") or "").startswith("Error:"):
+            raise RuntimeError(stage3_result["response"])
+        message["usage"] = costs.message_usage(message, "stage3", stage3_result)
+
+        cached = storage.get_run(conversation_id, run_id)
+        storage.update_assistant_message(
+            conversation_id,
+            run_id,
+            stage1=stage1_results,
+            stage2=stage2_results,
+            metadata=metadata,
+            stage3=stage3_result,
+            usage=message["usage"],
+            council={"members": members, "chairman": chairman},
+            cached_from=None,
+            refreshed_from=dict(cached[1].get("cached_from") or {}, refreshing=False) if cached else None,
+            status=storage.RUN_STATUS_COMPLETE
+        )
+        metrics.incr("neardup_refreshes", outcome="ok")
+        print(f"DEBUG: Refreshed cached run {run_id}")
+    except Exception as e:
+        metrics.incr("neardup_refreshes", outcome="failed")
+        print(f"DEBUG: Keeping cached answer for run {run_id}, refresh failed: {e}")
+        try:
+            cached = storage.get_run(conversation_id, run_id)
+            if cached and cached[1].get("cached_from"):
+                storage.update_assistant_message(
+                    conversation_id, run_id, cached_from=dict(cached[1]["cached_from"], refreshing=False)
+                )
+        except Exception as checkpoint_error:
+            print(f"Error checkpointing cached run {run_id}: {checkpoint_error}")
+
+
+async def _follow_run(
+    conversation_id: str,
+    run_id: str,
+    events: AsyncIterator[Dict[str, Any]],
+    title_task: Optional[asyncio.Task] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Relay the events of an identical run and checkpoint them into this one.
+
+    The stages are stored as they arrive, as for a run of our own. The
+    other run's usage and title aren't relayed: it paid for the calls, and
+    this conversation gets its own title.
+    """
+    completed = False
+    try:
+        async for event in events:
+            kind = event['type']
+            if kind == 'stage1_complete':
+                storage.update_assistant_message(conversation_id, run_id, stage1=event['data'])
+            elif kind == 'stage2_complete':
+                storage.update_assistant_message(
+                    conversation_id, run_id, stage2=event['data'], metadata=event['metadata']
+                )
+            elif kind == 'cascade':
+                storage.update_assistant_message(conversation_id, run_id, cascade=event['data'])
+            elif kind == 'stage3_complete':
+                storage.update_assistant_message(
+                    conversation_id, run_id, stage3=event['data'], status=storage.RUN_STATUS_COMPLETE
+                )
+                completed = True
+            elif kind == 'error':
+                raise RuntimeError(event['message'])
+            elif kind in ('usage', 'title_complete', 'complete'):
+                continue
+            yield event
+
+        if not completed:
+            raise RuntimeError("The run this one joined ended early")
+
+        if title_task:
+            title = await title_task
+            storage.update_conversation_title(conversation_id, title)
+            yield {'type': 'title_complete', 'data': {'title': title}}
+
+        yield {'type': 'complete', 'run_id': run_id}
+
+    except Exception as e:
+        print(f"Error in council run {run_id}: {e}")
+        try:
+            storage.update_assistant_message(
+                conversation_id, run_id, status=storage.RUN_STATUS_FAILED, error=str(e)
+            )
+        except Exception as checkpoint_error:
+            print(f"Error checkpointing failed run {run_id}: {checkpoint_error}")
+        yield {'type': 'error', 'message': str(e), 'run_id': run_id}
+
+
+async def stream_resume_run(
+    conversation_id: str,
+    run_id: str,
+    speculative: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Resume an unfinished run from its last completed stage.
+
+    Stored Stage 1 and Stage 2 results are reused rather than re-querying
+    the models.
+
+    Args:
+        conversation_id: Conversation identifier
+        run_id: Run identifier
+        speculative: If True and Stage 2 still has to run, draft Stage 3 in parallel
+
+    Yields:
+        Event dicts, as for stream_new_run()
+
+    Raises:
+        ValueError: If the run doesn't exist or is already complete
+    """
+    run = storage.get_run(conversation_id, run_id)
+    if run is None:
+        raise ValueError(f"Run {run_id} not found in conversation {conversation_id}")
+    user_query, message = run
+    if message.get("status", storage.RUN_STATUS_COMPLETE) == storage.RUN_STATUS_COMPLETE:
+        raise ValueError(f"Run {run_id} is already complete")
+
+    council_type = message.get("council_type") or COUNCIL_TYPE_PREMIUM
+    storage.update_assistant_message(
+        conversation_id, run_id, status=storage.RUN_STATUS_IN_PROGRESS, error=None
+    )
+    yield {'type': 'run_started', 'run_id': run_id, 'council_type': council_type, 'resumed': True}
+
+    async for event in _run_stages(
+        conversation_id, run_id, user_query, council_type, message, speculative=speculative
+    ):
+        yield event
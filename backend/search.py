@@ -0,0 +1,354 @@
+"""Full-text search over conversation history (SQLite FTS5).
+
+The index lives next to the conversation files and is updated
+incrementally by the storage layer whenever a message is saved. FTS5
+can only look rows up by full-text match or rowid, so an ordinary table
+(message_rows) maps each message to its FTS rowids; re-indexing or
+deleting a message deletes by rowid instead of scanning the index. To
+(re)build it from existing conversations, or benchmark updates:
+
+    uv run python -m backend.search --rebuild
+    uv run python -m backend.search --benchmark 100000
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+from .config import SEARCH_INDEX_PATH, SEARCH_INDEX_STAGE1
+
+KIND_USER = "user"
+KIND_STAGE1 = "stage1"
+KIND_STAGE3 = "stage3"
+
+_local = threading.local()
+
+
+def _conn(path: Optional[str] = None) -> sqlite3.Connection:
+    if path is not None:
+        return _open(path)
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _open(SEARCH_INDEX_PATH)
+    return conn
+
+
+def _open(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages USING fts5("
+        "conversation_id UNINDEXED, message_index UNINDEXED, kind UNINDEXED, "
+        "model UNINDEXED, content, tokenize='porter unicode61', prefix='2 3')"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS conversations ("
+        "id TEXT PRIMARY KEY, title TEXT, created_at TEXT)"
+    )
+    has_rows_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_rows'"
+    ).fetchone()
+    if not has_rows_table:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS message_rows ("
+                "fts_rowid INTEGER PRIMARY KEY, conversation_id TEXT NOT NULL, "
+                "message_index INTEGER NOT NULL, kind TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS message_rows_message "
+                "ON message_rows (conversation_id, message_index)"
+            )
+            # Index built before message_rows existed: map its rows once
+            conn.execute(
+                "INSERT OR IGNORE INTO message_rows (fts_rowid, conversation_id, message_index, kind) "
+                "SELECT rowid, conversation_id, CAST(message_index AS INTEGER), kind FROM messages"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return conn
+
+
+def _assistant_rows(
+    conversation_id: str,
+    message_index: int,
+    message: Dict[str, Any]
+) -> List[tuple]:
+    rows = []
+    stage3 = message.get("stage3") or {}
+    if stage3.get("response"):
+        rows.append((conversation_id, message_index, KIND_STAGE3, stage3.get("model"), stage3["response"]))
+    if SEARCH_INDEX_STAGE1:
+        for result in message.get("stage1") or []:
+            if result.get("response"):
+                rows.append((conversation_id, message_index, KIND_STAGE1, result.get("model"), result["response"]))
+    return rows
+
+
+def _insert_rows(conn: sqlite3.Connection, rows: List[tuple]):
+    for conversation_id, message_index, kind, model, content in rows:
+        rowid = conn.execute(
+            "INSERT INTO messages (conversation_id, message_index, kind, model, content) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (conversation_id, message_index, kind, model, content)
+        ).lastrowid
+        conn.execute(
+            "INSERT INTO message_rows (fts_rowid, conversation_id, message_index, kind) VALUES (?, ?, ?, ?)",
+            (rowid, conversation_id, message_index, kind)
+        )
+
+
+def _delete_rows(conn: sqlite3.Connection, where: str, params: tuple):
+    """Delete the FTS rows whose message_rows entries match `where`, by rowid."""
+    rowids = [(rowid,) for rowid, in conn.execute(f"SELECT fts_rowid FROM message_rows WHERE {where}", params)]
+    conn.executemany("DELETE FROM messages WHERE rowid = ?", rowids)
+    conn.executemany("DELETE FROM message_rows WHERE fts_rowid = ?", rowids)
+
+
+def index_conversation_meta(conversation_id: str, title: str, created_at: Optional[str] = None):
+    """Record (or update) a conversation's title for search results."""
+    _conn().execute(
+        "INSERT INTO conversations (id, title, created_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET title = excluded.title, "
+        "created_at = COALESCE(excluded.created_at, conversations.created_at)",
+        (conversation_id, title, created_at)
+    )
+
+
+def _transaction(conn: sqlite3.Connection, update, *args):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        update(conn, *args)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _index_user(conn: sqlite3.Connection, conversation_id: str, message_index: int, content: str):
+    _insert_rows(conn, [(conversation_id, message_index, KIND_USER, None, content)])
+
+
+def _index_assistant(conn: sqlite3.Connection, conversation_id: str, message_index: int, message: Dict[str, Any]):
+    # Re-indexing a message (e.g. a resumed run) replaces its old rows
+    _delete_rows(
+        conn, "conversation_id = ? AND message_index = ? AND kind != ?",
+        (conversation_id, message_index, KIND_USER)
+    )
+    _insert_rows(conn, _assistant_rows(conversation_id, message_index, message))
+
+
+def _remove(conn: sqlite3.Connection, conversation_id: str):
+    _delete_rows(conn, "conversation_id = ?", (conversation_id,))
+    conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+
+def index_user_message(conversation_id: str, message_index: int, content: str):
+    """Index a user question."""
+    _transaction(_conn(), _index_user, conversation_id, message_index, content)
+
+
+def index_assistant_message(conversation_id: str, message_index: int, message: Dict[str, Any]):
+    """
+    Index a completed assistant message (Stage 3, and Stage 1 if enabled).
+
+    Args:
+        conversation_id: Conversation identifier
+        message_index: Position of the message in the conversation
+        message: Assistant message dict with stage results
+    """
+    _transaction(_conn(), _index_assistant, conversation_id, message_index, message)
+
+
+def remove_conversation(conversation_id: str):
+    """Drop a conversation from the index."""
+    _transaction(_conn(), _remove, conversation_id)
+
+
+def _fts_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word must match, the last
+    one as a prefix (so results appear while typing).
+    """
+    terms = [t for t in query.split() if t.strip('"')]
+    if not terms:
+        return ""
+    quoted = ['"' + t.replace('"', '""') + '"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    kinds: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Search conversation history.
+
+    Args:
+        query: Free-text query
+        limit: Maximum number of results
+        offset: Number of results to skip (for paging)
+        kinds: Restrict to these message kinds ("user", "stage1", "stage3")
+
+    Returns:
+        List of matches (best first) with conversation id/title, message
+        index, kind, model and a highlighted snippet
+    """
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return []
+
+    sql = (
+        "SELECT m.conversation_id, c.title, m.message_index, m.kind, m.model, "
+        "snippet(messages, 4, '<mark>', '</mark>', '…', 16) "
+        "FROM messages m LEFT JOIN conversations c ON c.id = m.conversation_id "
+        "WHERE messages MATCH ?"
+    )
+    params: List[Any] = [fts_query]
+    if kinds:
+        sql += f" AND m.kind IN ({','.join('?' * len(kinds))})"
+        params.extend(kinds)
+    sql += " ORDER BY bm25(messages) LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
+
+    rows = _conn().execute(sql, params).fetchall()
+    return [
+        {
+            "conversation_id": conversation_id,
+            "title": title,
+            "message_index": int(message_index),
+            "kind": kind,
+            "model": model,
+            "snippet": snippet,
+        }
+        for conversation_id, title, message_index, kind, model, snippet in rows
+    ]
+
+
+def rebuild_index() -> int:
+    """
+    Rebuild the whole index from the stored conversations.
+
+    Returns:
+        Number of conversations indexed
+    """
+    from . import storage
+
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM messages")
+        conn.execute("DELETE FROM message_rows")
+        conn.execute("DELETE FROM conversations")
+        count = 0
+        for conversation in storage.iter_conversations():
+            conversation_id = conversation["id"]
+            conn.execute(
+                "INSERT INTO conversations (id, title, created_at) VALUES (?, ?, ?)",
+                (conversation_id, conversation.get("title"), conversation.get("created_at"))
+            )
+            rows = []
+            for index, message in enumerate(conversation["messages"]):
+                if message["role"] == "user":
+                    rows.append((conversation_id, index, KIND_USER, None, message["content"]))
+                else:
+                    rows.extend(_assistant_rows(conversation_id, index, message))
+            _insert_rows(conn, rows)
+            count += 1
+        conn.execute("INSERT INTO messages (messages) VALUES ('optimize')")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return count
+
+
+def benchmark(conversations: int = 25000, updates: int = 200, seed: int = 0):
+    """
+    Time index updates over a scratch index of synthetic conversations.
+
+    Each conversation has two exchanges (four rows, so 100000 rows for the
+    default 25000 conversations).
+    """
+    import random
+    import tempfile
+
+    rng = random.Random(seed)
+    vocabulary = [f"{rng.choice('bcdfghklmnprstvz')}{rng.choice('aeiou')}{rng.choice('bcdfghklmnprstvz')}{i}" for i in range(5000)]
+
+    def text(words: int) -> str:
+        return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+    def assistant() -> Dict[str, Any]:
+        return {"stage1": [], "stage3": {"model": "m", "response": text(rng.randint(40, 120))}}
+
+    def report(label: str, timings: List[float]):
+        timings.sort()
+        print(
+            f"  {label:<22} p50 {timings[len(timings) // 2] * 1000:.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms"
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _conn(os.path.join(tmp, "search.db"))
+        start = time.perf_counter()
+        conn.execute("BEGIN")
+        for i in range(conversations):
+            for exchange in range(2):
+                _index_user(conn, f"c{i}", exchange * 2, text(rng.randint(5, 15)))
+                _index_assistant(conn, f"c{i}", exchange * 2 + 1, assistant())
+        conn.execute("COMMIT")
+        elapsed = time.perf_counter() - start
+        rows = conn.execute("SELECT COUNT(*) FROM message_rows").fetchone()[0]
+        print(f"Indexed {rows} rows in {elapsed:.1f}s")
+
+        for label, update in (
+            ("user message insert", lambda i: _transaction(conn, _index_user, f"c{i}", 4, text(10))),
+            ("Stage 3 re-index", lambda i: _transaction(conn, _index_assistant, f"c{i}", 3, assistant())),
+            ("conversation delete", lambda i: _transaction(conn, _remove, f"c{i}")),
+        ):
+            timings = []
+            for i in rng.sample(range(conversations), updates):
+                start = time.perf_counter()
+                update(i)
+                timings.append(time.perf_counter() - start)
+            report(label, timings)
+
+        timings = []
+        for _ in range(updates):
+            start = time.perf_counter()
+            conn.execute(
+                "SELECT rowid FROM messages WHERE messages MATCH ? ORDER BY bm25(messages) LIMIT 20",
+                (_fts_query(text(2)),)
+            ).fetchall()
+            timings.append(time.perf_counter() - start)
+        report("search", timings)
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the conversation search index")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index from stored conversations")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Benchmark index updates over N synthetic conversations (4 rows each)")
+    parser.add_argument("query", nargs="*", help="Search query to run")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"Indexed {rebuild_index()} conversations into {SEARCH_INDEX_PATH}")
+    if args.benchmark:
+        benchmark(args.benchmark)
+    if args.query:
+        print(json.dumps(search(" ".join(args.query)), indent=2, ensure_ascii=False))
@@ -0,0 +1,263 @@
+"""Shared state backends for counters, caches and rate limits.
+
+When the app runs with several worker processes, anything that must be
+consistent across workers (metrics, rate limits, caches) goes through the
+shared state backend instead of module globals:
+
+- "local": in-process dicts. Default for a single worker and for tests.
+- "sqlite": a SQLite database under STATE_DIR, safe across processes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from .config import SHARED_STATE_BACKEND, SHARED_STATE_PATH
+
+
+class LocalSharedState:
+    """In-process stand-in for the shared state backend."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Any] = {}
+        self._expiry: Dict[str, float] = {}
+        self._samples: Dict[str, List[float]] = {}
+
+    def _expired(self, key: str, now: float) -> bool:
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and expires_at <= now:
+            self._values.pop(key, None)
+            self._expiry.pop(key, None)
+            return True
+        return False
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if self._expired(key, time.time()):
+                return None
+            return self._values.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._values[key] = value
+            if ttl is not None:
+                self._expiry[key] = time.time() + ttl
+            else:
+                self._expiry.pop(key, None)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        with self._lock:
+            now = time.time()
+            self._expired(key, now)
+            if key not in self._values and ttl is not None:
+                self._expiry[key] = now + ttl
+            value = self._values.get(key, 0) + amount
+            self._values[key] = value
+            return value
+
+    def incr_many(self, amounts: Dict[str, float]):
+        for key, amount in amounts.items():
+            self.incr(key, amount)
+
+    def items(self, prefix: str) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            return {
+                key: value for key, value in list(self._values.items())
+                if key.startswith(prefix) and not self._expired(key, now)
+            }
+
+    def add_sample(self, name: str, value: float, max_samples: int = 1000):
+        with self._lock:
+            samples = self._samples.setdefault(name, [])
+            samples.append(value)
+            if len(samples) > max_samples:
+                del samples[:len(samples) - max_samples]
+
+    def add_samples(self, samples: List[Tuple[str, float]], max_samples: int = 1000):
+        for name, value in samples:
+            self.add_sample(name, value, max_samples)
+
+    def samples(self, prefix: str) -> Dict[str, List[float]]:
+        with self._lock:
+            return {
+                name: list(values) for name, values in self._samples.items()
+                if name.startswith(prefix)
+            }
+
+
+class SQLiteSharedState:
+    """Shared state backend stored in SQLite, safe across worker processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS samples ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, value REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS samples_name ON samples (name, id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires_at)
+        )
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        conn = self._conn()
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, now))
+            conn.execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, '0', ?) "
+                "ON CONFLICT(key) DO NOTHING",
+                (key, expires_at)
+            )
+            conn.execute(
+                "UPDATE kv SET value = value + ? WHERE key = ?",
+                (amount, key)
+            )
+            value = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return json.loads(value)
+
+    def incr_many(self, amounts: Dict[str, float]):
+        """Add to several counters (without expiry) in one transaction."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, NULL) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                [(key, json.dumps(amount)) for key, amount in amounts.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def items(self, prefix: str) -> Dict[str, Any]:
+        rows = self._conn().execute(
+            "SELECT key, value FROM kv WHERE key >= ? AND key < ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\uffff", time.time())
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def add_sample(self, name: str, value: float, max_samples: int = 1000):
+        conn = self._conn()
+        cursor = conn.execute("INSERT INTO samples (name, value) VALUES (?, ?)", (name, value))
+        # Trim occasionally rather than on every insert
+        if cursor.lastrowid % 100 == 0:
+            conn.execute(
+                "DELETE FROM samples WHERE name = ? AND id <= ("
+                "SELECT id FROM samples WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (name, name, max_samples)
+            )
+
+    def add_samples(self, samples: List[Tuple[str, float]], max_samples: int = 1000):
+        """Record several samples in one transaction, trimming each name to max_samples."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT INTO samples (name, value) VALUES (?, ?)", samples)
+            for name in {name for name, _ in samples}:
+                conn.execute(
+                    "DELETE FROM samples WHERE name = ? AND id <= ("
+                    "SELECT id FROM samples WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (name, name, max_samples)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def samples(self, prefix: str, max_samples: int = 1000) -> Dict[str, List[float]]:
+        rows = self._conn().execute(
+            "SELECT name, value FROM samples WHERE name >= ? AND name < ? ORDER BY id",
+            (prefix, prefix + "\uffff")
+        ).fetchall()
+        result: Dict[str, List[float]] = {}
+        for name, value in rows:
+            result.setdefault(name, []).append(value)
+        return {name: values[-max_samples:] for name, values in result.items()}
+
+
+_state = None
+
+
+def get_shared_state():
+    """Get the configured shared state backend (created on first use)."""
+    global _state
+    if _state is None:
+        if SHARED_STATE_BACKEND == "sqlite":
+            _state = SQLiteSharedState(SHARED_STATE_PATH)
+        else:
+            _state = LocalSharedState()
+    return _state
+
+
+def set_shared_state(state):
+    """Replace the shared state backend (e.g. with LocalSharedState in tests)."""
+    global _state
+    _state = state
+
+
+def rate_limit_exceeded(key: str, limit: int, window: float = 60.0) -> bool:
+    """
+    Fixed-window rate limit check shared across workers.
+
+    Args:
+        key: Identity being limited (e.g. client address)
+        limit: Maximum requests per window (0 disables the limit)
+        window: Window length in seconds
+
+    Returns:
+        True if this request exceeds the limit
+    """
+    if limit <= 0:
+        return False
+    bucket = int(time.time() // window)
+    count = get_shared_state().incr(f"ratelimit:{key}:{bucket}", 1, ttl=window)
+    return count > limit
@@ -0,0 +1,133 @@
+"""Single-flight coalescing of identical concurrent work.
+
+When a call (or a streamed council run) is already in flight under the
+same key, later callers attach to it instead of starting their own: a call
+returns the same result, a stream replays the events sent so far and then
+follows the live ones. The work is cancelled only when every caller has
+gone away. Coalescing is per worker process.
+
+Hits are counted in the `singleflight_hits{layer}` counter.
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+
+
+def flight_key(*parts: Any) -> str:
+    """Stable key for a call from its JSON-serializable arguments."""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class _Flight:
+    """One in-flight call or stream and the callers attached to it."""
+
+    def __init__(self, owner: Optional[str]):
+        self.owner = owner
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.events: List[Any] = []
+        self.done = False
+        self.changed = asyncio.Event()
+
+    def release(self):
+        """Detach a caller; cancel the work if it was the last one."""
+        self.waiters -= 1
+        if self.waiters == 0 and self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls and streams with the same key."""
+
+    def __init__(self, layer: str):
+        self.layer = layer
+        self._flights: Dict[str, _Flight] = {}
+
+    def _start(self, key: str, owner: Optional[str], work: Callable[[_Flight], Awaitable]) -> _Flight:
+        flight = _Flight(owner)
+        flight.task = asyncio.ensure_future(work(flight))
+        self._flights[key] = flight
+
+        def finished(task: asyncio.Task):
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if not task.cancelled() and task.exception() is not None:
+                print(f"DEBUG: {self.layer} flight failed: {task.exception()}")
+
+        flight.task.add_done_callback(finished)
+        return flight
+
+    async def call(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn(), or wait for the identical call already in flight.
+
+        Returns:
+            Tuple of (result, True if it came from another caller's call)
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if shared:
+            metrics.incr("singleflight_hits", layer=self.layer)
+        else:
+            flight = self._start(key, None, lambda _: fn())
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.release()
+
+    def stream(
+        self,
+        key: str,
+        events: Callable[[], AsyncIterator[Any]],
+        owner: Optional[str] = None
+    ) -> Tuple[AsyncIterator[Any], Optional[str]]:
+        """
+        Iterate events(), or follow the identical stream already in flight.
+
+        Args:
+            key: Flight key
+            events: Starts the stream if nothing is in flight
+            owner: Identifies the caller that starts the stream (e.g. its run ID)
+
+        Returns:
+            Tuple of (event iterator, owner of the stream joined, or None if
+            this caller started it)
+        """
+        async def produce(flight: _Flight):
+            try:
+                async for event in events():
+                    flight.events.append(event)
+                    flight.changed.set()
+            finally:
+                flight.done = True
+                flight.changed.set()
+
+        flight = self._flights.get(key)
+        joined = flight.owner if flight is not None else None
+        if flight is not None:
+            metrics.incr("singleflight_hits", layer=self.layer)
+        else:
+            flight = self._start(key, owner, produce)
+        flight.waiters += 1
+        return self._follow(flight), joined
+
+    async def _follow(self, flight: _Flight) -> AsyncIterator[Any]:
+        index = 0
+        try:
+            while True:
+                if index < len(flight.events):
+                    index += 1
+                    yield flight.events[index - 1]
+                    continue
+                if flight.done:
+                    break
+                flight.changed.clear()
+                await flight.changed.wait()
+        finally:
+            flight.release()
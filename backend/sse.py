@@ -0,0 +1,154 @@
+"""Server-Sent Events transport for council runs.
+
+Each event is serialized once (with orjson when it is installed) and sent
+as `id: <n>` + `data: <json>`, with IDs counting up from 1 per stream.
+While a stage is running and no event is due, a `: keep-alive` comment is
+sent every SSE_HEARTBEAT_SECONDS. If the client accepts gzip, the stream is
+gzip-compressed and flushed after every event, so events still arrive as
+soon as they are produced.
+
+The run is produced in a separate task into a bounded queue: a slow client
+makes the run wait once SSE_QUEUE_SIZE events are pending, instead of
+buffering without limit. If the client disconnects, the run is cancelled
+(it stays resumable from its last checkpoint).
+"""
+
+import asyncio
+import json
+import zlib
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+from .config import SSE_HEARTBEAT_SECONDS, SSE_COMPRESSION, SSE_QUEUE_SIZE
+from . import metrics
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library encoder
+    orjson = None
+
+HEARTBEAT = b": keep-alive\n\n"
+
+# Sentinel put on the queue when the producer is done
+_END = object()
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a JSON value to UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode_event(event_id: int, event: Dict[str, Any]) -> bytes:
+    """Frame one event as an SSE message with an ID."""
+    return b"id: %d\ndata: %s\n\n" % (event_id, dumps(event))
+
+
+class _Gzip:
+    """Streaming gzip encoder that flushes after every chunk."""
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+async def _produce(events: AsyncIterator[Dict[str, Any]], queue: asyncio.Queue):
+    """Serialize events into the queue; put blocks while the queue is full."""
+    event_id = 0
+    try:
+        async for event in events:
+            event_id += 1
+            await queue.put(encode_event(event_id, event))
+    except Exception as e:
+        # Send error event
+        event_id += 1
+        await queue.put(encode_event(event_id, {'type': 'error', 'message': str(e)}))
+    await queue.put(_END)
+
+
+async def stream_events(
+    events: AsyncIterator[Dict[str, Any]],
+    compress: bool = False,
+    heartbeat: Optional[float] = None
+) -> AsyncIterator[bytes]:
+    """
+    Encode an async iterator of event dicts as an SSE byte stream.
+
+    Args:
+        events: Event dicts (e.g. from runner.stream_new_run())
+        compress: gzip the stream
+        heartbeat: Seconds of silence before a keep-alive comment. If None,
+            uses SSE_HEARTBEAT_SECONDS; 0 disables heartbeats.
+
+    Yields:
+        Chunks to send to the client
+    """
+    if heartbeat is None:
+        heartbeat = SSE_HEARTBEAT_SECONDS
+    gzip = _Gzip() if compress else None
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(SSE_QUEUE_SIZE, 1))
+    producer = asyncio.create_task(_produce(events, queue))
+    raw_bytes = sent_bytes = 0
+
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(queue.get(), heartbeat or None)
+            except asyncio.TimeoutError:
+                chunk = HEARTBEAT
+                metrics.incr("sse_heartbeats")
+            if chunk is _END:
+                break
+            raw_bytes += len(chunk)
+            if gzip is not None:
+                chunk = gzip.encode(chunk)
+            sent_bytes += len(chunk)
+            yield chunk
+        if gzip is not None:
+            yield gzip.finish()
+    finally:
+        if not producer.done():
+            # Client went away: stop the run (it can be resumed later)
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
+        metrics.incr("sse_bytes", raw_bytes, encoding="raw")
+        metrics.incr("sse_bytes", sent_bytes, encoding="gzip" if gzip else "identity")
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]], accept_encoding: str = "") -> StreamingResponse:
+    """
+    Wrap an async iterator of event dicts in a Server-Sent Events response.
+
+    Args:
+        events: Event dicts
+        accept_encoding: The request's Accept-Encoding header
+
+    Returns:
+        Streaming response, gzip-encoded if SSE_COMPRESSION is on and the
+        client accepts gzip
+    """
+    compress = SSE_COMPRESSION and "gzip" in accept_encoding.lower()
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        # Stop nginx from buffering the stream
+        "X-Accel-Buffering": "no",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(
+        stream_events(events, compress),
+        media_type="text/event-stream",
+        headers=headers
+    )
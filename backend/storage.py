@@ -1,21 +1,262 @@
-"""JSON-based storage for conversations."""
+"""JSON-based storage for conversations.
 
+Each conversation is a JSON file in DATA_DIR, in a shard directory named
+after the first characters of a hash of its ID (DATA_DIR/3f/<id>.json), which
+keeps directories 256 times smaller. Conversations stored by older
+versions directly in DATA_DIR are moved into their shard on first use.
+Conversations untouched for ARCHIVE_AFTER_DAYS are moved into packed
+archive files (see archive.py); every function here reads them from there
+transparently, and saving one moves it back to DATA_DIR. The list metadata
+of the conversations in DATA_DIR is kept in an index (see catalog.py), so
+listing them opens no conversation file.
+"""
+
+import atexit
+import hashlib
 import json
 import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from pathlib import Path
-from .config import DATA_DIR, COUNCIL_TYPE_PREMIUM
+from .config import DATA_DIR, COUNCIL_TYPE_PREMIUM, ARCHIVE_AFTER_DAYS
+from . import archive
+from . import catalog
+from . import search
+from . import leaderboard
+from . import costs
+from . import neardup
+
+# Status of an assistant message produced by a checkpointed council run
+RUN_STATUS_IN_PROGRESS = "in_progress"
+RUN_STATUS_COMPLETE = "complete"
+RUN_STATUS_FAILED = "failed"
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, single worker only
+    fcntl = None
+
+
+# Hex digits of the ID's hash naming its shard directory (256 shards)
+SHARD_WIDTH = 2
+
+# Extensions of a conversation's files in its directory
+CONVERSATION_FILE_SUFFIXES = (".json", ".offsets", ".lock")
+
+_migrated = False
 
 
 def ensure_data_dir():
-    """Ensure the data directory exists."""
+    """Ensure the data directory exists, and move conversations from the flat layout into shards."""
     Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
+    if not _migrated:
+        migrate_flat_layout()
+
+
+def get_shard_dir(conversation_id: str) -> str:
+    """Get the shard directory holding a conversation's files."""
+    shard = hashlib.sha1(conversation_id.encode()).hexdigest()[:SHARD_WIDTH]
+    return os.path.join(DATA_DIR, shard)
 
 
 def get_conversation_path(conversation_id: str) -> str:
     """Get the file path for a conversation."""
-    return os.path.join(DATA_DIR, f"{conversation_id}.json")
+    if not _migrated:
+        ensure_data_dir()
+    return os.path.join(get_shard_dir(conversation_id), f"{conversation_id}.json")
+
+
+def get_offsets_path(conversation_id: str) -> str:
+    """Get the path of a conversation's message offsets file (see get_messages_page())."""
+    return os.path.join(get_shard_dir(conversation_id), f"{conversation_id}.offsets")
+
+
+def get_lock_path(conversation_id: str) -> str:
+    """Get the lock file path for a conversation."""
+    return os.path.join(get_shard_dir(conversation_id), f"{conversation_id}.lock")
+
+
+def migrate_flat_layout() -> int:
+    """
+    Move conversations stored directly in DATA_DIR into their shard directories.
+
+    Files are renamed, so their offsets files stay valid. Safe to run in
+    several workers at once; runs once per process from ensure_data_dir().
+
+    Returns:
+        Number of conversations moved
+    """
+    global _migrated
+    _migrated = True
+    if not os.path.isdir(DATA_DIR):
+        return 0
+    moved = 0
+    with os.scandir(DATA_DIR) as scan:
+        names = [entry.name for entry in scan if entry.is_file() and not entry.name.startswith('.tmp-')]
+    for name in names:
+        conversation_id, suffix = os.path.splitext(name)
+        if suffix not in CONVERSATION_FILE_SUFFIXES:
+            continue
+        legacy_path = os.path.join(DATA_DIR, name)
+        if suffix == ".lock":
+            # Nobody locks the flat path any more
+            try:
+                os.remove(legacy_path)
+            except FileNotFoundError:
+                pass
+            continue
+        target = os.path.join(get_shard_dir(conversation_id), name)
+        if os.path.exists(target):
+            print(f"Not migrating {legacy_path}: {target} already exists")
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.rename(legacy_path, target)
+        except FileNotFoundError:
+            # Moved by another worker
+            continue
+        if suffix == ".json":
+            moved += 1
+    if moved:
+        print(f"Moved {moved} conversations into shard directories")
+    return moved
+
+
+@contextmanager
+def conversation_lock(conversation_id: str):
+    """
+    Hold an exclusive cross-process lock on a conversation.
+
+    Used around read-modify-write operations so that concurrent workers
+    can't lose each other's updates. Lock files are removed when a
+    conversation is deleted or archived, so a lock taken on a file that
+    has since been removed is retaken on the new one.
+    """
+    path = get_lock_path(conversation_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        lock_file = open(path, 'a')
+        if fcntl is None:
+            break
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+    try:
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write to a temp file and rename it over the target, so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Offsets file: header (conversation file size, mtime_ns and inode, message
+# count, length of the object before "messages", version), then (start, end)
+# byte offsets per message. Every save writes a new file (new inode), so a
+# stale offsets file is always detected.
+_OFFSETS_HEADER = struct.Struct("<QQQQQQ")
+_OFFSETS_ENTRY = struct.Struct("<QQ")
+
+
+def _serialize_conversation(conversation: Dict[str, Any]) -> Tuple[bytes, int, List[Tuple[int, int]]]:
+    """
+    Serialize a conversation as indented JSON with "messages" last.
+
+    Returns:
+        Tuple of (file contents, length of the object before "messages",
+        (start, end) byte offsets of each message)
+    """
+    head = json.dumps({key: value for key, value in conversation.items() if key != "messages"}, indent=2)
+    head_len = len(head) - 2  # without the closing "\n}"
+    parts = [head[:head_len], ',\n  "messages": [']
+    position = head_len + len(parts[1])
+    offsets = []
+    for index, message in enumerate(conversation.get("messages", [])):
+        separator = "\n    " if index == 0 else ",\n    "
+        body = json.dumps(message, indent=2).replace("\n", "\n    ")
+        start = position + len(separator)
+        offsets.append((start, start + len(body)))
+        parts += [separator, body]
+        position = start + len(body)
+    parts.append("\n  ]\n}" if offsets else "]\n}")
+    # json.dumps escapes non-ASCII, so character offsets are byte offsets
+    return "".join(parts).encode("ascii"), head_len, offsets
+
+
+def _write_offsets(conversation_id: str, head_len: int, offsets: List[Tuple[int, int]], version: int):
+    """Write the offsets file of a conversation file that was just written."""
+    stat = os.stat(get_conversation_path(conversation_id))
+    _write_atomic(
+        get_offsets_path(conversation_id),
+        _OFFSETS_HEADER.pack(stat.st_size, stat.st_mtime_ns, stat.st_ino, len(offsets), head_len, version)
+        + b"".join(_OFFSETS_ENTRY.pack(start, end) for start, end in offsets)
+    )
+
+
+def _update_index(update, *args):
+    """Apply a search index, leaderboard or usage update; problems there never fail a write."""
+    try:
+        update(*args)
+    except Exception as e:
+        print(f"Error updating {update.__module__.rsplit('.', 1)[-1]} index: {e}")
+
+
+# Search, leaderboard, usage and near-duplicate index updates are applied
+# in order by a background thread, so their SQLite transactions neither
+# hold a conversation's lock nor block the event loop
+_index_queue: "queue.Queue" = queue.Queue()
+_index_thread: Optional[threading.Thread] = None
+_index_thread_lock = threading.Lock()
+
+
+def _index_worker():
+    while True:
+        update, args = _index_queue.get()
+        try:
+            _update_index(update, *args)
+        finally:
+            _index_queue.task_done()
+
+
+def _queue_index_update(update, *args):
+    """Queue an index update for the background thread (see _update_index())."""
+    global _index_thread
+    with _index_thread_lock:
+        if _index_thread is None or not _index_thread.is_alive():
+            _index_thread = threading.Thread(target=_index_worker, name="storage-index", daemon=True)
+            _index_thread.start()
+    _index_queue.put((update, args))
+
+
+@atexit.register
+def flush_index_updates():
+    """Wait until every queued index update is applied (command-line tools, shutdown)."""
+    if _index_thread is not None:
+        _index_queue.join()
 
 
 def create_conversation(conversation_id: str, council_type: str = COUNCIL_TYPE_PREMIUM) -> Dict[str, Any]:
@@ -40,9 +281,10 @@ def create_conversation(conversation_id: str, council_type: str = COUNCIL_TYPE_P
     }
 
     # Save to file
-    path = get_conversation_path(conversation_id)
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    save_conversation(conversation)
+    _queue_index_update(
+        search.index_conversation_meta, conversation_id, conversation["title"], conversation["created_at"]
+    )
 
     return conversation
 
@@ -57,13 +299,20 @@ def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Conversation dict or None if not found
     """
-    path = get_conversation_path(conversation_id)
-
-    if not os.path.exists(path):
+    try:
+        with open(get_conversation_path(conversation_id), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    entry = archive.lookup(conversation_id)
+    if entry is None:
         return None
+    return json.loads(archive.read_ranges(entry, [(0, entry.length)])[0])
+
 
-    with open(path, 'r') as f:
-        return json.load(f)
+def conversation_exists(conversation_id: str) -> bool:
+    """Whether a conversation is stored (in DATA_DIR or in the archive)."""
+    return os.path.exists(get_conversation_path(conversation_id)) or archive.lookup(conversation_id) is not None
 
 
 def save_conversation(conversation: Dict[str, Any]):
@@ -75,41 +324,419 @@ def save_conversation(conversation: Dict[str, Any]):
     """
     ensure_data_dir()
 
+    # Bumped on every write; served as the ETag of the conversation
+    conversation["version"] = conversation.get("version", 0) + 1
     path = get_conversation_path(conversation['id'])
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data, head_len, offsets = _serialize_conversation(conversation)
+    _write_atomic(path, data)
+    # Byte offsets of each message, so pages can be read without parsing the rest
+    _write_offsets(conversation['id'], head_len, offsets, conversation["version"])
+    # An archived conversation that is written to lives in DATA_DIR again
+    _update_index(archive.remove, conversation['id'])
+    # Also bumps the list version (see get_list_version())
+    _update_index(
+        catalog.upsert,
+        conversation['id'],
+        {key: value for key, value in conversation.items() if key != "messages"},
+        len(offsets)
+    )
+
+
+def _rebuild_offsets(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Write the missing or out of date offsets file of a conversation,
+    without changing its version. A file written in another layout (by
+    older versions) is rewritten in the current one first.
+
+    Must be called under conversation_lock().
+
+    Returns:
+        The conversation, or None if it isn't in DATA_DIR
+    """
+    path = get_conversation_path(conversation_id)
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    conversation = json.loads(raw)
+    data, head_len, offsets = _serialize_conversation(conversation)
+    if data != raw:
+        _write_atomic(path, data)
+    _write_offsets(conversation_id, head_len, offsets, conversation.get("version", 0))
+    return conversation
+
+
+def _read_offsets_header(offsets_file, stat: os.stat_result) -> Optional[Tuple[int, int, int]]:
+    """
+    Read an offsets file's header and check it against the conversation file.
+
+    Returns:
+        Tuple of (message count, head length, version), or None if the
+        offsets file is out of date
+    """
+    header = offsets_file.read(_OFFSETS_HEADER.size)
+    if len(header) != _OFFSETS_HEADER.size:
+        return None
+    size, mtime_ns, inode, count, head_len, version = _OFFSETS_HEADER.unpack(header)
+    if (stat.st_size, stat.st_mtime_ns, stat.st_ino) != (size, mtime_ns, inode):
+        return None
+    if os.fstat(offsets_file.fileno()).st_size != _OFFSETS_HEADER.size + count * _OFFSETS_ENTRY.size:
+        return None
+    return count, head_len, version
+
+
+def _read_head(conversation_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+    """Read a conversation's fields other than messages, and its message count, without parsing the messages."""
+    try:
+        with open(get_offsets_path(conversation_id), 'rb') as offsets_file, \
+                open(get_conversation_path(conversation_id), 'rb') as f:
+            header = _read_offsets_header(offsets_file, os.fstat(f.fileno()))
+            if header is not None:
+                count, head_len, _ = header
+                return json.loads(f.read(head_len) + b"\n}"), count
+    except FileNotFoundError:
+        pass
+    conversation = get_conversation(conversation_id)
+    if conversation is None:
+        return None
+    messages = conversation.pop("messages")
+    return conversation, len(messages)
+
+
+def get_conversation_version(conversation_id: str) -> Optional[Tuple[int, int]]:
+    """
+    A conversation's version and modification time, for conditional requests.
+
+    Only the offsets file header (or the archive index) is read; the
+    conversation itself is parsed only if that is missing or out of date.
+
+    Returns:
+        Tuple of (version, mtime in nanoseconds), or None if not found
+    """
+    try:
+        stat = os.stat(get_conversation_path(conversation_id))
+    except FileNotFoundError:
+        entry = archive.lookup(conversation_id)
+        return (entry.version, entry.mtime_ns) if entry is not None else None
+    try:
+        with open(get_offsets_path(conversation_id), 'rb') as offsets_file:
+            header = _read_offsets_header(offsets_file, stat)
+        if header is not None:
+            return header[2], stat.st_mtime_ns
+    except FileNotFoundError:
+        pass
+    conversation = get_conversation(conversation_id)
+    if conversation is None:
+        return None
+    return conversation.get("version", 0), stat.st_mtime_ns
+
+
+def _shard_dirs() -> List[os.DirEntry]:
+    """List the shard directories."""
+    ensure_data_dir()
+    with os.scandir(DATA_DIR) as scan:
+        return [entry for entry in scan if len(entry.name) == SHARD_WIDTH and entry.is_dir()]
+
+
+def _scan_conversation_files() -> Iterator[os.DirEntry]:
+    """Iterate over the conversation files in every shard directory."""
+    for shard_dir in _shard_dirs():
+        try:
+            with os.scandir(shard_dir.path) as scan:
+                for entry in scan:
+                    if entry.name.endswith('.json') and not entry.name.startswith('.tmp-'):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def get_list_version() -> Tuple[str, int]:
+    """
+    Version of the conversation list, for conditional requests.
+
+    Derived from the generations of the list index (bumped by every save,
+    delete and compaction) and of the archive index. Both are SQLite files
+    shared by every worker process, so a change made by one worker changes
+    the version seen by all of them; no conversation file is looked at.
+
+    Returns:
+        Tuple of (version digest, time of the last change in nanoseconds)
+    """
+    _ensure_catalog()
+    generation, modified_ns = catalog.get_generation()
+    if not modified_ns:
+        modified_ns = os.stat(catalog.CATALOG_PATH).st_mtime_ns
+    digest = hashlib.blake2b(
+        f"catalog:{generation}:archive:{archive.get_generation()}".encode(), digest_size=12
+    )
+    return digest.hexdigest(), modified_ns
+
+
+def _read_messages_indexed(
+    conversation_id: str,
+    before: Optional[int],
+    limit: int
+) -> Optional[Dict[str, Any]]:
+    """Read a page using the offsets file; None if it's missing or out of date."""
+    try:
+        with open(get_offsets_path(conversation_id), 'rb') as offsets_file, \
+                open(get_conversation_path(conversation_id), 'rb') as f:
+            header = _read_offsets_header(offsets_file, os.fstat(f.fileno()))
+            if header is None:
+                return None
+            count, head_len, _ = header
+
+            end = count if before is None else max(0, min(before, count))
+            start = max(0, end - limit)
+            offsets_file.seek(_OFFSETS_HEADER.size + start * _OFFSETS_ENTRY.size)
+            entries = offsets_file.read((end - start) * _OFFSETS_ENTRY.size)
+            head = json.loads(f.read(head_len) + b"\n}")
+            messages = []
+            for position in range(0, len(entries), _OFFSETS_ENTRY.size):
+                message_start, message_end = _OFFSETS_ENTRY.unpack_from(entries, position)
+                f.seek(message_start)
+                messages.append(json.loads(f.read(message_end - message_start)))
+    except FileNotFoundError:
+        return None
+    return dict(head, messages=messages, start=start, total=count)
+
+
+def _read_messages_archived(
+    entry: archive.ArchiveEntry,
+    before: Optional[int],
+    limit: int
+) -> Dict[str, Any]:
+    """Read a page of an archived conversation, seeking to each message in its pack."""
+    end = entry.count if before is None else max(0, min(before, entry.count))
+    start = max(0, end - limit)
+    ranges = [(0, entry.head_len)] + [
+        _OFFSETS_ENTRY.unpack_from(entry.offsets, index * _OFFSETS_ENTRY.size)
+        for index in range(start, end)
+    ]
+    chunks = archive.read_ranges(entry, ranges)
+    head = json.loads(chunks[0] + b"\n}")
+    messages = [json.loads(chunk) for chunk in chunks[1:]]
+    return dict(head, messages=messages, start=start, total=entry.count)
+
+
+def get_messages_page(
+    conversation_id: str,
+    before: Optional[int] = None,
+    limit: int = 20
+) -> Optional[Dict[str, Any]]:
+    """
+    Load a page of a conversation's messages, newest first.
+
+    Only the requested messages are read and parsed, using the offsets
+    file written with the conversation (or the archive index). Conversations
+    saved without one are parsed in full once and get one written, without
+    changing their version.
+
+    Args:
+        conversation_id: Conversation identifier
+        before: Return the messages before this index (default: the latest)
+        limit: Maximum number of messages
+
+    Returns:
+        Conversation dict without the other messages, plus 'start' (index of
+        the first message returned), 'total' and 'next_cursor' (the `before`
+        value for the previous page, or None), or None if not found
+    """
+    page = _read_messages_indexed(conversation_id, before, limit)
+    if page is None and not os.path.exists(get_conversation_path(conversation_id)):
+        entry = archive.lookup(conversation_id)
+        if entry is None:
+            return None
+        page = _read_messages_archived(entry, before, limit)
+    if page is None:
+        with conversation_lock(conversation_id):
+            conversation = _rebuild_offsets(conversation_id)
+        if conversation is None:
+            # Archived since the first look
+            conversation = get_conversation(conversation_id)
+            if conversation is None:
+                return None
+        count = len(conversation["messages"])
+        end = count if before is None else max(0, min(before, count))
+        start = max(0, end - limit)
+        page = dict(conversation, messages=conversation["messages"][start:end], start=start, total=count)
+    page["next_cursor"] = page["start"] if page["start"] > 0 else None
+    return page
+
+
+def _iter_indexed_messages(f, offsets_file, count: int) -> Iterator[Dict[str, Any]]:
+    """Read a conversation file's messages one at a time, closing both files when done."""
+    try:
+        offsets_file.seek(_OFFSETS_HEADER.size)
+        for _ in range(count):
+            message_start, message_end = _OFFSETS_ENTRY.unpack(offsets_file.read(_OFFSETS_ENTRY.size))
+            f.seek(message_start)
+            yield json.loads(f.read(message_end - message_start))
+    finally:
+        offsets_file.close()
+        f.close()
+
+
+def _iter_archived_messages(entry: archive.ArchiveEntry, pack_file) -> Iterator[Dict[str, Any]]:
+    """Read an archived conversation's messages one at a time, closing the pack when done."""
+    try:
+        for index in range(entry.count):
+            message_start, message_end = _OFFSETS_ENTRY.unpack_from(entry.offsets, index * _OFFSETS_ENTRY.size)
+            pack_file.seek(entry.offset + message_start)
+            yield json.loads(pack_file.read(message_end - message_start))
+    finally:
+        pack_file.close()
+
+
+def _open_indexed(conversation_id: str) -> Optional[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+    """Open a conversation using its offsets file; None if it's missing or out of date."""
+    try:
+        offsets_file = open(get_offsets_path(conversation_id), 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        f = open(get_conversation_path(conversation_id), 'rb')
+    except FileNotFoundError:
+        offsets_file.close()
+        return None
+    header = _read_offsets_header(offsets_file, os.fstat(f.fileno()))
+    if header is None:
+        offsets_file.close()
+        f.close()
+        return None
+    count, head_len, _ = header
+    head = json.loads(f.read(head_len) + b"\n}")
+    return head, _iter_indexed_messages(f, offsets_file, count)
+
+
+def open_conversation(conversation_id: str) -> Optional[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+    """
+    Open a conversation to read its messages one at a time (e.g. to export it).
+
+    Messages are read and parsed as the iterator is consumed, using the
+    offsets file (or the archive index), so memory is bounded by the
+    largest message rather than the conversation. The open files keep
+    the version that was opened even if the conversation is saved,
+    deleted or archived meanwhile. Conversations saved without an offsets
+    file are parsed in full once and get one written, as in
+    get_messages_page().
+
+    Args:
+        conversation_id: Conversation identifier
+
+    Returns:
+        Tuple of (conversation fields other than messages, iterator over
+        the messages), or None if not found
+    """
+    opened = _open_indexed(conversation_id)
+    if opened is not None:
+        return opened
+    if not os.path.exists(get_conversation_path(conversation_id)):
+        entry = archive.lookup(conversation_id)
+        if entry is None:
+            return None
+        pack_file = open(archive.pack_path(entry.pack), 'rb')
+        pack_file.seek(entry.offset)
+        head = json.loads(pack_file.read(entry.head_len) + b"\n}")
+        return head, _iter_archived_messages(entry, pack_file)
+    with conversation_lock(conversation_id):
+        conversation = _rebuild_offsets(conversation_id)
+    if conversation is None:
+        # Archived since the first look
+        conversation = get_conversation(conversation_id)
+        if conversation is None:
+            return None
+    messages = conversation.pop("messages")
+    return conversation, iter(messages)
+
+
+def _fill_catalog() -> int:
+    """Add every conversation file missing from the list index (see catalog.py)."""
+    entries = []
+    for entry in _scan_conversation_files():
+        # Only the fields before "messages" are parsed
+        conversation_id = entry.name[:-len('.json')]
+        head = _read_head(conversation_id)
+        if head is not None:
+            entries.append((conversation_id, head[0], head[1]))
+    # Skip conversations deleted or archived by another worker since the scan
+    catalog.fill(entry for entry in entries if os.path.exists(get_conversation_path(entry[0])))
+    return len(entries)
+
+
+def _ensure_catalog():
+    """On first use, index the conversations written before the list index existed."""
+    if not catalog.is_built():
+        _fill_catalog()
+
+
+def rebuild_catalog() -> int:
+    """
+    Rebuild the list index from the conversation files.
+
+    Returns:
+        Number of conversations indexed
+    """
+    catalog.clear()
+    return _fill_catalog()
 
 
 def list_conversations() -> List[Dict[str, Any]]:
     """
-    List all conversations (metadata only).
+    List all conversations (metadata only), from the list index and the
+    archive index; no conversation file is read.
 
     Returns:
         List of conversation metadata dicts
     """
-    ensure_data_dir()
+    _ensure_catalog()
+    conversations = catalog.list_live()
 
-    conversations = []
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith('.json'):
-            path = os.path.join(DATA_DIR, filename)
-            with open(path, 'r') as f:
-                data = json.load(f)
-                # Return metadata only
-                conversations.append({
-                    "id": data["id"],
-                    "created_at": data["created_at"],
-                    "title": data.get("title", "New Conversation"),
-                    "message_count": len(data["messages"]),
-                    "council_type": data.get("council_type", "premium")
-                })
+    # Archived conversations are listed from the archive index; a copy in
+    # DATA_DIR (left by an interrupted compaction) takes precedence
+    listed = {conversation["id"] for conversation in conversations}
+    conversations.extend(
+        conversation for conversation in archive.list_archived() if conversation["id"] not in listed
+    )
 
     # Sort by creation time, newest first
-    conversations.sort(key=lambda x: x["created_at"], reverse=True)
+    conversations.sort(key=lambda x: x["created_at"] or "", reverse=True)
 
     return conversations
 
 
+def iter_conversation_ids() -> Iterator[str]:
+    """
+    Iterate over the ids of all stored conversations (in DATA_DIR, then archived).
+
+    Yields:
+        Conversation identifiers
+    """
+    seen = set()
+    for entry in _scan_conversation_files():
+        conversation_id = entry.name[:-len('.json')]
+        seen.add(conversation_id)
+        yield conversation_id
+    for archived in archive.list_archived():
+        if archived["id"] not in seen:
+            yield archived["id"]
+
+
+def iter_conversations():
+    """
+    Iterate over all stored conversations, loading one at a time.
+
+    Yields:
+        Conversation dicts
+    """
+    for conversation_id in iter_conversation_ids():
+        conversation = get_conversation(conversation_id)
+        if conversation is not None:
+            yield conversation
+
+
 def add_user_message(conversation_id: str, content: str):
     """
     Add a user message to a conversation.
@@ -118,16 +745,20 @@ def add_user_message(conversation_id: str, content: str):
         conversation_id: Conversation identifier
         content: User message content
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    with conversation_lock(conversation_id):
+        conversation = get_conversation(conversation_id)
+        if conversation is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
 
-    conversation["messages"].append({
-        "role": "user",
-        "content": content
-    })
+        conversation["messages"].append({
+            "role": "user",
+            "content": content
+        })
 
-    save_conversation(conversation)
+        save_conversation(conversation)
+        _queue_index_update(
+            search.index_user_message, conversation_id, len(conversation["messages"]) - 1, content
+        )
 
 
 def add_assistant_message(
@@ -147,23 +778,143 @@ def add_assistant_message(
         stage3: Final synthesized response
         council_type: Type of council used for this message
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    with conversation_lock(conversation_id):
+        conversation = get_conversation(conversation_id)
+        if conversation is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
 
-    message = {
-        "role": "assistant",
-        "stage1": stage1,
-        "stage2": stage2,
-        "stage3": stage3
-    }
+        message = {
+            "role": "assistant",
+            "stage1": stage1,
+            "stage2": stage2,
+            "stage3": stage3
+        }
     
-    if council_type:
-        message["council_type"] = council_type
+        if council_type:
+            message["council_type"] = council_type
 
-    conversation["messages"].append(message)
+        conversation["messages"].append(message)
 
-    save_conversation(conversation)
+        save_conversation(conversation)
+        index = len(conversation["messages"]) - 1
+        _queue_index_update(search.index_assistant_message, conversation_id, index, message)
+        _queue_index_update(
+            leaderboard.record_run, conversation_id, index, message,
+            council_type or conversation.get("council_type")
+        )
+        _queue_index_update(
+            costs.record_run, conversation_id, index,
+            council_type or conversation.get("council_type") or COUNCIL_TYPE_PREMIUM, message
+        )
+        if index > 0:
+            _queue_index_update(
+                neardup.index_run, conversation_id, index, conversation["messages"][index - 1]["content"],
+                message, council_type or conversation.get("council_type") or COUNCIL_TYPE_PREMIUM
+            )
+
+
+def start_assistant_message(
+    conversation_id: str,
+    run_id: str,
+    council_type: Optional[str] = None
+):
+    """
+    Add a placeholder assistant message for a council run that is starting.
+
+    Stage results are filled in with update_assistant_message() as each
+    stage completes, so a crash mid-run keeps the stages already paid for.
+
+    Args:
+        conversation_id: Conversation identifier
+        run_id: Unique identifier for the run
+        council_type: Type of council used for this message
+    """
+    with conversation_lock(conversation_id):
+        conversation = get_conversation(conversation_id)
+        if conversation is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+
+        message = {
+            "role": "assistant",
+            "run_id": run_id,
+            "status": RUN_STATUS_IN_PROGRESS,
+            "stage1": None,
+            "stage2": None,
+            "stage3": None
+        }
+        if council_type:
+            message["council_type"] = council_type
+
+        conversation["messages"].append(message)
+        save_conversation(conversation)
+
+
+def update_assistant_message(conversation_id: str, run_id: str, **fields):
+    """
+    Checkpoint fields (stage1, stage2, metadata, stage3, status...) of a run's assistant message.
+
+    Args:
+        conversation_id: Conversation identifier
+        run_id: Run identifier given to start_assistant_message()
+        **fields: Message fields to set
+    """
+    with conversation_lock(conversation_id):
+        conversation = get_conversation(conversation_id)
+        if conversation is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+
+        for index in range(len(conversation["messages"]) - 1, -1, -1):
+            message = conversation["messages"][index]
+            if message.get("run_id") == run_id:
+                message.update(fields)
+                break
+        else:
+            raise ValueError(f"Run {run_id} not found in conversation {conversation_id}")
+
+        save_conversation(conversation)
+        if "stage3" in fields:
+            _queue_index_update(search.index_assistant_message, conversation_id, index, message)
+        if fields.get("status") == RUN_STATUS_COMPLETE:
+            _queue_index_update(
+                leaderboard.record_run, conversation_id, index, message,
+                message.get("council_type") or conversation.get("council_type")
+            )
+            _queue_index_update(
+                costs.record_run, conversation_id, index,
+                message.get("council_type") or conversation.get("council_type") or COUNCIL_TYPE_PREMIUM,
+                message
+            )
+            if index > 0:
+                _queue_index_update(
+                    neardup.index_run, conversation_id, index, conversation["messages"][index - 1]["content"],
+                    message, message.get("council_type") or conversation.get("council_type") or COUNCIL_TYPE_PREMIUM
+                )
+
+
+def get_run(conversation_id: str, run_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Load a run's assistant message and the user question it answers.
+
+    Args:
+        conversation_id: Conversation identifier
+        run_id: Run identifier
+
+    Returns:
+        Tuple of (user_query, assistant message) or None if not found
+    """
+    conversation = get_conversation(conversation_id)
+    if conversation is None:
+        return None
+
+    messages = conversation["messages"]
+    for index, message in enumerate(messages):
+        if message.get("run_id") == run_id:
+            # The question is the closest preceding user message
+            for previous in reversed(messages[:index]):
+                if previous["role"] == "user":
+                    return previous["content"], message
+            return None
+    return None
 
 
 def update_conversation_title(conversation_id: str, title: str):
@@ -174,12 +925,14 @@ def update_conversation_title(conversation_id: str, title: str):
         conversation_id: Conversation identifier
         title: New title for the conversation
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    with conversation_lock(conversation_id):
+        conversation = get_conversation(conversation_id)
+        if conversation is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
 
-    conversation["title"] = title
-    save_conversation(conversation)
+        conversation["title"] = title
+        save_conversation(conversation)
+        _queue_index_update(search.index_conversation_meta, conversation_id, title)
 
 
 def delete_conversation(conversation_id: str) -> bool:
@@ -192,8 +945,95 @@ def delete_conversation(conversation_id: str) -> bool:
     Returns:
         True if deleted, False if not found
     """
-    path = get_conversation_path(conversation_id)
-    if os.path.exists(path):
-        os.remove(path)
-        return True
-    return False
+    if not conversation_exists(conversation_id):
+        return False
+
+    with conversation_lock(conversation_id):
+        deleted = archive.remove(conversation_id)
+        try:
+            os.remove(get_conversation_path(conversation_id))
+            deleted = True
+        except FileNotFoundError:
+            pass
+        if not deleted:
+            return False
+
+    for path in (get_offsets_path(conversation_id), get_lock_path(conversation_id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    _update_index(catalog.remove, conversation_id)
+    _queue_index_update(search.remove_conversation, conversation_id)
+    _queue_index_update(neardup.remove_conversation, conversation_id)
+    return True
+
+
+def _archive_conversation(conversation_id: str, cutoff_ns: int) -> bool:
+    """Move one conversation into the archive if it still hasn't been written since cutoff_ns."""
+    with conversation_lock(conversation_id):
+        path = get_conversation_path(conversation_id)
+        try:
+            with open(path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_mtime_ns > cutoff_ns:
+                    # Written to since the scan
+                    return False
+                conversation = json.load(f)
+        except FileNotFoundError:
+            return False
+        data, head_len, offsets = _serialize_conversation(conversation)
+        archive.append(
+            {key: value for key, value in conversation.items() if key != "messages"},
+            data,
+            head_len,
+            b"".join(_OFFSETS_ENTRY.pack(start, end) for start, end in offsets),
+            len(offsets),
+            stat.st_mtime_ns
+        )
+        # Removed while locked: anyone waiting for the lock retakes it on a new file
+        for stale_path in (path, get_offsets_path(conversation_id), get_lock_path(conversation_id)):
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                pass
+        _update_index(catalog.remove, conversation_id)
+    return True
+
+
+def compact_conversations(max_age_days: Optional[float] = None) -> int:
+    """
+    Move conversations untouched for a while into the packed archive (see archive.py).
+
+    Only one process compacts at a time; the others return at once.
+
+    Args:
+        max_age_days: Archive conversations not written to for this many
+            days. If None, uses ARCHIVE_AFTER_DAYS (0 = never).
+
+    Returns:
+        Number of conversations archived
+    """
+    if max_age_days is None:
+        max_age_days = ARCHIVE_AFTER_DAYS
+    if max_age_days <= 0:
+        return 0
+    cutoff_ns = time.time_ns() - int(max_age_days * 86400 * 1e9)
+
+    archived = 0
+    with archive.compaction_lock() as locked:
+        if not locked:
+            return 0
+        for entry in _scan_conversation_files():
+            try:
+                if entry.stat().st_mtime_ns > cutoff_ns:
+                    continue
+            except FileNotFoundError:
+                continue
+            conversation_id = entry.name[:-len('.json')]
+            try:
+                if _archive_conversation(conversation_id, cutoff_ns):
+                    archived += 1
+            except Exception as e:
+                print(f"Error archiving conversation {conversation_id}: {e}")
+    return archived
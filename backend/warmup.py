@@ -0,0 +1,207 @@
+"""Startup warm-up: connect to providers before serving.
+
+Right after a deploy, the first users would otherwise pay for DNS lookups
+and TLS handshakes, and find out about an unreachable provider or a bad
+API key by waiting on it. At startup, warm_up():
+
+1. resolves each provider's host and opens a pooled connection to it
+2. lists the provider's models on that connection (GET <base>/models, free
+   on OpenRouter and OpenAI-compatible servers), which checks that the
+   endpoint answers and accepts the API key
+3. with WARMUP_PROBE_MODELS on, also sends a one-word completion to every
+   route of every council member and chairman, which records their baseline
+   latency (provider route averages, see providers.py). These calls are
+   billed, and a probe can fail for reasons that say nothing about real
+   calls, so they are opt-in and never count against circuit breakers
+
+The instance reports ready (GET /api/ready) once warm-up finishes, or after
+WARMUP_TIMEOUT_SECONDS; requests still pending then keep running and their
+results are reported when they land.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .config import WARMUP_ENABLED, WARMUP_TIMEOUT_SECONDS, WARMUP_PROBE_TIMEOUT, WARMUP_PROBE_MODELS
+from .health import PROBE_MESSAGES
+from .registry import ProviderSpec, get_registry, get_model_spec
+from . import metrics
+from . import providers
+
+STATUS_PENDING = "pending"
+STATUS_WARMING = "warming"
+STATUS_READY = "ready"
+STATUS_TIMED_OUT = "timed_out"
+STATUS_DISABLED = "disabled"
+
+_state: Dict[str, Any] = {
+    "status": STATUS_PENDING,
+    "started_at": None,
+    "finished_at": None,
+    "providers": {},
+    "models": {},
+}
+
+# The warm-up task, kept referenced while requests outlive the timeout
+_task: Optional[asyncio.Task] = None
+
+
+def is_ready() -> bool:
+    """True once warm-up has finished, timed out, or is disabled."""
+    return _state["status"] in (STATUS_READY, STATUS_TIMED_OUT, STATUS_DISABLED)
+
+
+def get_warmup_status() -> Dict[str, Any]:
+    """
+    Warm-up progress for the readiness endpoint.
+
+    Returns:
+        Dict with ready, status, seconds (time spent warming up), providers
+        (per-provider results) and models (per-model probe results, with
+        WARMUP_PROBE_MODELS on)
+    """
+    started, finished = _state["started_at"], _state["finished_at"]
+    seconds = None
+    if started is not None:
+        seconds = round((finished or time.monotonic()) - started, 3)
+    return {
+        "ready": is_ready(),
+        "status": _state["status"],
+        "seconds": seconds,
+        "providers": dict(_state["providers"]),
+        "models": dict(_state["models"]),
+    }
+
+
+async def connect_provider(provider: ProviderSpec) -> Dict[str, Any]:
+    """
+    Resolve a provider's host, open a pooled connection to it and list its models.
+
+    Returns:
+        Dict with ok, status (of the models list), resolve_seconds,
+        connect_seconds and error
+    """
+    url = urlsplit(provider.url)
+    port = url.port or (443 if url.scheme == "https" else 80)
+    result: Dict[str, Any] = {
+        "ok": False, "status": None, "resolve_seconds": None, "connect_seconds": None, "error": None
+    }
+    start = time.monotonic()
+    try:
+        await asyncio.get_running_loop().getaddrinfo(url.hostname, port)
+        result["resolve_seconds"] = round(time.monotonic() - start, 3)
+        start = time.monotonic()
+        # Whatever the status, the connection and its TLS session stay in the pool
+        response = await providers.get_client(provider).get(
+            providers.get_models_url(provider),
+            headers=providers.request_headers(provider),
+            timeout=WARMUP_PROBE_TIMEOUT
+        )
+        result["connect_seconds"] = round(time.monotonic() - start, 3)
+        result["status"] = response.status_code
+        result["ok"] = response.is_success
+        if not response.is_success:
+            result["error"] = f"HTTP {response.status_code} listing models"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    if result["error"]:
+        print(f"Warm-up: provider {provider.name}: {result['error']}")
+    metrics.incr("warmup_providers", provider=provider.name, outcome="ok" if result["ok"] else "error")
+    return result
+
+
+async def probe_route(provider: ProviderSpec, model: str) -> Dict[str, Any]:
+    """
+    Send a one-word completion to a model on one provider.
+
+    The call goes straight to the provider: a failure is reported but
+    leaves the model's circuit breaker alone, and a success seeds the
+    route's latency average.
+
+    Returns:
+        Dict with ok, seconds and error
+    """
+    start = time.monotonic()
+    try:
+        await providers.chat_completion(
+            provider, {"model": model, "messages": PROBE_MESSAGES}, WARMUP_PROBE_TIMEOUT
+        )
+    except Exception as e:
+        metrics.incr("warmup_models", outcome="error")
+        return {"ok": False, "seconds": round(time.monotonic() - start, 3), "error": f"{type(e).__name__}: {e}"}
+    seconds = time.monotonic() - start
+    providers.record_latency(provider, model, seconds)
+    metrics.incr("warmup_models", outcome="ok")
+    return {"ok": True, "seconds": round(seconds, 3), "error": None}
+
+
+async def probe_model(model: str) -> Dict[str, Any]:
+    """
+    Probe every route of a model in parallel.
+
+    Returns:
+        Dict with ok (some route answered) and routes (provider -> result)
+    """
+    routes = providers.get_routes(get_model_spec(model))
+    results = await asyncio.gather(*[probe_route(provider, remote) for provider, remote in routes])
+    by_provider = {provider.name: result for (provider, _), result in zip(routes, results)}
+    return {"ok": any(result["ok"] for result in results), "routes": by_provider}
+
+
+async def _probe_all(models: List[str]):
+    """Probe models in parallel, recording each result as it lands."""
+    async def probe(model: str):
+        _state["models"][model] = await probe_model(model)
+
+    await asyncio.gather(*[probe(model) for model in models])
+
+
+async def _warm_up():
+    registry = get_registry()
+    names = list(registry.providers)
+    results = await asyncio.gather(*[connect_provider(registry.providers[name]) for name in names])
+    _state["providers"] = dict(zip(names, results))
+    if WARMUP_PROBE_MODELS:
+        await _probe_all(registry.council_models())
+
+
+async def warm_up(timeout: Optional[float] = None):
+    """
+    Warm up the instance (see the module docstring); readiness is reported
+    when done, or after the timeout with the remaining requests left running.
+
+    Args:
+        timeout: Seconds before reporting ready anyway. If None, uses
+            WARMUP_TIMEOUT_SECONDS.
+    """
+    global _task
+    if not WARMUP_ENABLED:
+        _state["status"] = STATUS_DISABLED
+        return
+    if timeout is None:
+        timeout = WARMUP_TIMEOUT_SECONDS
+    _state.update(status=STATUS_WARMING, started_at=time.monotonic(), finished_at=None)
+    print(
+        "Warm-up: connecting to providers"
+        + (" and probing council models" if WARMUP_PROBE_MODELS else "")
+    )
+    task = _task = asyncio.create_task(_warm_up())
+    done, _ = await asyncio.wait([task], timeout=timeout)
+    _state["finished_at"] = time.monotonic()
+    seconds = _state["finished_at"] - _state["started_at"]
+    if not done:
+        _state["status"] = STATUS_TIMED_OUT
+        print(f"Warm-up: timed out after {seconds:.1f}s, serving anyway")
+    else:
+        try:
+            task.result()
+        except Exception as e:
+            print(f"Error during warm-up: {e}")
+        _state["status"] = STATUS_READY
+        failed = [name for name, result in _state["providers"].items() if not result["ok"]]
+        failed += [model for model, result in _state["models"].items() if not result["ok"]]
+        print(f"Warm-up: done in {seconds:.1f}s ({len(failed)} provider(s)/model(s) failed: {failed})")
+    metrics.incr("warmup_runs", status=_state["status"])
+    metrics.observe("warmup_seconds", seconds)
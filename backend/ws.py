@@ -0,0 +1,154 @@
+"""WebSocket transport for council runs.
+
+One connection carries any number of concurrent runs (at most WS_MAX_RUNS
+at a time), so a client running several conversations isn't limited by the
+browser's per-host HTTP/1.1 connection limit. The client starts each run
+with a stream ID of its choosing; every event of the run is sent back
+tagged with that ID, and with the run ID once the run has one:
+
+    -> {"type": "start", "stream": "s1", "conversation_id": "...", "content": "...", "council_type": "premium"}
+    -> {"type": "resume", "stream": "s2", "conversation_id": "...", "run_id": "..."}
+    <- {"stream": "s1", "run_id": "...", "type": "stage1_complete", "data": [...]}
+    <- {"stream": "s1", "type": "end"}
+    -> {"type": "cancel", "stream": "s2"}
+    <- {"stream": "s2", "type": "cancelled"}
+
+"start" takes the fields of the streaming message endpoint's body. A
+request that is refused gets {"stream": ..., "type": "error", "status":
+<HTTP status>, "message": ...} and no "end"; errors inside a run are sent
+as 'error' events like over SSE.
+
+Events of all runs go through one bounded queue to a single writer: when
+the client doesn't keep up and WS_QUEUE_SIZE events are pending, the runs
+wait. A cancelled run, like one whose connection is lost, stays resumable
+from its last checkpoint.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from .config import WS_MAX_RUNS, WS_QUEUE_SIZE
+from .sse import dumps
+from . import metrics
+
+# Opens a run for a "start" or "resume" message; raises HTTPException to refuse it
+RunOpener = Callable[[Dict[str, Any]], AsyncIterator[Dict[str, Any]]]
+
+
+async def _write(websocket: WebSocket, outbox: asyncio.Queue):
+    """Send queued frames in order until cancelled."""
+    while True:
+        frame = await outbox.get()
+        await websocket.send_text(dumps(frame).decode())
+        metrics.incr("ws_frames")
+
+
+async def _relay(stream: str, events: AsyncIterator[Dict[str, Any]], outbox: asyncio.Queue):
+    """Tag a run's events with its stream (and run) ID and queue them."""
+    run_id = None
+    try:
+        async for event in events:
+            if event.get("type") == "run_started" and run_id is None:
+                run_id = event.get("run_id")
+            frame = {"stream": stream, **event}
+            if run_id is not None:
+                frame.setdefault("run_id", run_id)
+            await outbox.put(frame)
+    except Exception as e:
+        await outbox.put({"stream": stream, "type": "error", "message": str(e)})
+    await outbox.put({"stream": stream, "type": "end"})
+
+
+async def serve_runs(websocket: WebSocket, open_run: RunOpener, max_runs: Optional[int] = None):
+    """
+    Serve a client's runs over an accepted WebSocket until it disconnects.
+
+    Args:
+        websocket: The connection
+        open_run: Returns the event stream for a "start" or "resume"
+            message (e.g. runner.stream_new_run()); raises HTTPException
+            to refuse it
+        max_runs: Concurrent runs allowed. If None, uses WS_MAX_RUNS.
+    """
+    if max_runs is None:
+        max_runs = WS_MAX_RUNS
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=max(WS_QUEUE_SIZE, 1))
+    runs: Dict[str, asyncio.Task] = {}
+    writer = asyncio.create_task(_write(websocket, outbox))
+    metrics.incr("ws_connections")
+
+    def refuse(stream: Any, status: int, message: str):
+        metrics.incr("ws_refused", status=str(status))
+        return outbox.put({"stream": stream, "type": "error", "status": status, "message": message})
+
+    try:
+        await outbox.put({"type": "hello", "max_runs": max_runs})
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except WebSocketDisconnect:
+                break
+            except ValueError:
+                await refuse(None, 400, "Messages must be JSON objects")
+                continue
+            if not isinstance(message, dict):
+                await refuse(None, 400, "Messages must be JSON objects")
+                continue
+            kind = message.get("type")
+            stream = message.get("stream")
+            if not isinstance(stream, str) or not stream:
+                await refuse(stream, 400, "Missing stream ID")
+                continue
+
+            if kind == "cancel":
+                task = runs.pop(stream, None)
+                if task is None:
+                    await refuse(stream, 404, "No such run")
+                    continue
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                metrics.incr("ws_runs_cancelled")
+                await outbox.put({"stream": stream, "type": "cancelled"})
+                continue
+
+            if kind not in ("start", "resume"):
+                await refuse(stream, 400, f"Unknown message type: {kind}")
+                continue
+            if stream in runs:
+                await refuse(stream, 409, "Stream ID already in use")
+                continue
+            if len(runs) >= max_runs:
+                await refuse(stream, 429, f"Too many concurrent runs on this connection (max {max_runs})")
+                continue
+            try:
+                events = open_run(message)
+            except HTTPException as e:
+                await refuse(stream, e.status_code, str(e.detail))
+                continue
+            except ValueError as e:
+                await refuse(stream, 400, str(e))
+                continue
+            task = asyncio.create_task(_relay(stream, events, outbox))
+            runs[stream] = task
+
+            def forget(done: asyncio.Task, stream: str = stream):
+                if runs.get(stream) is done:
+                    del runs[stream]
+
+            task.add_done_callback(forget)
+            metrics.incr("ws_runs", kind=kind)
+    finally:
+        # Client went away: stop its runs (they can be resumed later)
+        for task in list(runs.values()):
+            task.cancel()
+        await asyncio.gather(*runs.values(), return_exceptions=True)
+        writer.cancel()
+        try:
+            await writer
+        except (asyncio.CancelledError, Exception):
+            pass
@@ -4,6 +4,9 @@ import ChatInterface from './components/ChatInterface';
 import { api } from './api';
 import './App.css';
 
+// Messages fetched per page when opening a conversation or scrolling up
+const MESSAGE_PAGE_SIZE = 20;
+
 function App() {
   const [conversations, setConversations] = useState([]);
   const [currentConversationId, setCurrentConversationId] = useState(null);
@@ -32,15 +35,39 @@ function App() {
     }
   };
 
+  // Open a conversation with its latest page of messages; older ones load on scroll
   const loadConversation = async (id) => {
     try {
-      const conv = await api.getConversation(id);
-      setCurrentConversation(conv);
+      const page = await api.getMessages(id, { limit: MESSAGE_PAGE_SIZE });
+      setCurrentConversation(page);
     } catch (error) {
       console.error('Failed to load conversation:', error);
     }
   };
 
+  const handleLoadOlderMessages = async () => {
+    const conv = currentConversation;
+    if (!conv || conv.next_cursor === null || conv.next_cursor === undefined) return;
+    try {
+      const page = await api.getMessages(conv.id, {
+        before: conv.next_cursor,
+        limit: MESSAGE_PAGE_SIZE,
+      });
+      setCurrentConversation((prev) => {
+        // Ignore the page if another conversation was opened meanwhile
+        if (!prev || prev.id !== page.id || prev.start !== conv.start) return prev;
+        return {
+          ...prev,
+          messages: [...page.messages, ...prev.messages],
+          start: page.start,
+          next_cursor: page.next_cursor,
+        };
+      });
+    } catch (error) {
+      console.error('Failed to load older messages:', error);
+    }
+  };
+
   const handleNewConversation = async () => {
     try {
       // Use premium as default when creating new conversation
@@ -78,6 +105,190 @@ function App() {
     setIsSidebarOpen(!isSidebarOpen);
   };
 
+  // Update the last (in-flight) assistant message in place
+  const updateLastMessage = (update) => {
+    setCurrentConversation((prev) => {
+      if (!prev || !prev.messages) return prev;
+      const messages = [...prev.messages];
+      const lastMsg = messages[messages.length - 1];
+      if (lastMsg) {
+        update(lastMsg);
+      }
+      return { ...prev, messages };
+    });
+  };
+
+  // Build the handler for streamed council events (new and resumed runs)
+  const createStreamEventHandler = (councilType) => (eventType, event) => {
+    try {
+      switch (eventType) {
+        case 'run_started':
+          updateLastMessage((lastMsg) => {
+            lastMsg.run_id = event.run_id;
+            lastMsg.status = 'in_progress';
+          });
+          break;
+
+        case 'budget_adjusted':
+          // The council was trimmed or switched to fit the budget caps
+          updateLastMessage((lastMsg) => {
+            lastMsg.budget = event.data;
+            if (event.council_type) lastMsg.council_type = event.council_type;
+          });
+          break;
+
+        case 'cache_hit':
+          // Answered from an earlier run of a near-duplicate question
+          updateLastMessage((lastMsg) => {
+            lastMsg.cached_from = event.data;
+          });
+          break;
+
+        case 'cascade':
+          // The cascade's first tier either answers, or the escalation tier joins in
+          updateLastMessage((lastMsg) => {
+            lastMsg.cascade = event.data;
+            if (event.data.escalated) {
+              lastMsg.stage2 = null;
+              lastMsg.metadata = null;
+            }
+          });
+          break;
+
+        case 'stage1_start':
+          setCurrentConversation((prev) => {
+            if (!prev || !prev.messages) return prev;
+            const messages = [...prev.messages];
+            const lastMsg = messages[messages.length - 1];
+            if (lastMsg) {
+              lastMsg.loading = lastMsg.loading || {};
+              lastMsg.loading.stage1 = true;
+            }
+            return { ...prev, messages };
+          });
+          break;
+
+        case 'stage1_complete':
+          console.log('Stage 1 complete event received:', event.data);
+          setCurrentConversation((prev) => {
+            if (!prev || !prev.messages) return prev;
+            const messages = [...prev.messages];
+            const lastMsg = messages[messages.length - 1];
+            if (lastMsg) {
+              lastMsg.stage1 = event.data || [];
+              if (event.council_type) lastMsg.council_type = event.council_type;
+              lastMsg.loading = lastMsg.loading || {};
+              lastMsg.loading.stage1 = false;
+            }
+            console.log('Updated message with stage1:', lastMsg?.stage1);
+            return { ...prev, messages };
+          });
+          break;
+
+        case 'stage2_start':
+          setCurrentConversation((prev) => {
+            if (!prev || !prev.messages) return prev;
+            const messages = [...prev.messages];
+            const lastMsg = messages[messages.length - 1];
+            if (lastMsg) {
+              lastMsg.loading = lastMsg.loading || {};
+              lastMsg.loading.stage2 = true;
+            }
+            return { ...prev, messages };
+          });
+          break;
+
+        case 'stage2_complete':
+          setCurrentConversation((prev) => {
+            if (!prev || !prev.messages) return prev;
+            const messages = [...prev.messages];
+            const lastMsg = messages[messages.length - 1];
+            if (lastMsg) {
+              lastMsg.stage2 = event.data || [];
+              lastMsg.metadata = event.metadata || {};
+              lastMsg.council_type = event.metadata?.council_type || councilType;
+              lastMsg.loading = lastMsg.loading || {};
+              lastMsg.loading.stage2 = false;
+            }
+            return { ...prev, messages };
+          });
+          break;
+
+        case 'stage3_start':
+          setCurrentConversation((prev) => {
+            if (!prev || !prev.messages) return prev;
+            const messages = [...prev.messages];
+            const lastMsg = messages[messages.length - 1];
+            if (lastMsg) {
+              lastMsg.loading = lastMsg.loading || {};
+              lastMsg.loading.stage3 = true;
+            }
+            return { ...prev, messages };
+          });
+          break;
+
+        case 'stage3_complete':
+          setCurrentConversation((prev) => {
+            if (!prev || !prev.messages) return prev;
+            const messages = [...prev.messages];
+            const lastMsg = messages[messages.length - 1];
+            if (lastMsg) {
+              lastMsg.stage3 = event.data || {};
+              if (event.council_type) lastMsg.council_type = event.council_type;
+              // Stage 3 degradations under a deadline update the metadata
+              if (event.metadata) lastMsg.metadata = event.metadata;
+              lastMsg.loading = lastMsg.loading || {};
+              lastMsg.loading.stage3 = false;
+            }
+            return { ...prev, messages };
+          });
+          break;
+
+        case 'usage':
+          updateLastMessage((lastMsg) => {
+            lastMsg.usage = event.data;
+          });
+          break;
+
+        case 'title_complete':
+          setCurrentConversation((prev) => ({
+            ...prev,
+            title: event.data?.title || prev?.title,
+          }));
+          loadConversations();
+          setIsLoading(false);
+          break;
+
+        case 'complete':
+          // Stream complete, reload conversations list
+          updateLastMessage((lastMsg) => {
+            lastMsg.status = 'complete';
+          });
+          loadConversations();
+          setIsLoading(false);
+          break;
+
+        case 'error':
+          console.error('Stream error:', event.message);
+          // The completed stages are checkpointed, so the run can be resumed
+          updateLastMessage((lastMsg) => {
+            // A run refused by the budget caps never started, so there is nothing to resume
+            lastMsg.status = event.code === 'budget_exceeded' ? 'refused' : 'failed';
+            lastMsg.error = event.message;
+            lastMsg.loading = {};
+          });
+          setIsLoading(false);
+          break;
+
+        default:
+          console.log('Unknown event type:', eventType);
+      }
+    } catch (error) {
+      console.error('Error processing SSE event:', error, eventType, event);
+      setIsLoading(false);
+    }
+  };
+
   const handleSendMessage = async (content, councilType) => {
     if (!currentConversationId) return;
 
@@ -112,124 +323,12 @@ function App() {
       }));
 
       // Send message with streaming
-      await api.sendMessageStream(currentConversationId, content, (eventType, event) => {
-        try {
-          switch (eventType) {
-            case 'stage1_start':
-              setCurrentConversation((prev) => {
-                if (!prev || !prev.messages) return prev;
-                const messages = [...prev.messages];
-                const lastMsg = messages[messages.length - 1];
-                if (lastMsg) {
-                  lastMsg.loading = lastMsg.loading || {};
-                  lastMsg.loading.stage1 = true;
-                }
-                return { ...prev, messages };
-              });
-              break;
-
-            case 'stage1_complete':
-              console.log('Stage 1 complete event received:', event.data);
-              setCurrentConversation((prev) => {
-                if (!prev || !prev.messages) return prev;
-                const messages = [...prev.messages];
-                const lastMsg = messages[messages.length - 1];
-                if (lastMsg) {
-                  lastMsg.stage1 = event.data || [];
-                  if (event.council_type) lastMsg.council_type = event.council_type;
-                  lastMsg.loading = lastMsg.loading || {};
-                  lastMsg.loading.stage1 = false;
-                }
-                console.log('Updated message with stage1:', lastMsg?.stage1);
-                return { ...prev, messages };
-              });
-              break;
-
-            case 'stage2_start':
-              setCurrentConversation((prev) => {
-                if (!prev || !prev.messages) return prev;
-                const messages = [...prev.messages];
-                const lastMsg = messages[messages.length - 1];
-                if (lastMsg) {
-                  lastMsg.loading = lastMsg.loading || {};
-                  lastMsg.loading.stage2 = true;
-                }
-                return { ...prev, messages };
-              });
-              break;
-
-            case 'stage2_complete':
-              setCurrentConversation((prev) => {
-                if (!prev || !prev.messages) return prev;
-                const messages = [...prev.messages];
-                const lastMsg = messages[messages.length - 1];
-                if (lastMsg) {
-                  lastMsg.stage2 = event.data || [];
-                  lastMsg.metadata = event.metadata || {};
-                  lastMsg.council_type = event.metadata?.council_type || councilType;
-                  lastMsg.loading = lastMsg.loading || {};
-                  lastMsg.loading.stage2 = false;
-                }
-                return { ...prev, messages };
-              });
-              break;
-
-            case 'stage3_start':
-              setCurrentConversation((prev) => {
-                if (!prev || !prev.messages) return prev;
-                const messages = [...prev.messages];
-                const lastMsg = messages[messages.length - 1];
-                if (lastMsg) {
-                  lastMsg.loading = lastMsg.loading || {};
-                  lastMsg.loading.stage3 = true;
-                }
-                return { ...prev, messages };
-              });
-              break;
-
-            case 'stage3_complete':
-              setCurrentConversation((prev) => {
-                if (!prev || !prev.messages) return prev;
-                const messages = [...prev.messages];
-                const lastMsg = messages[messages.length - 1];
-                if (lastMsg) {
-                  lastMsg.stage3 = event.data || {};
-                  if (event.council_type) lastMsg.council_type = event.council_type;
-                  lastMsg.loading = lastMsg.loading || {};
-                  lastMsg.loading.stage3 = false;
-                }
-                return { ...prev, messages };
-              });
-              break;
-
-            case 'title_complete':
-              setCurrentConversation((prev) => ({
-                ...prev,
-                title: event.data?.title || prev?.title,
-              }));
-              loadConversations();
-              setIsLoading(false);
-              break;
-
-            case 'complete':
-              // Stream complete, reload conversations list
-              loadConversations();
-              setIsLoading(false);
-              break;
-
-            case 'error':
-              console.error('Stream error:', event.message);
-              setIsLoading(false);
-              break;
-
-            default:
-              console.log('Unknown event type:', eventType);
-          }
-        } catch (error) {
-          console.error('Error processing SSE event:', error, eventType, event);
-          setIsLoading(false);
-        }
-      }, councilType);
+      await api.sendMessageStream(
+        currentConversationId,
+        content,
+        createStreamEventHandler(councilType),
+        councilType
+      );
     } catch (error) {
       console.error('Failed to send message:', error);
       // Remove optimistic messages on error
@@ -241,6 +340,28 @@ function App() {
     }
   };
 
+  const handleResumeRun = async (runId, councilType) => {
+    if (!currentConversationId) return;
+
+    setIsLoading(true);
+    updateLastMessage((lastMsg) => {
+      lastMsg.status = 'in_progress';
+    });
+    try {
+      await api.resumeRun(
+        currentConversationId,
+        runId,
+        createStreamEventHandler(councilType)
+      );
+    } catch (error) {
+      console.error('Failed to resume run:', error);
+      updateLastMessage((lastMsg) => {
+        lastMsg.status = 'failed';
+      });
+      setIsLoading(false);
+    }
+  };
+
   return (
     <div className="app">
       <button className="mobile-menu-btn" onClick={toggleSidebar}>
@@ -263,6 +384,8 @@ function App() {
       <ChatInterface
         conversation={currentConversation}
         onSendMessage={handleSendMessage}
+        onResumeRun={handleResumeRun}
+        onLoadOlder={handleLoadOlderMessages}
         isLoading={isLoading}
       />
     </div>
@@ -13,16 +13,187 @@ const getApiBase = () => {
 
 const API_BASE = getApiBase();
 
+// After a failed WebSocket connection, use SSE for this long before retrying
+const WS_RETRY_MS = 30000;
+
+/**
+ * Read a Server-Sent Events response and dispatch each event.
+ * Lines are buffered across chunks, so events split between reads are not lost.
+ * Keep-alive comments and "id:" lines are skipped; gzip is decoded by the browser.
+ */
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+
+    for (const line of lines) {
+      if (line.startsWith('data: ')) {
+        const data = line.slice(6);
+        try {
+          const event = JSON.parse(data);
+          onEvent(event.type, event);
+        } catch (e) {
+          console.error('Failed to parse SSE event:', e);
+        }
+      }
+    }
+  }
+}
+
+/**
+ * Runs multiplexed over one WebSocket (/api/ws). Each run is a stream with
+ * its own ID; its events are dispatched to the run's onEvent until the
+ * server ends or cancels it. The socket is opened on first use and reopened
+ * after it closes.
+ */
+class RunSocket {
+  constructor(url) {
+    this.url = url;
+    this.connecting = null;
+    this.streams = new Map();
+    this.maxRuns = Infinity;
+    this.nextStream = 0;
+    this.retryAt = 0;
+  }
+
+  /**
+   * Resolve to an open socket, or null if WebSockets can't be used now
+   * (the caller then falls back to SSE).
+   */
+  connect() {
+    if (typeof WebSocket === 'undefined' || Date.now() < this.retryAt) {
+      return Promise.resolve(null);
+    }
+    if (!this.connecting) {
+      this.connecting = new Promise((resolve) => {
+        const socket = new WebSocket(this.url);
+        let open = false;
+        socket.onopen = () => {
+          open = true;
+          resolve(socket);
+        };
+        socket.onmessage = (message) => this.dispatch(JSON.parse(message.data));
+        socket.onclose = () => {
+          this.connecting = null;
+          if (!open) {
+            this.retryAt = Date.now() + WS_RETRY_MS;
+            resolve(null);
+          }
+          for (const stream of this.streams.values()) {
+            stream.reject(new Error('Connection lost'));
+          }
+          this.streams.clear();
+        };
+      });
+    }
+    return this.connecting;
+  }
+
+  dispatch(frame) {
+    if (frame.type === 'hello') {
+      this.maxRuns = frame.max_runs;
+      return;
+    }
+    const stream = this.streams.get(frame.stream);
+    if (!stream) return;
+    if (frame.type === 'end' || frame.type === 'cancelled') {
+      this.streams.delete(frame.stream);
+      stream.resolve();
+    } else if (frame.type === 'error' && frame.status) {
+      // The server refused to start the run
+      this.streams.delete(frame.stream);
+      stream.reject(new Error(frame.message));
+    } else {
+      stream.onEvent(frame.type, frame);
+    }
+  }
+
+  /**
+   * Run over the socket if one is available and has room for another run.
+   * @returns {Promise<boolean>} true once the run has ended, false (right
+   *   away) if the caller should use SSE instead
+   */
+  async run(message, onEvent, signal) {
+    const socket = await this.connect();
+    if (!socket || this.streams.size >= this.maxRuns) return false;
+    const stream = `s${++this.nextStream}`;
+    await new Promise((resolve, reject) => {
+      this.streams.set(stream, { onEvent, resolve, reject });
+      socket.send(JSON.stringify({ ...message, stream }));
+      signal?.addEventListener(
+        'abort',
+        () => {
+          if (this.streams.has(stream)) {
+            socket.send(JSON.stringify({ type: 'cancel', stream }));
+          }
+        },
+        { once: true }
+      );
+    });
+    return true;
+  }
+}
+
+const runSocket = new RunSocket(`${API_BASE.replace(/^http/, 'ws')}/api/ws`);
+
+// Last response of each conditional GET, by URL: { etag, body }
+const conditionalCache = new Map();
+const CONDITIONAL_CACHE_SIZE = 50;
+
+/**
+ * GET a JSON resource, revalidating the cached copy with If-None-Match.
+ * On 304 the cached body is parsed again (callers mutate what they get),
+ * so an unchanged resource costs a round trip with no body.
+ */
+async function getConditional(url, errorMessage) {
+  const cached = conditionalCache.get(url);
+  const response = await fetch(url, {
+    headers: cached ? { 'If-None-Match': cached.etag } : {},
+  });
+  if (response.status === 304 && cached) {
+    return JSON.parse(cached.body);
+  }
+  if (!response.ok) {
+    throw new Error(errorMessage);
+  }
+  const body = await response.text();
+  const etag = response.headers.get('ETag');
+  conditionalCache.delete(url);
+  if (etag) {
+    conditionalCache.set(url, { etag, body });
+    if (conditionalCache.size > CONDITIONAL_CACHE_SIZE) {
+      conditionalCache.delete(conditionalCache.keys().next().value);
+    }
+  }
+  return JSON.parse(body);
+}
+
+/**
+ * Start a browser download of a backend URL (the server sets the filename).
+ */
+function downloadFromUrl(url) {
+  const link = document.createElement('a');
+  link.href = url;
+  link.download = '';
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+}
+
 export const api = {
   /**
    * List all conversations.
    */
   async listConversations() {
-    const response = await fetch(`${API_BASE}/api/conversations`);
-    if (!response.ok) {
-      throw new Error('Failed to list conversations');
-    }
-    return response.json();
+    return getConditional(`${API_BASE}/api/conversations`, 'Failed to list conversations');
   },
 
   /**
@@ -42,17 +213,27 @@ export const api = {
     return response.json();
   },
 
+  /**
+   * Get a page of a conversation's messages, latest first.
+   * Pass the returned next_cursor as `before` to get the page before it.
+   */
+  async getMessages(conversationId, { before = null, limit = 20 } = {}) {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (before !== null) params.set('before', String(before));
+    return getConditional(
+      `${API_BASE}/api/conversations/${conversationId}/messages?${params}`,
+      'Failed to get messages'
+    );
+  },
+
   /**
    * Get a specific conversation.
    */
   async getConversation(conversationId) {
-    const response = await fetch(
-      `${API_BASE}/api/conversations/${conversationId}`
+    return getConditional(
+      `${API_BASE}/api/conversations/${conversationId}`,
+      'Failed to get conversation'
     );
-    if (!response.ok) {
-      throw new Error('Failed to get conversation');
-    }
-    return response.json();
   },
 
   /**
@@ -71,6 +252,25 @@ export const api = {
     return response.json();
   },
 
+  /**
+   * Download a conversation, generated and streamed by the backend.
+   * @param {string} conversationId - The conversation ID
+   * @param {string} format - "pdf", "markdown" or "jsonl"
+   */
+  exportConversation(conversationId, format = 'pdf') {
+    downloadFromUrl(
+      `${API_BASE}/api/conversations/${conversationId}/export?format=${format}`
+    );
+  },
+
+  /**
+   * Download all conversations as a zip archive.
+   * @param {string} format - Format of each file in the archive
+   */
+  exportAllConversations(format = 'markdown') {
+    downloadFromUrl(`${API_BASE}/api/export?format=${format}`);
+  },
+
   /**
    * Send a message in a conversation.
    */
@@ -93,13 +293,23 @@ export const api = {
 
   /**
    * Send a message and receive streaming updates.
+   * Runs over the shared WebSocket when available, else over SSE.
    * @param {string} conversationId - The conversation ID
    * @param {string} content - The message content
    * @param {function} onEvent - Callback function for each event: (eventType, data) => void
    * @param {string} councilType - Type of council to use ("premium" or "economic")
+   * @param {AbortSignal} [options.signal] - Cancels the run (it stays resumable)
    * @returns {Promise<void>}
    */
-  async sendMessageStream(conversationId, content, onEvent, councilType = 'premium') {
+  async sendMessageStream(conversationId, content, onEvent, councilType = 'premium', { signal } = {}) {
+    const body = { content, council_type: councilType };
+    const sent = await runSocket.run(
+      { type: 'start', conversation_id: conversationId, ...body },
+      onEvent,
+      signal
+    );
+    if (sent) return;
+
     const response = await fetch(
       `${API_BASE}/api/conversations/${conversationId}/message/stream`,
       {
@@ -107,7 +317,8 @@ export const api = {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ content, council_type: councilType }),
+        body: JSON.stringify(body),
+        signal,
       }
     );
 
@@ -115,27 +326,37 @@ export const api = {
       throw new Error('Failed to send message');
     }
 
-    const reader = response.body.getReader();
-    const decoder = new TextDecoder();
-
-    while (true) {
-      const { done, value } = await reader.read();
-      if (done) break;
+    await readEventStream(response, onEvent);
+  },
 
-      const chunk = decoder.decode(value);
-      const lines = chunk.split('\n');
+  /**
+   * Resume an interrupted council run from its last completed stage.
+   * @param {string} conversationId - The conversation ID
+   * @param {string} runId - The run ID (from the assistant message)
+   * @param {function} onEvent - Callback function for each event: (eventType, data) => void
+   * @param {AbortSignal} [options.signal] - Cancels the run
+   * @returns {Promise<void>}
+   */
+  async resumeRun(conversationId, runId, onEvent, { signal } = {}) {
+    const sent = await runSocket.run(
+      { type: 'resume', conversation_id: conversationId, run_id: runId },
+      onEvent,
+      signal
+    );
+    if (sent) return;
 
-      for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          const data = line.slice(6);
-          try {
-            const event = JSON.parse(data);
-            onEvent(event.type, event);
-          } catch (e) {
-            console.error('Failed to parse SSE event:', e);
-          }
-        }
+    const response = await fetch(
+      `${API_BASE}/api/conversations/${conversationId}/runs/${runId}/resume`,
+      {
+        method: 'POST',
+        signal,
       }
+    );
+
+    if (!response.ok) {
+      throw new Error('Failed to resume run');
     }
+
+    await readEventStream(response, onEvent);
   },
 };
@@ -1,31 +1,72 @@
-import { useState, useEffect, useRef } from 'react';
+import { useState, useEffect, useLayoutEffect, useRef } from 'react';
 import ReactMarkdown from 'react-markdown';
 import Stage1 from './Stage1';
 import Stage2 from './Stage2';
 import Stage3 from './Stage3';
-import { exportConversationToPDF } from '../utils/pdfExport';
+import WindowedItem from './WindowedItem';
+import { api } from '../api';
 import './ChatInterface.css';
 
 export default function ChatInterface({
   conversation,
   onSendMessage,
+  onResumeRun,
+  onLoadOlder,
   isLoading,
 }) {
   const [input, setInput] = useState('');
   const [councilType, setCouncilType] = useState(
     conversation?.council_type || 'premium'
   );
-  const [isExporting, setIsExporting] = useState(false);
   const messagesEndRef = useRef(null);
+  const containerRef = useRef(null);
+  // Which page the list started at and how far from the bottom we were, to
+  // keep the view still when older messages are prepended
+  const shownRef = useRef({ id: null, start: null });
+  const distanceFromBottomRef = useRef(0);
+  const [loadingOlder, setLoadingOlder] = useState(false);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
 
-  useEffect(() => {
-    scrollToBottom();
+  useLayoutEffect(() => {
+    const container = containerRef.current;
+    const id = conversation?.id ?? null;
+    const start = conversation ? conversation.start || 0 : null;
+    const opened = shownRef.current.id !== id;
+    const prepended = !opened && id !== null && start < shownRef.current.start;
+    shownRef.current = { id, start };
+    if ((opened || prepended) && container) {
+      // Jump (without smooth scrolling, which would pass the top and load
+      // older pages) to the end of a newly opened conversation, or keep the
+      // same messages in view when older ones were added above
+      container.style.scrollBehavior = 'auto';
+      container.scrollTop = container.scrollHeight - (prepended ? distanceFromBottomRef.current : 0);
+      container.style.scrollBehavior = '';
+    } else {
+      scrollToBottom();
+    }
   }, [conversation]);
 
+  const loadOlder = async () => {
+    const container = containerRef.current;
+    if (loadingOlder || !onLoadOlder || conversation?.next_cursor == null || !container) return;
+    distanceFromBottomRef.current = container.scrollHeight - container.scrollTop;
+    setLoadingOlder(true);
+    try {
+      await onLoadOlder();
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  const handleScroll = () => {
+    if (containerRef.current && containerRef.current.scrollTop < 300) {
+      loadOlder();
+    }
+  };
+
   useEffect(() => {
     // Update council type when conversation changes
     if (conversation?.council_type) {
@@ -49,21 +90,13 @@ export default function ChatInterface({
     }
   };
 
-  const handleExportPDF = async () => {
+  const handleExport = (format) => {
     if (!conversation || !conversation.messages || conversation.messages.length === 0) {
       alert('No messages to export');
       return;
     }
-
-    setIsExporting(true);
-    try {
-      await exportConversationToPDF(conversation);
-    } catch (error) {
-      console.error('Error exporting PDF:', error);
-      alert('Error generating PDF: ' + error.message);
-    } finally {
-      setIsExporting(false);
-    }
+    // Generated and streamed by the backend, so long conversations don't freeze the tab
+    api.exportConversation(conversation.id, format);
   };
 
   if (!conversation) {
@@ -79,7 +112,15 @@ export default function ChatInterface({
 
   return (
     <div className="chat-interface">
-      <div className="messages-container">
+      <div className="messages-container" ref={containerRef} onScroll={handleScroll}>
+        {conversation.next_cursor != null && (
+          <div className="load-older">
+            <button className="load-older-button" onClick={loadOlder} disabled={loadingOlder}>
+              {loadingOlder ? 'Loading older messages...' : 'Load older messages'}
+            </button>
+          </div>
+        )}
+
         {conversation.messages.length === 0 ? (
           <div className="empty-state">
             <h2>Start a conversation</h2>
@@ -87,64 +128,125 @@ export default function ChatInterface({
           </div>
         ) : (
           conversation.messages.map((msg, index) => (
-            <div key={index} className="message-group">
-              {msg.role === 'user' ? (
-                <div className="user-message">
-                  <div className="message-label">You</div>
-                  <div className="message-content">
-                    <div className="markdown-content">
-                      <ReactMarkdown>{msg.content}</ReactMarkdown>
+            <WindowedItem key={(conversation.start || 0) + index} root={containerRef}>
+              <div className="message-group">
+                {msg.role === 'user' ? (
+                  <div className="user-message">
+                    <div className="message-label">You</div>
+                    <div className="message-content">
+                      <div className="markdown-content">
+                        <ReactMarkdown>{msg.content}</ReactMarkdown>
+                      </div>
                     </div>
                   </div>
-                </div>
-              ) : (
-                <div className="assistant-message">
-                  <div className="message-label">
-                    LLM Council
-                    <span className="council-type-indicator">
-                      {(msg.council_type || conversation.council_type || 'premium') === 'premium'
-                        ? '💎 Premium'
-                        : (msg.council_type || conversation.council_type || 'premium') === 'economic'
-                          ? '💰 Economic'
-                          : '🆓 Free'}
-                    </span>
-                  </div>
-
-                  {/* Stage 1 */}
-                  {msg.loading?.stage1 && (
-                    <div className="stage-loading">
-                      <div className="spinner"></div>
-                      <span>Running Stage 1: Collecting individual responses...</span>
+                ) : (
+                  <div className="assistant-message">
+                    <div className="message-label">
+                      LLM Council
+                      <span className="council-type-indicator">
+                        {(msg.council_type || conversation.council_type || 'premium') === 'premium'
+                          ? '💎 Premium'
+                          : (msg.council_type || conversation.council_type || 'premium') === 'economic'
+                            ? '💰 Economic'
+                            : (msg.council_type || conversation.council_type || 'premium') === 'cascade'
+                              ? '🪜 Cascade'
+                              : '🆓 Free'}
+                      </span>
                     </div>
-                  )}
-                  {msg.stage1 && <Stage1 responses={msg.stage1} />}
-
-                  {/* Stage 2 */}
-                  {msg.loading?.stage2 && (
-                    <div className="stage-loading">
-                      <div className="spinner"></div>
-                      <span>Running Stage 2: Peer rankings...</span>
-                    </div>
-                  )}
-                  {msg.stage2 && (
-                    <Stage2
-                      rankings={msg.stage2}
-                      labelToModel={msg.metadata?.label_to_model}
-                      aggregateRankings={msg.metadata?.aggregate_rankings}
-                    />
-                  )}
-
-                  {/* Stage 3 */}
-                  {msg.loading?.stage3 && (
-                    <div className="stage-loading">
-                      <div className="spinner"></div>
-                      <span>Running Stage 3: Final synthesis...</span>
-                    </div>
-                  )}
-                  {msg.stage3 && <Stage3 finalResponse={msg.stage3} />}
-                </div>
-              )}
-            </div>
+
+                    {/* Stage 1 */}
+                    {msg.loading?.stage1 && (
+                      <div className="stage-loading">
+                        <div className="spinner"></div>
+                        <span>Running Stage 1: Collecting individual responses...</span>
+                      </div>
+                    )}
+                    {msg.stage1 && <Stage1 responses={msg.stage1} />}
+
+                    {/* Stage 2 */}
+                    {msg.loading?.stage2 && (
+                      <div className="stage-loading">
+                        <div className="spinner"></div>
+                        <span>Running Stage 2: Peer rankings...</span>
+                      </div>
+                    )}
+                    {msg.stage2 && (
+                      <Stage2
+                        rankings={msg.stage2}
+                        labelToModel={msg.metadata?.label_to_model}
+                        aggregateRankings={msg.metadata?.aggregate_rankings}
+                      />
+                    )}
+
+                    {/* Stage 3 */}
+                    {msg.loading?.stage3 && (
+                      <div className="stage-loading">
+                        <div className="spinner"></div>
+                        <span>Running Stage 3: Final synthesis...</span>
+                      </div>
+                    )}
+                    {msg.stage3 && <Stage3 finalResponse={msg.stage3} />}
+
+                    {/* Token/cost accounting and budget adjustments */}
+                    {msg.budget?.adjustments?.length > 0 && (
+                      <div className="run-budget">
+                        Adjusted to fit the budget: {msg.budget.adjustments.join(', ')}
+                      </div>
+                    )}
+                    {msg.metadata?.deadline?.degradations?.length > 0 && (
+                      <div className="run-budget">
+                        Shortened to fit the {msg.metadata.deadline.seconds}s deadline:{' '}
+                        {msg.metadata.deadline.degradations.map((d) => d.detail).join('; ')}
+                      </div>
+                    )}
+                    {msg.cascade && (
+                      <div className="run-cascade">
+                        {msg.cascade.escalated
+                          ? `Escalated from the ${msg.cascade.tiers[0]} to the ${msg.cascade.tiers[1]} council`
+                          : `Answered by the ${msg.cascade.tiers[0]} council`}
+                        {' '}(judges' agreement {Math.round(msg.cascade.confidence * 100)}%, threshold{' '}
+                        {Math.round(msg.cascade.threshold * 100)}%)
+                        {msg.cascade.reason === 'no_time' && ' · not escalated: no time left'}
+                        {msg.cascade.reason === 'over_budget' && ' · not escalated: over budget'}
+                      </div>
+                    )}
+                    {msg.cached_from && (
+                      <div className="run-cached">
+                        Answered from an earlier run of a similar question
+                        ({Math.round(msg.cached_from.similarity * 100)}% similar): "{msg.cached_from.question}"
+                        {msg.cached_from.refreshing && ' · refreshing in the background, reload for the new answer'}
+                      </div>
+                    )}
+                    {msg.usage?.total && (
+                      <div className="run-usage">
+                        {msg.usage.total.prompt_tokens.toLocaleString()} prompt +{' '}
+                        {msg.usage.total.completion_tokens.toLocaleString()} completion tokens ·{' '}
+                        ${msg.usage.total.cost.toFixed(4)}
+                      </div>
+                    )}
+                    {msg.status === 'refused' && (
+                      <div className="run-budget">Not run: {msg.error}</div>
+                    )}
+
+                    {/* Interrupted run: completed stages are saved, resume the rest */}
+                    {!isLoading &&
+                     msg.run_id &&
+                     (msg.status === 'in_progress' || msg.status === 'failed') &&
+                     index === conversation.messages.length - 1 && (
+                      <div className="resume-run">
+                        <span>This council run was interrupted{msg.error ? `: ${msg.error}` : ''}.</span>
+                        <button
+                          className="resume-run-button"
+                          onClick={() => onResumeRun(msg.run_id, msg.council_type || conversation.council_type)}
+                        >
+                          Resume run
+                        </button>
+                      </div>
+                    )}
+                  </div>
+                )}
+              </div>
+            </WindowedItem>
           ))
         )}
 
@@ -161,20 +263,19 @@ export default function ChatInterface({
           <div className="export-pdf-container">
             <button
               className="export-pdf-button"
-              onClick={handleExportPDF}
-              disabled={isExporting || isLoading}
+              onClick={() => handleExport('pdf')}
+              disabled={isLoading}
               title="Export conversation to PDF"
             >
-              {isExporting ? (
-                <>
-                  <span className="spinner-small"></span>
-                  Generating PDF...
-                </>
-              ) : (
-                <>
-                  📄 Export PDF
-                </>
-              )}
+              📄 Export PDF
+            </button>
+            <button
+              className="export-pdf-button"
+              onClick={() => handleExport('markdown')}
+              disabled={isLoading}
+              title="Export conversation to Markdown"
+            >
+              📝 Export Markdown
             </button>
           </div>
         )}
@@ -217,6 +318,17 @@ export default function ChatInterface({
               />
               <span>Free</span>
             </label>
+            <label className="council-type-option">
+              <input
+                type="radio"
+                name="councilType"
+                value="cascade"
+                checked={councilType === 'cascade'}
+                onChange={(e) => setCouncilType(e.target.value)}
+                disabled={isLoading}
+              />
+              <span>Cascade</span>
+            </label>
           </div>
         </div>
         <div className="input-form-row">
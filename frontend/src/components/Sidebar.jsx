@@ -1,4 +1,5 @@
 import { useState, useEffect } from 'react';
+import { api } from '../api';
 import './Sidebar.css';
 
 export default function Sidebar({
@@ -24,6 +25,15 @@ export default function Sidebar({
         <button className="new-conversation-btn" onClick={onNewConversation}>
           + New Conversation
         </button>
+        {conversations.length > 0 && (
+          <button
+            className="export-all-btn"
+            onClick={() => api.exportAllConversations('markdown')}
+            title="Download all conversations as a zip of Markdown files"
+          >
+            ⬇ Export all (zip)
+          </button>
+        )}
       </div>
 
       <div className="conversation-list">
@@ -46,7 +56,7 @@ export default function Sidebar({
                   {conv.message_count} messages
                   {conv.council_type && (
                     <span className="council-type-badge">
-                      {conv.council_type === 'premium' ? '💎' : conv.council_type === 'economic' ? '💰' : '🆓'} {conv.council_type}
+                      {conv.council_type === 'premium' ? '💎' : conv.council_type === 'economic' ? '💰' : conv.council_type === 'cascade' ? '🪜' : '🆓'} {conv.council_type}
                     </span>
                   )}
                 </div>
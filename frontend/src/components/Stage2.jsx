@@ -6,10 +6,10 @@ function deAnonymizeText(text, labelToModel) {
   if (!labelToModel) return text;
 
   let result = text;
-  // Replace each "Response X" with the actual model name
+  // Replace each "Response X" with the actual model name ("Response A" must not match "Response AB")
   Object.entries(labelToModel).forEach(([label, model]) => {
     const modelShortName = model.split('/')[1] || model;
-    result = result.replace(new RegExp(label, 'g'), `**${modelShortName}**`);
+    result = result.replace(new RegExp(`${label}\\b`, 'g'), `**${modelShortName}**`);
   });
   return result;
 }
@@ -68,13 +68,29 @@ export default function Stage2({ rankings, labelToModel, aggregateRankings }) {
             </ol>
           </div>
         )}
+
+        {rankings[activeTab].shard && (
+          <div className="shard-note">
+            This model ranked {rankings[activeTab].shard.length} of the{' '}
+            {Object.keys(labelToModel || {}).length} responses (sharded judging).
+          </div>
+        )}
+
+        {rankings[activeTab].parse_error && (
+          <div className="parse-error">
+            The ranking in this evaluation could not be read ({rankings[activeTab].parse_error}),
+            so it is left out of the aggregate rankings.
+          </div>
+        )}
       </div>
 
       {aggregateRankings && aggregateRankings.length > 0 && (
         <div className="aggregate-rankings">
           <h4>Aggregate Rankings (Street Cred)</h4>
           <p className="stage-description">
-            Combined results across all peer evaluations (lower score is better):
+            {aggregateRankings[0].score !== undefined
+              ? 'Judges ranked different subsets of the responses, so these are merged by pairwise wins (Bradley-Terry strength, higher is better):'
+              : 'Combined results across all peer evaluations (lower score is better):'}
           </p>
           <div className="aggregate-list">
             {aggregateRankings.map((agg, index) => (
@@ -84,7 +100,9 @@ export default function Stage2({ rankings, labelToModel, aggregateRankings }) {
                   {agg.model.split('/')[1] || agg.model}
                 </span>
                 <span className="rank-score">
-                  Avg: {agg.average_rank.toFixed(2)}
+                  {agg.score !== undefined
+                    ? `Strength: ${agg.score.toFixed(3)}`
+                    : `Avg: ${agg.average_rank.toFixed(2)}`}
                 </span>
                 <span className="rank-count">
                   ({agg.rankings_count} votes)
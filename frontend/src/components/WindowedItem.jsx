@@ -0,0 +1,39 @@
+import { useEffect, useRef, useState } from 'react';
+
+/**
+ * Renders its children only while they are near the visible part of the
+ * scroll container `root`. Off-screen, they are replaced by an empty box of
+ * the height they last had, so long conversations keep few DOM nodes.
+ */
+export default function WindowedItem({ root, margin = 1500, children }) {
+  const ref = useRef(null);
+  const height = useRef(null);
+  const [visible, setVisible] = useState(true);
+
+  useEffect(() => {
+    const element = ref.current;
+    if (!element || !root?.current || typeof IntersectionObserver === 'undefined') {
+      return undefined;
+    }
+    const observer = new IntersectionObserver(
+      ([entry]) => {
+        if (!entry.isIntersecting) height.current = element.offsetHeight;
+        setVisible(entry.isIntersecting);
+      },
+      { root: root.current, rootMargin: `${margin}px 0px` }
+    );
+    observer.observe(element);
+    return () => observer.disconnect();
+  }, [root, margin]);
+
+  const placeholder = !visible && height.current !== null;
+  return (
+    <div
+      ref={ref}
+      className="windowed-item"
+      style={placeholder ? { height: height.current } : undefined}
+    >
+      {placeholder ? null : children}
+    </div>
+  );
+}